@@ -1,10 +1,20 @@
+import hashlib
 import pandas as pd
 from sqlalchemy import create_engine
 import sys
-import networkx as nx
 import math
+import queue
+import threading
 from itertools import combinations
+from contextlib import nullcontext
 from typing import List, Dict, Tuple
+from motores_canasta import LimiteBusqueda, armar_canasta, frontera_canasta, resolver_anytime, resolver_canasta
+from mochila_prioridad import resolver_canasta_prioridad
+from consolidacion_tiendas import resolver_canasta_consolidada
+from matriz_distancias import MatrizDistancias
+from algoritmo_distancia import GRAFO_DISTANCIA, RED_VIAL
+from instrumentacion import INSTRUMENTACION
+from similitud_productos import IndiceSimilitud
 
 # =============================================================================
 # MOTOR DE OPTIMIZACIÓN FINAL (Backtracking + Dijkstra)
@@ -12,23 +22,77 @@ from typing import List, Dict, Tuple
 #          de traslado. [IMPLEMENTACIÓN DE LOS CÍRCULOS ROJOS] :D
 # =============================================================================
 
-# --- VARIABLES GLOBALES PARA TRACKING ---
-mejor_combinacion = []
-mejor_cantidad = 0
-
 # --- 1. CONEXIÓN A SQL ---
 SERVER_NAME = 'PATRICKYIN'  
 DATABASE_NAME = 'MiMercadito_Final'
 connection_string = f"mssql+pyodbc://{SERVER_NAME}/{DATABASE_NAME}?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes&autocommit=true"
 engine = create_engine(connection_string)
+MAX_PARAMETROS_SQL = 2000   # SQL Server acepta hasta 2100 parámetros por consulta
+
 
+def obtener_ofertas_y_distrito(productos_deseados: List[str], distrito_hogar: str, indice_ofertas=None,
+                               matriz_distancias=None, solo_mejor_por_producto=True,
+                               tiendas_candidatas=None) -> pd.DataFrame:
+    """
+    Trae las ofertas más baratas por producto (ponderadas por costo de viaje).
+    Si se pasa un `indice_ofertas` (ver indice_ofertas.py) se lee del snapshot
+    en memoria en lugar de consultar SQL.
+    Con solo_mejor_por_producto=False se devuelven TODAS las ofertas ponderadas
+    (lo necesita el solver "consolidado", que elige tiendas).
+    tiendas_candidatas: id_tienda permitidos (ej. las más cercanas según
+    indice_tiendas.py); None = todas las tiendas de la ciudad.
+    """
+    if matriz_distancias is None:
+        matriz_distancias = obtener_matriz_distancias()
 
-def obtener_ofertas_y_distrito(productos_deseados: List[str], distrito_hogar: str) -> pd.DataFrame:
-    """ Trae las ofertas más baratas por producto (ponderadas por costo de viaje). """
     if not productos_deseados:
         return pd.DataFrame()
     
-    # 1. PREPARAR CONSULTA SQL (Manejo robusto de 1 vs N productos)
+    # 1. Ofertas crudas: snapshot en memoria o consulta SQL
+    with INSTRUMENTACION.tramo('ofertas.lectura'):
+        if indice_ofertas is not None and tiendas_candidatas is not None:
+            df_ofertas_raw = indice_ofertas.ofertas(productos_deseados, tiendas_candidatas)
+        elif indice_ofertas is not None:
+            df_ofertas_raw = indice_ofertas.ofertas(productos_deseados)
+        else:
+            df_ofertas_raw = consultar_ofertas_sql(productos_deseados, tiendas_candidatas)
+    INSTRUMENTACION.contar('ofertas.filas', len(df_ofertas_raw))
+    
+    if df_ofertas_raw.empty:
+        return pd.DataFrame()
+
+    # 2-3. Ponderar costo con distancia
+    with INSTRUMENTACION.tramo('ofertas.ponderar'):
+        df_ofertas_raw = ponderar_ofertas(df_ofertas_raw, distrito_hogar, matriz_distancias)
+    INSTRUMENTACION.contar('distancias.consultas', len(df_ofertas_raw))
+    
+    if not solo_mejor_por_producto:
+        return df_ofertas_raw
+    
+    # 4. Regla de Unicidad
+    with INSTRUMENTACION.tramo('ofertas.filtrar'):
+        return filtrar_mejor_por_producto(df_ofertas_raw)
+
+
+def ponderar_ofertas(df_ofertas_raw: pd.DataFrame, distrito_hogar: str, matriz_distancias) -> pd.DataFrame:
+    """ Agrega costo_traslado y precio_total_ponderado a las ofertas crudas. """
+    # 2. Ponderar costo con distancia (Matriz precalculada, una sola lectura vectorizada)
+    df_ofertas_raw['costo_traslado'] = matriz_distancias.costos_desde(distrito_hogar, df_ofertas_raw['distrito_tienda'])
+    
+    # 3. Métrica Final: Precio Ponderado = Producto + Viaje
+    df_ofertas_raw['precio_total_ponderado'] = df_ofertas_raw['precio_producto'] + df_ofertas_raw['costo_traslado']
+    return df_ofertas_raw
+
+
+def filtrar_mejor_por_producto(df_ofertas_raw: pd.DataFrame) -> pd.DataFrame:
+    """ Regla de Unicidad: Seleccionar SOLO la mejor oferta ponderada por producto. """
+    idx = df_ofertas_raw.groupby(['producto'])['precio_total_ponderado'].idxmin()
+    return df_ofertas_raw.loc[idx].reset_index(drop=True)
+
+
+def consultar_ofertas_sql(productos_deseados: List[str], tiendas_candidatas=None) -> pd.DataFrame:
+    """ JOIN OFERTAS/PRODUCTOS/TIENDAS solo para los productos deseados (y tiendas candidatas). """
+    # PREPARAR CONSULTA SQL (Manejo robusto de 1 vs N productos)
     if len(productos_deseados) == 1:
         where_clause = f"P.producto = ?"
         params = [productos_deseados[0]] 
@@ -36,7 +100,20 @@ def obtener_ofertas_y_distrito(productos_deseados: List[str], distrito_hogar: st
         placeholders = ','.join(['?'] * len(productos_deseados))
         where_clause = f"P.producto IN ({placeholders})"
         params = tuple(productos_deseados)
+    if tiendas_candidatas is not None:
+        if len(tiendas_candidatas) == 0:
+            return pd.DataFrame()
+        # Por lotes: con miles de tiendas candidatas un solo IN (...) pasa el límite de parámetros
+        ids = [int(id_tienda) for id_tienda in tiendas_candidatas]
+        por_lote = max(1, MAX_PARAMETROS_SQL - len(params))
+        lotes = [_consulta_ofertas(f"{where_clause} AND T.id_tienda IN ({','.join(['?'] * len(lote))})",
+                                   tuple(params) + tuple(lote))
+                 for lote in (ids[inicio:inicio + por_lote] for inicio in range(0, len(ids), por_lote))]
+        return pd.concat(lotes, ignore_index=True)
+    return _consulta_ofertas(where_clause, params)
+
 
+def _consulta_ofertas(where_clause: str, params) -> pd.DataFrame:
     query = f"""
     SELECT 
         P.producto,
@@ -50,81 +127,83 @@ def obtener_ofertas_y_distrito(productos_deseados: List[str], distrito_hogar: st
     WHERE {where_clause}
     """
     
-    df_ofertas_raw = pd.read_sql(query, engine, params=params)
-    
-    if df_ofertas_raw.empty:
-        return pd.DataFrame()
+    return pd.read_sql(query, engine, params=params)
 
-    # 2. Ponderar costo con distancia (Algoritmo Dijkstra)
-    df_ofertas_raw['costo_traslado'] = df_ofertas_raw['distrito_tienda'].apply(
-        lambda dest_distrito: obtener_costo_traslado(distrito_hogar, dest_distrito)
-    )
-    
-    # 3. Métrica Final: Precio Ponderado = Producto + Viaje
-    df_ofertas_raw['precio_total_ponderado'] = df_ofertas_raw['precio_producto'] + df_ofertas_raw['costo_traslado']
-    
-    # 4. Regla de Unicidad: Seleccionar SOLO la mejor oferta ponderada por producto
-    idx = df_ofertas_raw.groupby(['producto'])['precio_total_ponderado'].idxmin()
-    df_ofertas_filtradas = df_ofertas_raw.loc[idx].reset_index(drop=True)
-    
-    return df_ofertas_filtradas
+
+def huella_ofertas_sql(productos_deseados: List[str]) -> str:
+    """
+    Huella del contenido de OFERTAS para los productos deseados (filas, precios
+    en céntimos y tiendas): cambia si se agrega, borra o cambia de precio una
+    oferta. Es un agregado de una fila, mucho más barato que el JOIN completo.
+    """
+    if not productos_deseados:
+        return ''
+    placeholders = ','.join(['?'] * len(productos_deseados))
+    query = f"""
+    SELECT
+        COUNT(*) AS filas,
+        SUM(ROUND(O.precio_soles * 100, 0)) AS centimos,
+        SUM(O.id_tienda * ROUND(O.precio_soles * 100, 0)) AS ponderado,
+        SUM(O.id_precio) AS ids
+    FROM OFERTAS O
+    INNER JOIN PRODUCTOS P ON O.id_producto = P.id_producto
+    WHERE P.producto IN ({placeholders})
+    """
+    fila = pd.read_sql(query, engine, params=tuple(productos_deseados)).iloc[0]
+    return hashlib.sha1(repr([None if pd.isna(v) else float(v) for v in fila]).encode('utf-8')).hexdigest()
 
 
 # --- 2. BASE DE DATOS GEOGRÁFICA (MAPA DE LIMA) ---
-MAPA_LIMA = {
-    'Comas': {'San Martin de Porres': 8, 'San Juan de Lurigancho': 12},
-    'San Martin de Porres': {'Comas': 8, 'Callao': 9, 'Jesus Maria': 9},
-    'Callao': {'San Martin de Porres': 9, 'San Miguel': 3},
-    'San Miguel': {'Callao': 3, 'Pueblo Libre': 3},
-    'Pueblo Libre': {'San Miguel': 3, 'Jesus Maria': 4, 'Surquillo': 18},
-    'Jesus Maria': {'San Martin de Porres': 9, 'Pueblo Libre': 4, 'Lince': 3},
-    'Lince': {'Jesus Maria': 3, 'San Isidro': 4},
-    'San Isidro': {'Lince': 4, 'San Borja': 3, 'Surquillo': 2},
-    'Surquillo': {'San Isidro': 2, 'Miraflores': 7, 'Santiago de Surco': 4},
-    'Miraflores': {'Surquillo': 7, 'Barranco': 2, 'San Borja': 9},
-    'Barranco': {'Miraflores': 2, 'Chorrillos': 2},
-    'Chorrillos': {'Barranco': 2, 'Santiago de Surco': 7, 'Villa El Salvador': 11},
-    'Santiago de Surco': {'Surquillo': 4, 'Chorrillos': 7, 'San Borja': 4},
-    'San Borja': {'San Isidro': 3, 'Santiago de Surco': 4, 'La Molina': 5},
-    'La Molina': {'San Borja': 5, 'San Juan de Lurigancho': 13, 'Villa El Salvador': 9},
-    'San Juan de Lurigancho': {'Comas': 12, 'La Molina': 13, 'Surquillo': 10}
-}
-GRAFO_DISTANCIA = nx.Graph(MAPA_LIMA)
+# Un solo mapa para todo el proyecto: GRAFO_DISTANCIA y RED_VIAL se cargan de
+# data/mapa_lima.csv en algoritmo_distancia.py
+
+# Todos los caminos mínimos se calculan una vez (o se recargan del disco) en el
+# primer uso: importar el módulo no calcula ni escribe nada
+_MATRIZ_DISTANCIAS = None
+_CANDADO_MATRIZ = threading.Lock()
+
+
+def obtener_matriz_distancias() -> MatrizDistancias:
+    """ Matriz de distancias de GRAFO_DISTANCIA, compartida por todo el proceso. """
+    global _MATRIZ_DISTANCIAS
+    if _MATRIZ_DISTANCIAS is None:
+        with _CANDADO_MATRIZ:
+            if _MATRIZ_DISTANCIAS is None:
+                _MATRIZ_DISTANCIAS = MatrizDistancias.cargar_o_calcular(GRAFO_DISTANCIA)
+    return _MATRIZ_DISTANCIAS
+
+# RED_VIAL atiende las consultas sueltas (ver red_vial.py). Para una red de
+# calles: OptimizadorCanasta(matriz_distancias=RedVial.desde_archivo(...))
 
 def obtener_costo_traslado(distrito_origen: str, distrito_destino: str) -> float:
-    """ Calcula el costo mínimo de traslado (km) entre dos distritos usando Dijkstra. """
-    try:
-        costo = nx.shortest_path_length(
-            GRAFO_DISTANCIA, 
-            source=distrito_origen, 
-            target=distrito_destino, 
-            weight='weight' 
-        )
-        return float(costo)
-    except nx.NetworkXNoPath:
-        return 1000.0
-    except nx.NodeNotFound:
-        return 500.0 
+    """
+    Costo mínimo de traslado (km) entre dos distritos, delegado en la red vial.
+    Centinelas: 500.0 si el distrito de origen no existe, 1000.0 si no hay camino
+    (incluye un destino que no está en el mapa, igual que networkx).
+    """
+    return RED_VIAL.costo(distrito_origen, distrito_destino)
 
 
 # --- 3. ALGORITMO BACKTRACKING (Núcleo) ---
-mejor_combinacion = []
-mejor_cantidad = 0
-
-def backtracking_compras(productos_disponibles_df, presupuesto_restante, indice=0, canasta_actual=None):
-    """ Función recursiva para la optimización de la canasta (Fuerza Bruta). """
-    global mejor_combinacion, mejor_cantidad
-    
+def backtracking_compras(productos_disponibles_df, presupuesto_restante, indice=0, canasta_actual=None, mejor=None):
+    """
+    Función recursiva para la optimización de la canasta (Fuerza Bruta).
+    El mejor resultado se guarda en el dict `mejor` de ESTA llamada (no en
+    globales), así varias optimizaciones pueden correr en paralelo.
+    """
     if canasta_actual is None:
         canasta_actual = []
+    if mejor is None:
+        mejor = {'combinacion': [], 'cantidad': 0, 'nodos': 0, 'podados': 0}
+    mejor['nodos'] += 1
     
     # Caso base: llegamos al final de la lista
     if indice >= len(productos_disponibles_df):
         # ÚNICA REGLA DE DECISIÓN: Maximizamos la cantidad de ítems
-        if len(canasta_actual) > mejor_cantidad:
-            mejor_cantidad = len(canasta_actual)
-            mejor_combinacion = canasta_actual.copy()
-        return
+        if len(canasta_actual) > mejor['cantidad']:
+            mejor['cantidad'] = len(canasta_actual)
+            mejor['combinacion'] = canasta_actual.copy()
+        return mejor
 
     producto_actual_df = productos_disponibles_df.iloc[indice]
     
@@ -147,53 +226,317 @@ def backtracking_compras(productos_disponibles_df, presupuesto_restante, indice=
             productos_disponibles_df,
             presupuesto_restante - precio_ponderado,
             indice + 1,
-            canasta_actual + [item]
+            canasta_actual + [item],
+            mejor
         )
+    else:
+        mejor['podados'] += 1
     
     # Opción 2: Excluir el producto/tienda (seguir explorando)
     backtracking_compras(
         productos_disponibles_df,
         presupuesto_restante,
         indice + 1,
-        canasta_actual
+        canasta_actual,
+        mejor
     )
+    return mejor
 
 
 # --- 4. FUNCIÓN PRINCIPAL DE EJECUCIÓN ---
-def ejecutar_optimizacion(presupuesto, productos_deseados, distrito_familia):
-    """ Función que ejecuta el flujo completo de optimización. """
-    global mejor_combinacion, mejor_cantidad
-    
-    df_ofertas_filtradas = obtener_ofertas_y_distrito(productos_deseados, distrito_familia)
-    
-    if df_ofertas_filtradas.empty:
-        return [], [], 0.0, 0.0, 0.0, "ERROR_PRODUCTO_NO_ENCONTRADO_EN_OFERTAS"
+class OptimizadorCanasta:
+    """
+    Optimizador reentrante y seguro entre hilos.
+    Solo guarda cachés de LECTURA compartidas (matriz de distancias, índice de
+    ofertas) y, opcionalmente, un CacheResultados (ver cache_resultados.py);
+    el estado de la búsqueda se crea dentro de cada llamada.
+    Con un `indice_tiendas` (indice_tiendas.py) y `k_tiendas` y/o `radio_km`
+    solo se consideran las tiendas cercanas a la familia que venden lo pedido.
+    """
 
-    # 4.1 Reiniciar y ejecutar Backtracking
-    mejor_combinacion = []
-    mejor_cantidad = 0
-    
-    # Ejecutamos el algoritmo de Backtracking
-    backtracking_compras(df_ofertas_filtradas, presupuesto) 
+    def __init__(self, indice_ofertas=None, matriz_distancias=None, solver="exact-bnb", cache=None,
+                 indice_similitud=None, indice_tiendas=None, k_tiendas=None, radio_km=None):
+        self.indice_ofertas = indice_ofertas
+        self.matriz_distancias = matriz_distancias if matriz_distancias is not None else obtener_matriz_distancias()
+        self.solver = solver
+        self.cache = cache
+        self.indice_similitud = indice_similitud
+        self.indice_tiendas = indice_tiendas
+        self.k_tiendas = k_tiendas
+        self.radio_km = radio_km
 
-    # 4.2 Calcular totales
-    total_gastado = sum(item['precio_producto'] for item in mejor_combinacion)
-    
-    return mejor_combinacion, [], total_gastado, presupuesto - total_gastado, 0.0, "OK"
+    def tiendas_candidatas(self, productos_deseados, distrito_familia, ubicacion=None, fuente_ofertas=None):
+        """
+        id_tienda cercanos a `ubicacion` (latitud, longitud) o, si no se da, al
+        centro del distrito. None = sin filtro espacial (no hay índice, no se
+        configuró k_tiendas / radio_km o el distrito no tiene tiendas).
+        """
+        if self.indice_tiendas is None or (self.k_tiendas is None and self.radio_km is None):
+            return None
+        if ubicacion is None:
+            ubicacion = self.indice_tiendas.centro_distrito(distrito_familia)
+            if ubicacion is None:
+                return None
+        fuente = fuente_ofertas if fuente_ofertas is not None else self.indice_ofertas
+        with INSTRUMENTACION.tramo('ofertas.tiendas_cercanas'):
+            candidatas = self.indice_tiendas.ids_cercanas(ubicacion[0], ubicacion[1], self.k_tiendas, self.radio_km,
+                                                          productos_deseados, fuente)
+        INSTRUMENTACION.contar('tiendas.candidatas', len(candidatas))
+        return candidatas
+
+    def obtener_ofertas(self, productos_deseados, distrito_familia, solo_mejor_por_producto=True,
+                        fuente_ofertas=None, ubicacion=None):
+        fuente = fuente_ofertas if fuente_ofertas is not None else self.indice_ofertas
+        candidatas = self.tiendas_candidatas(productos_deseados, distrito_familia, ubicacion, fuente)
+        return obtener_ofertas_y_distrito(productos_deseados, distrito_familia, fuente,
+                                          self.matriz_distancias, solo_mejor_por_producto, candidatas)
+
+    def optimizar(self, presupuesto, productos_deseados, distrito_familia, solver=None,
+                  objetivo="cantidad", cantidades=None, prioridades=None,
+                  limite=None, al_mejorar=None, estadisticas=None, ubicacion=None):
+        """
+        Mismo resultado (tupla de 6) que ejecutar_optimizacion.
+        limite / al_mejorar: modo anytime (ver optimizar_anytime).
+        ubicacion: (latitud, longitud) de la familia para elegir tiendas
+        cercanas (por defecto, el centro de su distrito).
+        Con caché (y fuera del modo anytime) se reutilizan resultados de
+        pedidos equivalentes.
+        """
+        solver = solver or self.solver
+        # Se fija el snapshot vigente para toda la llamada (también es la versión de la clave)
+        fuente = getattr(self.indice_ofertas, 'snapshot', self.indice_ofertas)
+        if self.cache is None or limite is not None or al_mejorar is not None or estadisticas is not None:
+            return self._optimizar(fuente, presupuesto, productos_deseados, distrito_familia, solver,
+                                   objetivo, cantidades, prioridades, limite, al_mejorar, estadisticas, ubicacion)
+
+        # Versión por contenido (no el contador del snapshot): válida entre procesos y reinicios
+        if fuente is not None:
+            version = fuente.huella(productos_deseados)
+        else:
+            version = huella_ofertas_sql(productos_deseados)
+        firma = self.matriz_distancias.firma
+        # El filtro espacial cambia las ofertas: entra en la clave solo si está activo
+        espacial = {} if self.indice_tiendas is None else {'tiendas': (ubicacion, self.k_tiendas, self.radio_km)}
+        clave = self.cache.clave(productos_deseados, distrito_familia, presupuesto, version, firma,
+                                 solver=solver, objetivo=objetivo, cantidades=cantidades, prioridades=prioridades,
+                                 **espacial)
+        presupuesto_balde = self.cache.presupuesto_balde(presupuesto)
+
+        def calcular():
+            canasta, tiendas_ruta, gasto, _, costo_ruta, estado = self._optimizar(
+                fuente, presupuesto_balde, productos_deseados, distrito_familia, solver,
+                objetivo, cantidades, prioridades, ubicacion=ubicacion)
+            return canasta, tiendas_ruta, gasto, costo_ruta, estado
+
+        canasta, tiendas_ruta, gasto, costo_ruta, estado = self.cache.obtener_o_calcular(clave, (version, firma), calcular)
+        # Copias: quien llama puede modificar los ítems sin tocar el caché
+        vuelto = presupuesto - gasto if estado == "OK" else 0.0
+        return [dict(item) for item in canasta], [dict(t) for t in tiendas_ruta], gasto, vuelto, costo_ruta, estado
+
+    def _optimizar(self, fuente_ofertas, presupuesto, productos_deseados, distrito_familia, solver,
+                   objetivo="cantidad", cantidades=None, prioridades=None,
+                   limite=None, al_mejorar=None, estadisticas=None, ubicacion=None):
+        consolidado = solver == "consolidado" and objetivo == "cantidad"
+        df_ofertas_filtradas = self.obtener_ofertas(productos_deseados, distrito_familia,
+                                                    solo_mejor_por_producto=not consolidado,
+                                                    fuente_ofertas=fuente_ofertas, ubicacion=ubicacion)
+        
+        if df_ofertas_filtradas.empty:
+            return [], [], 0.0, 0.0, 0.0, "ERROR_PRODUCTO_NO_ENCONTRADO_EN_OFERTAS"
+
+        tiendas_ruta, costo_ruta = [], 0.0
+        if estadisticas is None:
+            estadisticas = {}
+        anytime = limite is not None or al_mejorar is not None
+
+        # 4.1 Ejecutar el motor elegido (estado local a esta llamada)
+        with INSTRUMENTACION.tramo('solver'):
+            if consolidado:
+                # Traslado cobrado una vez por tienda visitada (consolidacion_tiendas.py)
+                mejor_combinacion, tiendas_ruta, costo_ruta = resolver_canasta_consolidada(
+                    df_ofertas_filtradas, presupuesto, estadisticas=estadisticas,
+                    limite=limite, al_mejorar=al_mejorar)
+            elif objetivo == "prioridad":
+                # Mochila acotada: unidades por producto, valor = prioridad x unidades
+                mejor_combinacion = resolver_canasta_prioridad(df_ofertas_filtradas, presupuesto,
+                                                               cantidades, prioridades, estadisticas)
+            elif objetivo != "cantidad":
+                raise ValueError(f"Objetivo desconocido: '{objetivo}'. Opciones: cantidad, prioridad")
+            elif anytime and solver in ("exact-bnb", "backtracking"):
+                # Greedy inmediato + Branch & Bound hasta agotar el límite
+                reportar = None
+                if al_mejorar is not None:
+                    def reportar(indices, info):
+                        al_mejorar(armar_canasta(df_ofertas_filtradas, indices), info)
+                indices = resolver_anytime(df_ofertas_filtradas['precio_total_ponderado'].to_numpy(dtype=float),
+                                           presupuesto, estadisticas, limite, reportar)
+                mejor_combinacion = armar_canasta(df_ofertas_filtradas, indices)
+            elif solver == "backtracking":
+                # Fuerza bruta original (2^n), útil solo como referencia
+                # Se vuelca en el dict de quien llama (no se reasigna): nodos/podados llegan a la instrumentación
+                resultado = backtracking_compras(df_ofertas_filtradas, presupuesto)
+                mejor_combinacion = resultado.pop('combinacion')
+                estadisticas.update(resultado)
+            else:
+                mejor_combinacion = resolver_canasta(df_ofertas_filtradas, presupuesto, solver=solver,
+                                                     estadisticas=estadisticas)
+        INSTRUMENTACION.contar_estadisticas('solver', estadisticas)
+
+        # 4.2 Calcular totales (sin 'cantidad' el ítem es una sola unidad)
+        total_gastado = sum(item['precio_producto'] * item.get('cantidad', 1) for item in mejor_combinacion)
+        
+        return mejor_combinacion, tiendas_ruta, total_gastado, presupuesto - total_gastado, costo_ruta, "OK"
+
+    def recomendar_extra(self, presupuesto_extra, productos_ya_comprados):
+        return recomendar_productos_extra(presupuesto_extra, productos_ya_comprados, self.indice_ofertas,
+                                          self.indice_similitud)
+
+    def optimizar_anytime(self, presupuesto, productos_deseados, distrito_familia,
+                          limite_segundos=None, limite_nodos=None, al_mejorar=None, **kwargs):
+        """
+        Optimización con plazo: SIEMPRE devuelve la mejor canasta encontrada.
+        El límite corre desde esta llamada (incluye leer las ofertas).
+        al_mejorar(canasta, info) recibe cada mejora parcial.
+        Devuelve (tupla de 6, info) con info = {'completo', 'cantidad',
+        'cota_superior', 'brecha', 'nodos'}; brecha = ítems que, como máximo,
+        le faltan a la canasta devuelta frente a la óptima.
+        """
+        estadisticas = {}
+        limite = LimiteBusqueda(limite_segundos, limite_nodos)
+        resultado = self.optimizar(presupuesto, productos_deseados, distrito_familia,
+                                   limite=limite, al_mejorar=al_mejorar, estadisticas=estadisticas, **kwargs)
+        cantidad = len(resultado[0])
+        info = {
+            'completo': estadisticas.get('completo', True),
+            'cantidad': cantidad,
+            'cota_superior': estadisticas.get('cota_superior', cantidad),
+            'brecha': estadisticas.get('brecha', 0),
+            'nodos': estadisticas.get('nodos', 0),
+        }
+        return resultado, info
+
+    def mejoras_anytime(self, *args, **kwargs):
+        """
+        Generador para interfaces: entrega (canasta, info) en cada mejora y
+        al final la canasta definitiva con info['definitiva'] = True.
+        """
+        cola = queue.Queue()
+        fin = object()
+
+        def trabajar():
+            try:
+                resultado, info = self.optimizar_anytime(*args, al_mejorar=lambda c, i: cola.put((c, i)), **kwargs)
+                cola.put((resultado[0], dict(info, definitiva=True)))
+            except Exception as error:
+                cola.put(error)
+            finally:
+                cola.put(fin)
+
+        threading.Thread(target=trabajar, daemon=True).start()
+        while True:
+            elemento = cola.get()
+            if elemento is fin:
+                return
+            if isinstance(elemento, Exception):
+                raise elemento
+            yield elemento
+
+    def optimizar_con_desglose(self, *args, **kwargs):
+        """ (resultado de optimizar, {'total_ms', 'tramos_ms', 'contadores'}) de esta llamada. """
+        with INSTRUMENTACION.desglose() as desglose:
+            resultado = self.optimizar(*args, **kwargs)
+        return resultado, desglose.como_dict()
+
+    def frontera_presupuesto(self, productos_deseados, distrito_familia, presupuesto_max, ubicacion=None):
+        """ Ofertas y distancias una sola vez -> canasta óptima para todo presupuesto <= máx. """
+        df_ofertas_filtradas = self.obtener_ofertas(productos_deseados, distrito_familia, ubicacion=ubicacion)
+        return frontera_canasta(df_ofertas_filtradas, presupuesto_max)
+
+
+def ejecutar_optimizacion(presupuesto, productos_deseados, distrito_familia, solver="exact-bnb", indice_ofertas=None,
+                          objetivo="cantidad", cantidades=None, prioridades=None, con_desglose=False,
+                          limite_segundos=None, limite_nodos=None, al_mejorar=None, cache=None,
+                          indice_tiendas=None, k_tiendas=None, radio_km=None, ubicacion=None):
+    """
+    Función que ejecuta el flujo completo de optimización.
+    solver: "exact-bnb" | "dp" | "greedy" (ver motores_canasta.py),
+            "consolidado" (traslado por tienda visitada; devuelve además las
+            tiendas a visitar y los km totales) o "backtracking" para la
+            fuerza bruta original.
+    indice_ofertas: snapshot en memoria opcional (evita la consulta SQL).
+    objetivo: "cantidad" (máxima cantidad de ítems, por defecto) o "prioridad"
+              (mochila acotada con `cantidades` y `prioridades` por producto,
+              ver mochila_prioridad.py).
+    con_desglose: si es True devuelve (tupla de 6, desglose) con los tiempos
+                  por etapa y contadores de esta llamada (ver instrumentacion.py).
+    limite_segundos / limite_nodos / al_mejorar: modo anytime. Devuelve
+                  (tupla de 6, info) con la mejor canasta hallada, si la
+                  búsqueda terminó y la brecha de optimalidad (con
+                  con_desglose, el desglose va en info['desglose']).
+    cache: CacheResultados opcional (ver cache_resultados.py).
+    indice_tiendas / k_tiendas / radio_km: solo tiendas cercanas a `ubicacion`
+                  (latitud, longitud) o, si no se da, al centro del distrito
+                  (ver indice_tiendas.py).
+    """
+    optimizador = OptimizadorCanasta(indice_ofertas=indice_ofertas, solver=solver, cache=cache,
+                                     indice_tiendas=indice_tiendas, k_tiendas=k_tiendas, radio_km=radio_km)
+    if limite_segundos is not None or limite_nodos is not None or al_mejorar is not None:
+        with INSTRUMENTACION.desglose() if con_desglose else nullcontext() as desglose:
+            resultado, info = optimizador.optimizar_anytime(
+                presupuesto, productos_deseados, distrito_familia, limite_segundos, limite_nodos, al_mejorar,
+                objetivo=objetivo, cantidades=cantidades, prioridades=prioridades, ubicacion=ubicacion)
+        if con_desglose:
+            info['desglose'] = desglose.como_dict()
+        return resultado, info
+    if con_desglose:
+        return optimizador.optimizar_con_desglose(presupuesto, productos_deseados, distrito_familia,
+                                                  objetivo=objetivo, cantidades=cantidades, prioridades=prioridades,
+                                                  ubicacion=ubicacion)
+    return optimizador.optimizar(presupuesto, productos_deseados, distrito_familia,
+                                 objetivo=objetivo, cantidades=cantidades, prioridades=prioridades,
+                                 ubicacion=ubicacion)
+
+
+def frontera_presupuesto(productos_deseados, distrito_familia, presupuesto_max, indice_ofertas=None):
+    """
+    Resuelve UNA vez y devuelve la función escalonada presupuesto -> canasta
+    (ver FronteraPresupuesto en motores_canasta.py). Para mover el presupuesto
+    en la interfaz basta con `frontera.consultar(monto)`.
+    """
+    optimizador = OptimizadorCanasta(indice_ofertas=indice_ofertas)
+    return optimizador.frontera_presupuesto(productos_deseados, distrito_familia, presupuesto_max)
 
 
 # --- 5. LÓGICA DE RECOMENDACIÓN DE VUELTO (BASADA EN EXCEDENTE) ---
-def recomendar_productos_extra(presupuesto_extra, productos_ya_comprados):
+CANDIDATOS_AFINIDAD = 50  # Candidatos que se reordenan por similitud (ver similitud_productos.py)
+
+
+def recomendar_productos_extra(presupuesto_extra, productos_ya_comprados, indice_ofertas=None,
+                               indice_similitud=None, k=5):
     """
     Busca productos que el usuario NO compró, cuyo precio sea <= presupuesto_extra.
     Prioriza los más caros para maximizar el uso del excedente.
     [SOLUCIONA EL ARGUMENTERROR AL TRATAR LA EXCLUSIÓN]
+    Con `indice_ofertas` se usa el índice de precios mínimos del snapshot
+    (búsqueda binaria en memoria) en lugar del GROUP BY en SQL.
+    Con `indice_similitud` se toman más candidatos y se ordenan primero por
+    afinidad con la canasta (co-compras) y luego por precio.
     """
     if presupuesto_extra <= 0:
         return pd.DataFrame()
         
     # 1. Lista de nombres de productos ya comprados para exclusión
     nombres_comprados = [item['producto'] for item in productos_ya_comprados]
+    limite = CANDIDATOS_AFINIDAD if indice_similitud is not None else k
+
+    def ordenar(df_candidatos):
+        if indice_similitud is None or df_candidatos.empty:
+            return df_candidatos
+        return indice_similitud.ordenar_por_afinidad(df_candidatos, nombres_comprados, k)
+    
+    if indice_ofertas is not None:
+        with INSTRUMENTACION.tramo('recomendar'):
+            return ordenar(indice_ofertas.recomendar(presupuesto_extra, set(nombres_comprados), k=limite))
     
     # 2. CONSTRUIR LA CLÁUSULA WHERE para exclusión (Lógica de exclusión de strings)
     if not nombres_comprados:
@@ -211,7 +554,7 @@ def recomendar_productos_extra(presupuesto_extra, productos_ya_comprados):
     
     # 3. Consulta SQL: Busca productos bajo el presupuesto extra
     query = f"""
-    SELECT TOP 5 P.producto, MIN(O.precio_soles) AS precio
+    SELECT TOP {int(limite)} P.producto, MIN(O.precio_soles) AS precio
     FROM OFERTAS O
     INNER JOIN PRODUCTOS P ON O.id_producto = P.id_producto
     GROUP BY P.producto
@@ -221,7 +564,8 @@ def recomendar_productos_extra(presupuesto_extra, productos_ya_comprados):
     
     try:
         # Ejecutamos, pasando [presupuesto, P1, P2...] como parámetros
-        return pd.read_sql(query, engine, params=params_final)
+        with INSTRUMENTACION.tramo('recomendar'):
+            return ordenar(pd.read_sql(query, engine, params=params_final))
     except Exception:
         return pd.DataFrame()
 
@@ -356,6 +700,10 @@ if __name__ == "__main__":
             print(f"   • {item['producto']:<25} @ {item['tienda']:<15} (+{item['costo_traslado']:.1f} km) S/ {item['precio_producto']:6.2f}")
             total_traslado_acumulado += item['costo_traslado']
         
+        # Con tiendas consolidadas cada tienda se recorre una sola vez
+        if tiendas_ruta:
+            total_traslado_acumulado = costo_ruta_mst
+        
         print("-" * 60)
         
         if productos_no_comprados:
@@ -367,7 +715,10 @@ if __name__ == "__main__":
         if vuelto >= 10.0: # Regla de negocio: Si sobra S/ 10.00 o más
             print("\n🎉 ¡TIENES UN PRESUPUESTO EXTRA!")
             
-            df_recomendaciones = recomendar_productos_extra(vuelto, canasta)
+            # Si existe el índice de co-compras (python app/similitud_productos.py),
+            # primero van los productos que suelen comprarse con la canasta
+            df_recomendaciones = recomendar_productos_extra(vuelto, canasta,
+                                                            indice_similitud=IndiceSimilitud.cargar_si_existe())
             
             if not df_recomendaciones.empty:
                 print("🎁 PRODUCTOS RECOMENDADOS para aprovechar el excedente:")
@@ -1,9 +1,9 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
-from itertools import combinations
-import math
-import random
+from indice_tiendas import IndiceTiendas
+from mst_euclidiano import mst_euclidiano, posiciones_simuladas
+from recorrido_reparto import resolver_recorrido
+from render_grafos import dibujar_networkx
 # =============================================================================
 # TÉCNICA: MST (Minimum Spanning Tree) - Algoritmo de Kruskal
 # =============================================================================
@@ -12,11 +12,14 @@ import random
 #   posible (ahorro de recorrido/gasolina).
 #
 # CÓMO FUNCIONA:
-#   1. Crea un GRAFO completo donde todas las tiendas están conectadas con todas.
-#   2. Calcula la distancia (peso) entre cada par de tiendas.
-#   3. Aplica KRUSKAL: Ordena las distancias de menor a mayor y va eligiendo
-#      las conexiones más cortas, siempre y cuando no formen un ciclo cerrado.
-#   4. Resultado: Un árbol que une todos los puntos con el costo mínimo total.
+#   1. Cada tienda trae su latitud / longitud (TIENDAS), proyectadas a km
+#      como array NumPy (x, y) con el mismo plano que indice_tiendas.py.
+#   2. En lugar de conectar todas con todas, las conexiones candidatas salen
+#      de la triangulación de Delaunay (el MST siempre está contenido en ella).
+#   3. Aplica el MST de SciPy (equivalente a KRUSKAL: elige las conexiones más
+#      cortas siempre y cuando no formen un ciclo cerrado).
+#   4. Resultado: Un árbol que une todos los puntos con el costo mínimo total,
+#      el mismo que con el grafo completo, pero escala a 100k tiendas.
 # =============================================================================
 
 
@@ -28,61 +31,60 @@ except FileNotFoundError:
 
 print(f"✅ Cargadas {len(df_tiendas)} tiendas para el análisis de rutas.")
 
-# --- 2. SIMULAR UBICACIONES (Coordenadas X, Y) ---
-# basadas en el ID para que siempre salgan igual.
-posiciones = {}
-for _, row in df_tiendas.iterrows():
-    x = (row['id_tienda'] * 37) % 100
-    y = (row['id_tienda'] * 73) % 100
-    posiciones[row['id_tienda']] = (x, y)
-
-# --- 3. CREAR EL GRAFO COMPLETO  ---
+# --- 2. UBICACIONES (Coordenadas X, Y en km) ---
+# Salen de latitud/longitud de cada tienda. Un CSV viejo sin coordenadas usa
+# las posiciones simuladas por ID (vectorizado, ver mst_euclidiano.py).
+ids_tienda = df_tiendas['id_tienda'].to_numpy()
+if {'latitud', 'longitud'}.issubset(df_tiendas.columns) and df_tiendas[['latitud', 'longitud']].notna().all().all():
+    coordenadas = IndiceTiendas(df_tiendas).a_km(df_tiendas['latitud'], df_tiendas['longitud'])
+    unidad = 'km'
+else:
+    coordenadas = posiciones_simuladas(ids_tienda)
+    unidad = 'unidades de distancia'
+posiciones = {int(id_t): (x, y) for id_t, (x, y) in zip(ids_tienda, coordenadas)}
+
+# --- 3. NODOS (Tiendas) ---
+# Las etiquetas salen de las columnas directamente (sin buscar cada tienda con .loc)
 G = nx.Graph()
-
-# Añadir Nodos (Tiendas)
-for id_t, pos in posiciones.items():
-    nombre = df_tiendas.loc[df_tiendas['id_tienda'] == id_t, 'nombre_tienda'].values[0]
-    distrito = df_tiendas.loc[df_tiendas['id_tienda'] == id_t, 'distrito'].values[0]
-    etiqueta = f"{nombre}\n({distrito})"
-    G.add_node(id_t, pos=pos, label=etiqueta)
-
-# Añadir Aristas (Caminos posibles entre todas)
-print("🛣️ Calculando distancias entre todas las tiendas...")
-for t1, t2 in combinations(df_tiendas['id_tienda'], 2):
-    p1 = posiciones[t1]
-    p2 = posiciones[t2]
-    distancia = math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-    
-    G.add_edge(t1, t2, weight=distancia)
-
-# --- 4. ALGORITMO MST (KRUSKAL) ---
-print("🧠 Ejecutando Algoritmo de Kruskal (MST)...")
-mst_grafo = nx.minimum_spanning_tree(G, algorithm='kruskal')
+etiquetas = df_tiendas['nombre_tienda'] + "\n(" + df_tiendas['distrito'] + ")"
+for id_t, etiqueta in zip(ids_tienda, etiquetas):
+    G.add_node(int(id_t), pos=posiciones[int(id_t)], label=etiqueta)
+
+# --- 4. ALGORITMO MST (Delaunay + SciPy) ---
+# Ya no se arma el grafo completo (n^2 aristas): las candidatas salen de la
+# triangulación de Delaunay, que contiene todas las aristas del MST.
+print("🧠 Calculando el MST euclidiano (Delaunay + minimum_spanning_tree)...")
+aristas, pesos = mst_euclidiano(coordenadas)
+mst_grafo = nx.Graph()
+mst_grafo.add_nodes_from(G.nodes(data=True))
+mst_grafo.add_weighted_edges_from(
+    (int(ids_tienda[i]), int(ids_tienda[j]), float(peso)) for (i, j), peso in zip(aristas, pesos))
 
 # Calcular cuánto nos ahorramos
-peso_total = mst_grafo.size(weight='weight')
+peso_total = float(pesos.sum())
 print(f"✅ Ruta optimizada calculada.")
-print(f"   Distancia total mínima: {peso_total:.2f} unidades de distancia.")
-
-# --- 5. VISUALIZACIÓN ---
-plt.figure(figsize=(14, 10))
-pos = nx.get_node_attributes(G, 'pos')
+print(f"   Distancia total mínima: {peso_total:.2f} {unidad}.")
 
-# Dibujar
-nx.draw_networkx_nodes(G, pos, node_size=700, node_color='#66c2a5', edgecolors='black')
+# --- 4b. RECORRIDO DE REPARTO (MST -> tour + 2-opt / Or-opt) ---
+# El MST no se puede manejar tal cual: el camión necesita un orden de visita.
+# El peso del MST es la cota inferior del recorrido (ver recorrido_reparto.py).
+estadisticas_recorrido = {}
+orden_visita = resolver_recorrido(coordenadas, limite_segundos=2.0, estadisticas=estadisticas_recorrido)
+print(f"🚚 Recorrido de reparto: {estadisticas_recorrido['longitud_final']:.2f} {unidad} "
+      f"({estadisticas_recorrido['razon_vs_mst']:.2f} x la cota del MST).")
+print("   Orden: " + " -> ".join(df_tiendas['nombre_tienda'].iloc[orden_visita]))
 
-
-nombres = nx.get_node_attributes(G, 'label')
-nx.draw_networkx_labels(G, pos, labels=nombres, font_size=8, font_weight='bold')
-
-
-nx.draw_networkx_edges(mst_grafo, pos, edge_color='#d53e4f', width=2.5)
-
-# Detalles 
-plt.title(f"Algoritmo MST (Kruskal): Ruta de Reparto Óptima\nConecta todas las tiendas con la mínima distancia ({peso_total:.2f})", fontsize=14)
-plt.axis('off')
-
-# Guardar
+# --- 5. VISUALIZACIÓN ---
+# Render masivo (un LineCollection + un scatter, ver render_grafos.py):
+# con miles de tiendas ya no se crea un objeto de matplotlib por arista.
 output_path = 'output/ruta_tiendas_mst.png'
-plt.savefig(output_path, dpi=300, bbox_inches='tight')
+dibujar_networkx(
+    G, posiciones, output_path,
+    etiquetas=nx.get_node_attributes(G, 'label'), aristas_extra=mst_grafo,
+    figsize=(14, 10), tamano_nodo=700, color_nodo='#66c2a5', borde_nodo='black',
+    color_arista='#d53e4f', ancho_arista=2.5,
+    tamano_fuente=8, peso_fuente='bold', evitar_encimado=len(G) > 200,
+    titulo=f"Algoritmo MST (Kruskal): Ruta de Reparto Óptima\nConecta todas las tiendas con la mínima distancia ({peso_total:.2f} {unidad})",
+    tamano_titulo=14,
+)
 print(f"📸 Gráfico de la ruta guardado en: {output_path}")
@@ -0,0 +1,275 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, diags
+
+from exportar_grafo import exportar_gexf, exportar_graphml
+from grafo_compras import adyacencia_desde_aristas, tablas_grafo
+from ingesta_compras import GrafoAcumulado
+
+# =============================================================================
+# ANALÍTICA DEL GRAFO DE COMPRAS (Centralidad aproximada + comunidades)
+# =============================================================================
+# OBJETIVO:
+#   Saber qué tiendas y productos son "hubs" del grafo Familia - Producto -
+#   Tienda. La intermediación exacta es O(V·E) y con unos cientos de miles de
+#   compras ya no termina.
+#
+# CÓMO FUNCIONA:
+#   1. Grado (vecinos distintos) y fuerza (suma de pesos = compras) exactos,
+#      directo de la matriz de adyacencia CSR.
+#   2. Intermediación (betweenness) aproximada: algoritmo de Brandes desde k
+#      fuentes al azar, escalado por n/k (mismo estimador y normalización que
+#      `nx.betweenness_centrality(G, k=...)`). Cada BFS se hace por niveles con
+#      productos matriz dispersa x matriz densa, para un lote de fuentes a la
+#      vez, y los lotes se reparten entre procesos.
+#      Perilla precisión/tiempo: `precision` = fracción de nodos usados como
+#      fuentes (1.0 = exacto) o `muestras` = k fijo.
+#   3. Comunidades: Louvain (networkx, con pesos) o propagación de etiquetas
+#      vectorizada sobre la CSR (semi-síncrona: en cada ronda se actualiza la
+#      mitad de los nodos al azar, para no oscilar en un grafo tripartito).
+#   4. Resultados: reporte CSV ordenado por intermediación y atributos de
+#      nodo (grado, fuerza, intermediacion, comunidad) en el GEXF/GraphML.
+#
+# USO (desde la raíz del proyecto):
+#   python app/analitica_grafo.py                            # precisión 0.1, Louvain
+#   python app/analitica_grafo.py --precision 1 --comunidades propagacion
+#   python app/analitica_grafo.py --estado output/grafo_compras_estado.npz --muestras 256 --workers 8
+# =============================================================================
+
+RUTA_REPORTE = os.path.join('output', 'analitica_grafo.csv')
+RUTA_GRAFO = os.path.join('output', 'grafo_compras_analitica.gexf')
+MEMORIA_LOTE = 64_000_000      # Bytes aprox. de matrices densas (n x lote) por BFS en lote
+ATRIBUTOS = {'tipo': 'string', 'grado': 'integer', 'fuerza': 'double',
+             'intermediacion': 'double', 'comunidad': 'integer'}
+
+# Matriz del proceso worker (se envía una sola vez en el initializer)
+_ADYACENCIA: Optional[csr_matrix] = None
+
+
+# --- 1. Grado y fuerza ---
+def sin_lazos(adyacencia: csr_matrix) -> csr_matrix:
+    matriz = (adyacencia - diags(adyacencia.diagonal(), format='csr', dtype=adyacencia.dtype)).tocsr()
+    matriz.eliminate_zeros()
+    return matriz
+
+
+def grado_y_fuerza(adyacencia: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """ Grado = vecinos distintos; fuerza = suma de pesos (lazo contado una vez). """
+    grado = np.diff(adyacencia.indptr)
+    fuerza = np.asarray(adyacencia.sum(axis=1)).ravel()
+    return grado, fuerza
+
+
+# --- 2. Intermediación por muestreo de fuentes ---
+def _dependencias(binaria: csr_matrix, fuentes: np.ndarray) -> np.ndarray:
+    """ Suma de dependencias de Brandes de un lote de fuentes (BFS sin pesos, por niveles). """
+    n, b = binaria.shape[0], len(fuentes)
+    columnas = np.arange(b)
+    distancia = np.full((n, b), -1, dtype=np.int32)
+    sigma = np.zeros((n, b))
+    distancia[fuentes, columnas] = 0
+    sigma[fuentes, columnas] = 1.0
+
+    # Hacia adelante: sigma = número de caminos mínimos desde cada fuente
+    frontera, nivel = sigma.copy(), 0
+    while True:
+        alcanzados = binaria @ frontera
+        nuevos = (distancia < 0) & (alcanzados > 0)
+        if not nuevos.any():
+            break
+        nivel += 1
+        distancia[nuevos] = nivel
+        sigma[nuevos] = alcanzados[nuevos]
+        frontera = np.where(nuevos, sigma, 0.0)
+
+    # Hacia atrás: delta[v] = Σ_w sigma[v]/sigma[w] · (1 + delta[w]), w en el nivel siguiente
+    delta = np.zeros((n, b))
+    for actual in range(nivel, 0, -1):
+        en_nivel = distancia == actual
+        coeficiente = np.where(en_nivel, (1.0 + delta) / np.where(en_nivel, sigma, 1.0), 0.0)
+        aporte = binaria @ coeficiente
+        anterior = distancia == actual - 1
+        delta[anterior] += sigma[anterior] * aporte[anterior]
+    delta[fuentes, columnas] = 0.0
+    return delta.sum(axis=1)
+
+
+def _iniciar_worker(binaria: csr_matrix) -> None:
+    global _ADYACENCIA
+    _ADYACENCIA = binaria
+
+
+def _dependencias_worker(fuentes: np.ndarray) -> np.ndarray:
+    return _dependencias(_ADYACENCIA, fuentes)
+
+
+def intermediacion_aproximada(adyacencia: csr_matrix, precision: float = 0.1, muestras: Optional[int] = None,
+                              workers: Optional[int] = None, semilla: int = 42,
+                              estadisticas: Optional[Dict] = None) -> np.ndarray:
+    """
+    Intermediación normalizada (como networkx, grafo no dirigido) estimada
+    desde k fuentes: k = muestras, o ceil(precision * n). Con k = n es exacta.
+    """
+    binaria = sin_lazos(adyacencia)
+    binaria.data[:] = 1.0
+    n = binaria.shape[0]
+    if n <= 2:
+        return np.zeros(n)
+    k = min(n, muestras if muestras is not None else max(1, math.ceil(precision * n)))
+    fuentes = np.sort(np.random.default_rng(semilla).choice(n, size=k, replace=False)) if k < n else np.arange(n)
+
+    tamano_lote = int(np.clip(MEMORIA_LOTE // (40 * n), 1, 64))
+    lotes = [fuentes[i:i + tamano_lote] for i in range(0, k, tamano_lote)]
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    inicio = time.perf_counter()
+    if workers <= 1 or len(lotes) == 1:
+        suma = sum(_dependencias(binaria, lote) for lote in lotes)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(lotes)), initializer=_iniciar_worker,
+                                 initargs=(binaria,)) as pool:
+            suma = sum(pool.map(_dependencias_worker, lotes))
+    if estadisticas is not None:
+        estadisticas.update(fuentes=k, lotes=len(lotes), tamano_lote=tamano_lote,
+                            segundos_intermediacion=time.perf_counter() - inicio)
+    return suma * (n / k) / ((n - 1) * (n - 2))
+
+
+# --- 3. Comunidades ---
+def propagacion_etiquetas(adyacencia: csr_matrix, semilla: int = 42, max_rondas: int = 100) -> np.ndarray:
+    """ Propagación de etiquetas con pesos, vectorizada (semi-síncrona). """
+    matriz = sin_lazos(adyacencia).tocoo()
+    n = matriz.shape[0]
+    filas, columnas, pesos = matriz.row.astype(np.int64), matriz.col.astype(np.int64), matriz.data
+    rng = np.random.default_rng(semilla)
+    etiquetas = np.arange(n, dtype=np.int64)
+    for _ in range(max_rondas):
+        # Peso total de cada etiqueta vecina, por nodo
+        claves, inversa = np.unique(filas * n + etiquetas[columnas], return_inverse=True)
+        sumas = np.bincount(inversa, weights=pesos)
+        nodo, etiqueta = claves // n, claves % n
+        # La mejor por nodo; en empate se queda la actual y si no, una al azar
+        es_actual = (etiqueta == etiquetas[nodo]).astype(np.int8)
+        orden = np.lexsort((rng.random(len(claves)), -es_actual, -sumas, nodo))
+        primero = orden[np.r_[True, nodo[orden][1:] != nodo[orden][:-1]]]
+        mejor = etiquetas.copy()
+        mejor[nodo[primero]] = etiqueta[primero]
+        if np.array_equal(mejor, etiquetas):
+            break
+        actualizar = (rng.random(n) < 0.5) & (mejor != etiquetas)
+        etiquetas[actualizar] = mejor[actualizar]
+    return _renumerar(etiquetas)
+
+
+def _renumerar(etiquetas: np.ndarray) -> np.ndarray:
+    """ Comunidades 0..c-1, de la más grande a la más chica. """
+    _, inversa, tamanos = np.unique(etiquetas, return_inverse=True, return_counts=True)
+    rango = np.empty(len(tamanos), dtype=np.int64)
+    rango[np.argsort(-tamanos, kind='stable')] = np.arange(len(tamanos))
+    return rango[inversa.ravel()]
+
+
+def comunidades_louvain(adyacencia: csr_matrix, semilla: int = 42) -> np.ndarray:
+    G = nx.from_scipy_sparse_array(sin_lazos(adyacencia), edge_attribute='weight')
+    etiquetas = np.zeros(adyacencia.shape[0], dtype=np.int64)
+    for c, miembros in enumerate(nx.community.louvain_communities(G, weight='weight', seed=semilla)):
+        etiquetas[list(miembros)] = c
+    return _renumerar(etiquetas)
+
+
+def modularidad(adyacencia: csr_matrix, comunidades: np.ndarray) -> float:
+    """ Modularidad con pesos (sin lazos), vectorizada. """
+    matriz = sin_lazos(adyacencia).tocoo()
+    total = matriz.data.sum()
+    if total == 0:
+        return 0.0
+    internas = matriz.data[comunidades[matriz.row] == comunidades[matriz.col]].sum()
+    fuerza_comunidad = np.bincount(comunidades[matriz.row], weights=matriz.data)
+    return float(internas / total - ((fuerza_comunidad / total) ** 2).sum())
+
+
+# --- 4. Reporte ---
+def analizar(nodos: pd.DataFrame, adyacencia: csr_matrix, precision: float = 0.1,
+             muestras: Optional[int] = None, workers: Optional[int] = None,
+             comunidades: str = 'louvain', semilla: int = 42,
+             estadisticas: Optional[Dict] = None) -> pd.DataFrame:
+    """ Tabla por nodo: nodo, tipo, grado, fuerza, intermediacion, comunidad. """
+    estadisticas = estadisticas if estadisticas is not None else {}
+    inicio = time.perf_counter()
+    grado, fuerza = grado_y_fuerza(adyacencia)
+    intermediacion = intermediacion_aproximada(adyacencia, precision, muestras, workers, semilla, estadisticas)
+
+    inicio_comunidades = time.perf_counter()
+    if comunidades == 'louvain':
+        etiquetas = comunidades_louvain(adyacencia, semilla)
+    elif comunidades == 'propagacion':
+        etiquetas = propagacion_etiquetas(adyacencia, semilla)
+    elif comunidades == 'ninguna':
+        etiquetas = np.zeros(len(nodos), dtype=np.int64)
+    else:
+        raise ValueError(f"Método de comunidades desconocido: {comunidades}")
+    estadisticas.update(segundos_comunidades=time.perf_counter() - inicio_comunidades,
+                        comunidades=int(etiquetas.max()) + 1 if len(etiquetas) else 0,
+                        modularidad=modularidad(adyacencia, etiquetas),
+                        segundos_total=time.perf_counter() - inicio)
+
+    return pd.DataFrame({'nodo': nodos['nombre'].to_numpy(), 'tipo': nodos['tipo'].to_numpy(),
+                         'label': nodos['label'].to_numpy(), 'grado': grado, 'fuerza': fuerza,
+                         'intermediacion': intermediacion, 'comunidad': etiquetas})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hubs y comunidades del grafo Familia - Producto - Tienda.")
+    parser.add_argument('--csv', default=os.path.join('data', 'dataset_compras_completo.csv'))
+    parser.add_argument('--estado', default=None, help='Usar el grafo guardado por ingesta_compras.py (.npz)')
+    parser.add_argument('--precision', type=float, default=0.1,
+                        help='Fracción de nodos usados como fuentes de la intermediación (1 = exacta)')
+    parser.add_argument('--muestras', type=int, default=None, help='Número fijo de fuentes (reemplaza --precision)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--comunidades', default='louvain', choices=['louvain', 'propagacion', 'ninguna'])
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--reporte', default=RUTA_REPORTE, help='CSV por nodo')
+    parser.add_argument('--grafo', default=RUTA_GRAFO, help='.gexf / .graphml (opcional .gz) con las métricas')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.estado:
+        nodos, aristas = GrafoAcumulado.cargar(args.estado).tablas()
+    else:
+        nodos, aristas = tablas_grafo(pd.read_csv(args.csv))
+    adyacencia = adyacencia_desde_aristas(len(nodos), aristas)
+    print(f"✅ Grafo: {len(nodos):,} nodos / {len(aristas):,} aristas ({time.perf_counter() - inicio:.2f} s)")
+
+    estadisticas = {}
+    reporte = analizar(nodos, adyacencia, args.precision, args.muestras, args.workers,
+                       args.comunidades, args.semilla, estadisticas)
+    print(f"⏱️ Intermediación con {estadisticas['fuentes']:,} fuentes ({estadisticas['lotes']} lotes): "
+          f"{estadisticas['segundos_intermediacion']:.2f} s | comunidades ({args.comunidades}): "
+          f"{estadisticas['comunidades']} en {estadisticas['segundos_comunidades']:.2f} s, "
+          f"modularidad {estadisticas['modularidad']:.3f}")
+
+    for tipo in ('Tienda', 'Producto'):
+        hubs = reporte[reporte['tipo'] == tipo].nlargest(5, 'intermediacion')
+        print(f"🏆 {tipo}s más centrales: " + ', '.join(f"{fila.label} ({fila.intermediacion:.3f})"
+                                                       for fila in hubs.itertuples()))
+
+    for ruta in (args.reporte, args.grafo):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+    reporte.drop(columns='label').sort_values('intermediacion', ascending=False).to_csv(args.reporte, index=False)
+    exportar = exportar_graphml if '.graphml' in args.grafo else exportar_gexf
+    exportar((reporte.rename(columns={'nodo': 'nombre'}), aristas), args.grafo,
+             atributos_nodo=list(ATRIBUTOS), tipos_atributo=ATRIBUTOS)
+    print(f"💾 Reporte: {args.reporte} | grafo con métricas: {args.grafo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from algoritmo_backtracking import (GRAFO_DISTANCIA, filtrar_mejor_por_producto, obtener_matriz_distancias,
+                                    ponderar_ofertas)
+from consolidacion_tiendas import resolver_canasta_consolidada
+from indice_ofertas import SnapshotOfertas
+from motores_canasta import resolver_canasta
+
+# =============================================================================
+# BENCHMARK DEL OPTIMIZADOR (Ofertas sintéticas, sin base de datos)
+# =============================================================================
+# OBJETIVO:
+#   Medir cada etapa del pipeline de ejecutar_optimizacion y detectar
+#   regresiones de rendimiento entre versiones del código.
+#
+# CÓMO FUNCIONA:
+#   1. Se generan ofertas sintéticas REPRODUCIBLES (productos x tiendas, con
+#      tiendas repartidas en los distritos de data/mapa_lima.csv) en varias escalas.
+#   2. La base de datos se reemplaza por un SnapshotOfertas en memoria.
+#   3. Por etapa (ofertas, ponderar, filtrar, cada solver, recomendar) se
+#      registra: tiempo (mediana de varias repeticiones, tras una de
+#      calentamiento), memoria pico (tracemalloc, en una corrida aparte) y
+#      nodos/celdas explorados.
+#      Cada escala mide también una carga fija de NumPy/pandas ("calibracion"):
+#      los tiempos se comparan relativos a ella, así una máquina (o una
+#      corrida) más lenta en general no se confunde con una regresión.
+#   4. Con --guardar se escribe la línea base; sin él se compara contra ella
+#      y el programa termina con código 1 si alguna etapa empeoró (o si no
+#      hay línea base). Un tiempo empeora si pasa de 2x la línea base más
+#      una holgura (1 ms o el 25% de la etapa, lo mayor); los contadores,
+#      que son deterministas, con cualquier aumento. La línea base se versiona en el repositorio:
+#      output/benchmark_linea_base.json.
+#
+# USO (desde la raíz del proyecto):
+#   python app/benchmark_optimizador.py --guardar     # registrar línea base
+#   python app/benchmark_optimizador.py               # comparar (falla si empeora)
+# =============================================================================
+
+RUTA_LINEA_BASE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output',
+                                                'benchmark_linea_base.json'))
+
+# nombre -> (productos en catálogo, tiendas, productos por lista, presupuesto)
+ESCALAS = {
+    'pequena': (30, 8, 10, 40.0),
+    'mediana': (300, 40, 25, 120.0),
+    'grande': (3000, 200, 60, 400.0),
+}
+
+SOLVERS_BENCHMARK = ['exact-bnb', 'dp', 'greedy']
+CONTADORES = ('nodos', 'podados', 'celdas')   # Se suman entre pedidos
+# El consolidado es exponencial en tiendas: se limita para que la corrida dure segundos
+MAX_TIENDAS_CONSOLIDADO = 10
+
+# Tolerancias de comparación contra la línea base
+TOLERANCIA_TIEMPO = 2.0      # x veces la mediana registrada
+HOLGURA_TIEMPO_MS = 1.0      # holgura mínima (ruido en etapas cortas)
+HOLGURA_TIEMPO_RELATIVA = 0.25   # ... o esta fracción del tiempo de la etapa, lo mayor
+TOLERANCIA_MEMORIA = 1.25    # x veces el pico registrado
+
+
+def generar_ofertas_sinteticas(n_productos: int, n_tiendas: int, semilla: int = 42) -> pd.DataFrame:
+    """
+    Ofertas reproducibles con las columnas del JOIN de ofertas. Cada producto
+    se vende en un subconjunto aleatorio de tiendas, con precios alrededor de
+    un precio base propio.
+    """
+    rng = np.random.default_rng(semilla)
+    distritos = sorted(GRAFO_DISTANCIA.nodes)
+    distrito_de_tienda = rng.choice(distritos, size=n_tiendas)
+    base = rng.uniform(1.5, 35.0, size=n_productos)
+
+    productos, tiendas = [], []
+    for p in range(n_productos):
+        cuantas = int(rng.integers(1, max(2, n_tiendas // 2) + 1))
+        elegidas = rng.choice(n_tiendas, size=min(cuantas, n_tiendas), replace=False)
+        productos.append(np.full(len(elegidas), p))
+        tiendas.append(elegidas)
+    productos = np.concatenate(productos)
+    tiendas = np.concatenate(tiendas)
+    precios = np.round(base[productos] * rng.uniform(0.8, 1.3, size=len(productos)), 2)
+
+    return pd.DataFrame({
+        'producto': [f'Producto {p:05d}' for p in productos],
+        'precio_producto': precios,
+        'nombre_tienda': [f'Tienda {t:04d}' for t in tiendas],
+        'id_tienda': tiendas + 1,
+        'distrito_tienda': distrito_de_tienda[tiendas],
+    })
+
+
+def generar_pedidos_benchmark(catalogo: List[str], por_lista: int, presupuesto: float,
+                              total: int = 5, semilla: int = 7) -> List[Tuple[List[str], str, float]]:
+    """ Listas de compra reproducibles (productos, distrito, presupuesto). """
+    rng = np.random.default_rng(semilla)
+    distritos = sorted(GRAFO_DISTANCIA.nodes)
+    return [
+        (list(rng.choice(catalogo, size=min(por_lista, len(catalogo)), replace=False)),
+         str(rng.choice(distritos)), presupuesto)
+        for _ in range(total)
+    ]
+
+
+def medir(funcion: Callable[[], object], repeticiones: int) -> Dict[str, float]:
+    """ Mediana del tiempo (ms) y memoria pico (KiB) de una función sin argumentos. """
+    funcion()   # Calentamiento (cachés de pandas/NumPy, asignaciones iniciales)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    # La memoria se mide aparte: tracemalloc hace más lento el código
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'tiempo_ms': float(np.median(tiempos)), 'memoria_kib': pico / 1024}
+
+
+def carga_calibracion(semilla: int = 7) -> Callable[[], object]:
+    """ Trabajo fijo parecido al del pipeline (groupby + orden); no depende del código medido. """
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame({'producto': rng.integers(0, 2000, 50_000), 'precio': rng.random(50_000)})
+    valores = rng.random(200_000)
+    return lambda: (df.groupby('producto')['precio'].idxmin(), np.sort(valores))
+
+
+def medir_escala(escala: str, repeticiones: int, semilla: int = 42) -> Dict[str, Dict]:
+    """ Corre todas las etapas del pipeline para una escala; devuelve {etapa: métricas}. """
+    n_productos, n_tiendas, por_lista, presupuesto = ESCALAS[escala]
+    snapshot = SnapshotOfertas(generar_ofertas_sinteticas(n_productos, n_tiendas, semilla), version=1)
+    pedidos = generar_pedidos_benchmark(list(snapshot.tramos), por_lista, presupuesto)
+    matriz = obtener_matriz_distancias()
+
+    # Entradas de cada etapa (precalculadas para medirlas por separado)
+    crudas = [snapshot.ofertas(lista) for lista, _, _ in pedidos]
+    ponderadas = [ponderar_ofertas(df.copy(), d, matriz) for df, (_, d, _) in zip(crudas, pedidos)]
+    filtradas = [filtrar_mejor_por_producto(df) for df in ponderadas]
+
+    etapas: Dict[str, Tuple[Callable[[], object], Optional[Callable[[], Dict]]]] = {
+        'calibracion': (carga_calibracion(), None),
+        'ofertas': (lambda: [snapshot.ofertas(lista) for lista, _, _ in pedidos], None),
+        'ponderar': (lambda: [ponderar_ofertas(df.copy(), d, matriz)
+                              for df, (_, d, _) in zip(crudas, pedidos)], None),
+        'filtrar': (lambda: [filtrar_mejor_por_producto(df) for df in ponderadas], None),
+    }
+
+    def _acumular(estadisticas: Dict, parcial: Dict) -> None:
+        for clave in CONTADORES:
+            if clave in parcial:
+                estadisticas[clave] = estadisticas.get(clave, 0) + int(parcial[clave])
+        if 'completo' in parcial:
+            estadisticas['completo'] = estadisticas.get('completo', True) and bool(parcial['completo'])
+
+    def _solver(nombre):
+        def correr(estadisticas=None):
+            for df, (_, _, p) in zip(filtradas, pedidos):
+                parcial = {}
+                resolver_canasta(df, p, solver=nombre, estadisticas=parcial)
+                if estadisticas is not None:
+                    _acumular(estadisticas, parcial)
+        return correr
+
+    for nombre in SOLVERS_BENCHMARK:
+        correr = _solver(nombre)
+        etapas[f'solver:{nombre}'] = (correr, correr)
+
+    def _consolidado(estadisticas=None):
+        for df, (_, _, p) in zip(ponderadas, pedidos):
+            parcial = {}
+            resolver_canasta_consolidada(df, p, MAX_TIENDAS_CONSOLIDADO, estadisticas=parcial)
+            if estadisticas is not None:
+                _acumular(estadisticas, parcial)
+    etapas['solver:consolidado'] = (_consolidado, _consolidado)
+
+    etapas['recomendar'] = (lambda: [snapshot.recomendar(p * 0.25, set(lista), k=5)
+                                     for lista, _, p in pedidos], None)
+
+    resultados = {}
+    for etapa, (funcion, con_estadisticas) in etapas.items():
+        metricas = medir(funcion, repeticiones)
+        if con_estadisticas is not None:
+            contadores = {}
+            con_estadisticas(contadores)
+            metricas.update(contadores)
+        resultados[etapa] = metricas
+    return resultados
+
+
+def comparar(actual: Dict[str, Dict[str, Dict]], linea_base: Dict[str, Dict[str, Dict]]) -> List[str]:
+    """
+    Lista de regresiones (texto) de `actual` frente a la línea base. Los
+    tiempos de la línea base se escalan por calibracion actual / registrada.
+    """
+    regresiones = []
+    for escala, etapas in actual.items():
+        calibracion = etapas.get('calibracion')
+        calibracion_base = linea_base.get(escala, {}).get('calibracion')
+        factor = 1.0
+        if calibracion is not None and calibracion_base is not None:
+            factor = calibracion['tiempo_ms'] / calibracion_base['tiempo_ms']
+        for etapa, metricas in etapas.items():
+            base = linea_base.get(escala, {}).get(etapa)
+            if base is None or etapa == 'calibracion':
+                continue
+            t, t0 = metricas['tiempo_ms'], base['tiempo_ms'] * factor
+            if t > t0 * TOLERANCIA_TIEMPO + max(HOLGURA_TIEMPO_MS, HOLGURA_TIEMPO_RELATIVA * t0):
+                regresiones.append(f"{escala}/{etapa}: tiempo {t0:.2f} -> {t:.2f} ms")
+            m, m0 = metricas['memoria_kib'], base['memoria_kib']
+            if m > m0 * TOLERANCIA_MEMORIA and m - m0 > 64:
+                regresiones.append(f"{escala}/{etapa}: memoria {m0:.0f} -> {m:.0f} KiB")
+            # Los contadores son deterministas: cualquier aumento es una regresión
+            for clave in ('nodos', 'celdas'):
+                if clave in metricas and clave in base and metricas[clave] > base[clave]:
+                    regresiones.append(f"{escala}/{etapa}: {clave} {base[clave]} -> {metricas[clave]}")
+            if base.get('completo') and metricas.get('completo') is False:
+                regresiones.append(f"{escala}/{etapa}: la búsqueda ya no termina (completo -> False)")
+    return regresiones
+
+
+def imprimir_tabla(resultados: Dict[str, Dict[str, Dict]]) -> None:
+    print(f"{'escala':<8} {'etapa':<20} {'ms':>9} {'KiB pico':>10} {'nodos':>9} {'podados':>9} {'celdas':>11}")
+    for escala, etapas in resultados.items():
+        for etapa, m in etapas.items():
+            print(f"{escala:<8} {etapa:<20} {m['tiempo_ms']:>9.2f} {m['memoria_kib']:>10.0f} "
+                  f"{m.get('nodos', ''):>9} {m.get('podados', ''):>9} {m.get('celdas', ''):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del optimizador de canastas.")
+    parser.add_argument('--escalas', nargs='+', default=list(ESCALAS), choices=list(ESCALAS))
+    parser.add_argument('--repeticiones', type=int, default=11)
+    parser.add_argument('--linea-base', default=RUTA_LINEA_BASE)
+    parser.add_argument('--guardar', action='store_true', help='Guardar los resultados como nueva línea base')
+    args = parser.parse_args()
+
+    resultados = {escala: medir_escala(escala, args.repeticiones) for escala in args.escalas}
+    imprimir_tabla(resultados)
+
+    if args.guardar:
+        carpeta = os.path.dirname(args.linea_base)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(args.linea_base, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2, sort_keys=True)
+        print(f"💾 Línea base guardada en {args.linea_base}")
+        return
+
+    if not os.path.exists(args.linea_base):
+        print(f"❌ No hay línea base en {args.linea_base} (use --guardar para crearla).")
+        sys.exit(1)
+    with open(args.linea_base, encoding='utf-8') as archivo:
+        linea_base = json.load(archivo)
+    regresiones = comparar(resultados, linea_base)
+    if regresiones:
+        print("❌ Regresiones de rendimiento:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        sys.exit(1)
+    print("✅ Sin regresiones frente a la línea base.")
+
+
+if __name__ == "__main__":
+    main()
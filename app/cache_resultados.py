@@ -0,0 +1,232 @@
+import hashlib
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# =============================================================================
+# CACHÉ DE RESULTADOS DE OPTIMIZACIÓN (Memoización por pedido normalizado)
+# =============================================================================
+# OBJETIVO:
+#   Muchas familias del mismo distrito piden listas casi idénticas; no tiene
+#   sentido recalcular la misma canasta cada vez.
+#
+# CÓMO FUNCIONA:
+#   1. Clave normalizada: (productos ordenados sin repetir, distrito,
+#      presupuesto redondeado HACIA ABAJO a un "balde" configurable, solver,
+#      objetivo, cantidades/prioridades, versión de las ofertas, firma del
+#      mapa de distancias).
+#      Con balde > S/ 0.01 la canasta se calcula con el piso del balde: sigue
+#      siendo válida para cualquier presupuesto del balde (el vuelto se
+#      recalcula con el presupuesto real).
+#   2. Nivel 1: LRU en memoria (OrderedDict) con capacidad máxima.
+#   3. Nivel 2 (opcional): tabla SQLite en disco compartida por varios
+#      procesos (workers del lote); un acierto en disco sube a memoria.
+#   4. Invalidación por contenido: la "versión" de las ofertas es una huella
+#      de los precios/tiendas de los productos pedidos (SnapshotOfertas.huella
+#      o huella_ofertas_sql), no un contador del proceso. Si cambia un precio
+#      cambia la clave; un proceso nuevo con las mismas ofertas reutiliza lo
+#      del disco. Varias versiones conviven (workers con snapshots distintos
+#      no se borran entre sí): las filas más antiguas se descartan cuando el
+#      disco supera `capacidad_disco`.
+#
+# USO:
+#   cache = CacheResultados(capacidad=10_000, balde=0.50, ruta_compartida='output/cache.sqlite')
+#   optimizador = OptimizadorCanasta(indice_ofertas=indice, cache=cache)
+# =============================================================================
+
+
+PODA_CADA = 1000   # Escrituras de un proceso entre podas del disco
+
+
+class CacheResultados:
+    """ Caché LRU (memoria + SQLite opcional) de resultados de optimizar. """
+
+    def __init__(self, capacidad: int = 4096, balde: float = 0.01, ruta_compartida: Optional[str] = None,
+                 capacidad_disco: int = 200_000):
+        if capacidad <= 0:
+            raise ValueError("La capacidad del caché debe ser mayor a 0")
+        if capacidad_disco <= 0:
+            raise ValueError("La capacidad del disco debe ser mayor a 0")
+        if balde < 0.01:
+            raise ValueError("El balde de presupuesto mínimo es S/ 0.01")
+        self.capacidad = capacidad
+        self.balde_centimos = int(round(balde * 100))
+        self.ruta_compartida = ruta_compartida
+        self.capacidad_disco = capacidad_disco
+        self._memoria: 'OrderedDict[str, Tuple]' = OrderedDict()
+        self._candado = threading.Lock()
+        self._escrituras = 0
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self.estadisticas = {'aciertos': 0, 'aciertos_disco': 0, 'fallos': 0, 'desalojos': 0, 'invalidaciones': 0}
+
+    # --- Clave ---
+    def presupuesto_balde(self, presupuesto: float) -> float:
+        """ Piso del balde en soles (con balde de S/ 0.01 es el mismo presupuesto). """
+        centimos = math.floor(presupuesto * 100 / self.balde_centimos + 1e-9) * self.balde_centimos
+        return centimos / 100
+
+    def clave(self, productos: Iterable[str], distrito: str, presupuesto: float, version_ofertas,
+              firma_mapa: str, **parametros) -> str:
+        normalizado = {
+            'productos': sorted(set(productos)),
+            'distrito': distrito,
+            'presupuesto_c': int(round(self.presupuesto_balde(presupuesto) * 100)),
+            'version': version_ofertas,
+            'mapa': firma_mapa,
+            'parametros': {k: sorted(v.items()) if isinstance(v, dict) else v
+                           for k, v in sorted(parametros.items())},
+        }
+        return hashlib.sha1(json.dumps(normalizado, default=str).encode('utf-8')).hexdigest()
+
+    # --- Disco compartido ---
+    def _disco(self) -> Optional[sqlite3.Connection]:
+        if self.ruta_compartida is None:
+            return None
+        # Una conexión por proceso (los workers heredan el objeto al hacer fork)
+        if self._conexion is None or self._pid != os.getpid():
+            carpeta = os.path.dirname(self.ruta_compartida)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            self._conexion = sqlite3.connect(self.ruta_compartida, timeout=30, check_same_thread=False)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                " clave TEXT PRIMARY KEY, vigencia TEXT NOT NULL, valor BLOB NOT NULL, creado REAL NOT NULL)")
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS resultados_creado ON resultados (creado)")
+            self._pid = os.getpid()
+        return self._conexion
+
+    def __getstate__(self):
+        # Para enviarlo a otros procesos: sin conexión ni candado
+        estado = self.__dict__.copy()
+        estado.update(_conexion=None, _pid=None, _candado=None, _memoria=OrderedDict())
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._candado = threading.Lock()
+
+    # --- Tamaño del disco (las versiones viejas salen por antigüedad) ---
+    def _podar_disco(self, disco: sqlite3.Connection) -> None:
+        """ Llamar con el candado tomado. Deja solo las `capacidad_disco` filas más recientes. """
+        with disco:
+            borradas = disco.execute(
+                "DELETE FROM resultados WHERE creado < (SELECT creado FROM resultados "
+                "ORDER BY creado DESC LIMIT 1 OFFSET ?)", (self.capacidad_disco - 1,)).rowcount
+        self.estadisticas['desalojos'] += max(borradas, 0)
+
+    def invalidar(self) -> None:
+        """ Vacía la memoria y el disco compartido. """
+        with self._candado:
+            self._memoria.clear()
+            self.estadisticas['invalidaciones'] += 1
+            disco = self._disco()
+            if disco is not None:
+                with disco:
+                    disco.execute("DELETE FROM resultados")
+
+    # --- Lectura / escritura ---
+    def obtener_o_calcular(self, clave: str, vigencia: Tuple, calcular: Callable[[], Tuple]) -> Tuple:
+        """
+        `vigencia` (versión de ofertas, firma del mapa) ya está dentro de la
+        clave; aquí solo se guarda junto a la fila del disco como referencia.
+        """
+        with self._candado:
+            valor = self._memoria.get(clave)
+            if valor is not None:
+                self._memoria.move_to_end(clave)
+                self.estadisticas['aciertos'] += 1
+                return valor
+            disco = self._disco()
+            if disco is not None:
+                fila = disco.execute("SELECT valor FROM resultados WHERE clave = ?", (clave,)).fetchone()
+                if fila is not None:
+                    valor = pickle.loads(fila[0])
+                    self._guardar_memoria(clave, valor)
+                    self.estadisticas['aciertos_disco'] += 1
+                    return valor
+            self.estadisticas['fallos'] += 1
+
+        # El cálculo va fuera del candado (otros hilos siguen atendiendo aciertos)
+        valor = calcular()
+        with self._candado:
+            self._guardar_memoria(clave, valor)
+            disco = self._disco()
+            if disco is not None:
+                with disco:
+                    disco.execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)",
+                                  (clave, repr(vigencia), pickle.dumps(valor), time.time()))
+                self._escrituras += 1
+                if self._escrituras % PODA_CADA == 0:
+                    self._podar_disco(disco)
+        return valor
+
+    def _guardar_memoria(self, clave: str, valor: Tuple) -> None:
+        self._memoria[clave] = valor
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.capacidad:
+            self._memoria.popitem(last=False)
+            self.estadisticas['desalojos'] += 1
+
+    def __len__(self):
+        return len(self._memoria)
+
+    def resumen(self) -> Dict:
+        with self._candado:
+            consultas = self.estadisticas['aciertos'] + self.estadisticas['aciertos_disco'] + self.estadisticas['fallos']
+            aciertos = self.estadisticas['aciertos'] + self.estadisticas['aciertos_disco']
+            return dict(self.estadisticas, entradas=len(self._memoria),
+                        tasa_aciertos=aciertos / consultas if consultas else 0.0)
+
+
+# --- PRUEBA: REINICIOS Y WORKERS CON OFERTAS DISTINTAS ---
+def _proceso_con_precio(ruta: str, precio_arroz: float) -> Tuple[float, Dict]:
+    """ Un proceso "nuevo" (contador de versiones desde 1) con su propio snapshot. """
+    import pandas as pd
+    from algoritmo_backtracking import OptimizadorCanasta
+    from indice_ofertas import SnapshotOfertas
+
+    ofertas = pd.DataFrame({
+        'producto': ['Arroz', 'Leche', 'Pan'],
+        'precio_producto': [precio_arroz, 4.0, 0.5],
+        'nombre_tienda': ['Metro', 'Metro', 'Wong'],
+        'id_tienda': [1, 1, 2],
+        'distrito_tienda': ['Miraflores', 'Miraflores', 'Barranco'],
+    })
+    cache = CacheResultados(ruta_compartida=ruta)
+    optimizador = OptimizadorCanasta(indice_ofertas=SnapshotOfertas(ofertas, version=1), cache=cache)
+    canasta = optimizador.optimizar(50.0, ['Arroz', 'Leche', 'Pan'], 'Miraflores')[0]
+    precio = next(item['precio_producto'] for item in canasta if item['producto'] == 'Arroz')
+    return precio, cache.resumen()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import tempfile
+
+    ruta = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+    # 'spawn': cada corrida es un intérprete nuevo, como relanzar el lote
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(1) as pool:
+        corridas = [pool.apply(_proceso_con_precio, (ruta, precio)) for precio in (5.0, 9.0, 5.0, 9.0)]
+    for (precio, resumen), esperado in zip(corridas, (5.0, 9.0, 5.0, 9.0)):
+        assert precio == esperado, (precio, esperado)
+    assert corridas[1][1]['fallos'] == 1, "Otro precio con la misma versión de proceso: no debe haber acierto"
+    assert corridas[2][1]['aciertos_disco'] == 1, "La versión anterior debe seguir en disco"
+    assert corridas[3][1]['aciertos_disco'] == 1
+    print("✅ Reinicio: un precio nuevo no reutiliza la canasta vieja y las dos versiones conviven en disco.")
+
+    # Poda: el disco se queda con las filas más recientes
+    cache = CacheResultados(ruta_compartida=os.path.join(os.path.dirname(ruta), 'poda.sqlite'), capacidad_disco=50)
+    for i in range(PODA_CADA):
+        cache.obtener_o_calcular(f'clave{i}', ('v', i), lambda: (i,))
+    filas = cache._disco().execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+    assert filas == 50 and cache.obtener_o_calcular(f'clave{PODA_CADA - 1}', None, lambda: None) == (PODA_CADA - 1,)
+    print(f"✅ Poda del disco: {filas} filas de {PODA_CADA} escrituras (capacidad_disco=50).")
@@ -0,0 +1,338 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from conexion_neo4j import AUTH, URI, crear_driver
+from grafo_compras import tablas_grafo
+from ingesta_compras import GrafoAcumulado
+
+# =============================================================================
+# CARGA MASIVA DEL GRAFO DE COMPRAS A NEO4J (UNWIND por lotes + sesiones en paralelo)
+# =============================================================================
+# OBJETIVO:
+#   Llevar familias, productos, tiendas y sus relaciones de compra a Neo4j
+#   (hasta ahora el grafo solo existía en networkx / GEXF). Un CREATE por fila
+#   serían millones de viajes de ida y vuelta al servidor.
+#
+# CÓMO FUNCIONA:
+#   1. Se parte de las tablas (nodos, aristas) de grafo_compras.py (o del
+#      estado de ingesta_compras.py): ya vienen agregadas, `weight` = compras.
+#   2. Primero las restricciones de unicidad (`nombre` por etiqueta): hacen el
+#      MERGE idempotente y le dan índice a los MATCH de las relaciones.
+#   3. Cada lote es UNA consulta parametrizada (`UNWIND $filas AS fila MERGE ...`)
+#      con `tamano_lote` filas: la consulta es siempre el mismo texto, Neo4j
+#      reutiliza el plan y no hay Cypher armado con strings de datos.
+#   4. Un solo driver (pool de conexiones, conexion_neo4j.py); cada lote se
+#      escribe en su propia sesión desde un ThreadPoolExecutor con `sesiones`
+#      hilos. Primero todos los nodos, luego las relaciones (ordenadas por
+#      nodo de origen para que lotes paralelos casi no compartan bloqueos;
+#      `execute_write` reintenta los deadlocks transitorios).
+#   5. Relaciones: Familia -[:COMPRO]-> Producto, Producto -[:VENDIDO_EN]->
+#      Tienda, Familia -[:COMPRA_EN]-> Tienda, con `veces` = compras. Se usa
+#      SET (no suma): cargar dos veces deja el mismo grafo.
+#   6. Sin servidor: `DriverGrabador` imita driver/sesión/transacción y guarda
+#      los lotes enviados (con una latencia simulada opcional por lote).
+#
+# USO (desde la raíz del proyecto):
+#   python app/carga_neo4j.py --simular                    # sin Neo4j: verifica los lotes
+#   python app/carga_neo4j.py --lote 20000 --sesiones 8    # contra bolt://localhost:7687
+#   python app/carga_neo4j.py --estado output/grafo_compras_estado.npz
+# =============================================================================
+
+ETIQUETAS = ('Familia', 'Producto', 'Tienda')
+RELACIONES = {('Familia', 'Producto'): 'COMPRO',
+              ('Producto', 'Tienda'): 'VENDIDO_EN',
+              ('Familia', 'Tienda'): 'COMPRA_EN'}
+TAMANO_LOTE = 10_000
+SESIONES = 4
+
+
+# --- Cypher (siempre el mismo texto; los datos van en $filas) ---
+def consulta_restriccion(etiqueta: str) -> str:
+    return (f"CREATE CONSTRAINT {etiqueta.lower()}_nombre IF NOT EXISTS "
+            f"FOR (n:{etiqueta}) REQUIRE n.nombre IS UNIQUE")
+
+
+def consulta_nodos(etiqueta: str) -> str:
+    return f"UNWIND $filas AS fila MERGE (n:{etiqueta} {{nombre: fila.nombre}})"
+
+
+def consulta_relaciones(origen: str, tipo: str, destino: str) -> str:
+    return (f"UNWIND $filas AS fila "
+            f"MATCH (a:{origen} {{nombre: fila.origen}}) MATCH (b:{destino} {{nombre: fila.destino}}) "
+            f"MERGE (a)-[r:{tipo}]->(b) SET r.veces = fila.veces")
+
+
+# --- Filas a cargar ---
+def preparar_filas(nodos: pd.DataFrame, aristas: pd.DataFrame):
+    """
+    Agrupa nodos por etiqueta y aristas por tipo de relación:
+      ({etiqueta: [{'nombre'}]}, {(origen, tipo, destino): [{'origen', 'destino', 'veces'}]}, omitidas)
+    Se omiten nodos sin nombre (NaN: Neo4j no hace MERGE sobre null) y
+    aristas entre tipos sin relación definida (nombre repetido entre columnas).
+    """
+    nombres = nodos['nombre'].to_numpy(dtype=object)
+    tipos = nodos['tipo'].to_numpy(dtype=object)
+    validos = np.array([isinstance(nombre, str) for nombre in nombres], dtype=bool)
+
+    filas_nodos = {etiqueta: [{'nombre': nombre} for nombre in nombres[validos & (tipos == etiqueta)]]
+                   for etiqueta in ETIQUETAS}
+
+    origen, destino = aristas['origen'].to_numpy(), aristas['destino'].to_numpy()
+    veces = aristas['weight'].to_numpy()
+    usables = validos[origen] & validos[destino]
+    filas_relaciones = {}
+    for (tipo_a, tipo_b), relacion in RELACIONES.items():
+        # La tabla guarda (menor, mayor) por índice: el sentido sale de los tipos
+        directas = usables & (tipos[origen] == tipo_a) & (tipos[destino] == tipo_b)
+        invertidas = usables & (tipos[origen] == tipo_b) & (tipos[destino] == tipo_a)
+        a = np.concatenate([origen[directas], destino[invertidas]])
+        b = np.concatenate([destino[directas], origen[invertidas]])
+        v = np.concatenate([veces[directas], veces[invertidas]])
+        orden = np.argsort(a, kind='stable')   # Lotes agrupados por nodo de origen
+        filas_relaciones[(tipo_a, relacion, tipo_b)] = [
+            {'origen': x, 'destino': y, 'veces': int(n)}
+            for x, y, n in zip(nombres[a[orden]], nombres[b[orden]], v[orden].tolist())]
+
+    cargadas = sum(len(filas) for filas in filas_relaciones.values())
+    omitidas = {'nodos': int((~validos).sum()), 'relaciones': len(aristas) - cargadas}
+    return filas_nodos, filas_relaciones, omitidas
+
+
+def _lotes(consulta: str, filas: List[Dict], tamano_lote: int) -> List[Tuple[str, List[Dict]]]:
+    return [(consulta, filas[i:i + tamano_lote]) for i in range(0, len(filas), tamano_lote)]
+
+
+# --- Escritura ---
+def _ejecutar(tx, consulta: str, filas: List[Dict]) -> None:
+    tx.run(consulta, filas=filas).consume()
+
+
+def _escribir_lote(driver, database: Optional[str], consulta: str, filas: List[Dict]) -> int:
+    # Sesión por lote: liviana, toma una conexión del pool del driver
+    with driver.session(database=database) as sesion:
+        sesion.execute_write(_ejecutar, consulta, filas)
+    return len(filas)
+
+
+def crear_restricciones(driver, database: Optional[str] = None) -> None:
+    """ Unicidad de `nombre` por etiqueta (idempotente: IF NOT EXISTS). """
+    with driver.session(database=database) as sesion:
+        for etiqueta in ETIQUETAS:
+            sesion.run(consulta_restriccion(etiqueta)).consume()
+
+
+def _etapa(driver, database, lotes, sesiones: int) -> Dict:
+    inicio = time.perf_counter()
+    if sesiones <= 1:
+        filas = sum(_escribir_lote(driver, database, consulta, lote) for consulta, lote in lotes)
+    else:
+        with ThreadPoolExecutor(max_workers=sesiones) as pool:
+            filas = sum(pool.map(lambda tarea: _escribir_lote(driver, database, *tarea), lotes))
+    segundos = time.perf_counter() - inicio
+    return {'filas': filas, 'lotes': len(lotes), 'segundos': segundos,
+            'filas_por_segundo': filas / segundos if segundos > 0 else 0.0}
+
+
+def cargar_grafo(driver, nodos: pd.DataFrame, aristas: pd.DataFrame, tamano_lote: int = TAMANO_LOTE,
+                 sesiones: int = SESIONES, database: Optional[str] = None,
+                 estadisticas: Optional[Dict] = None) -> Dict:
+    """
+    Carga (nodos, aristas) con MERGE por lotes. Devuelve estadísticas:
+    {'nodos': {...}, 'relaciones': {...}, 'omitidas': {...}, 'segundos', 'filas_por_segundo'}
+    con filas, lotes, segundos y filas_por_segundo por etapa.
+    """
+    estadisticas = estadisticas if estadisticas is not None else {}
+    inicio = time.perf_counter()
+    filas_nodos, filas_relaciones, omitidas = preparar_filas(nodos, aristas)
+    crear_restricciones(driver, database)
+
+    lotes_nodos = [lote for etiqueta, filas in filas_nodos.items()
+                   for lote in _lotes(consulta_nodos(etiqueta), filas, tamano_lote)]
+    lotes_relaciones = [lote for clave, filas in filas_relaciones.items()
+                        for lote in _lotes(consulta_relaciones(*clave), filas, tamano_lote)]
+    # Las relaciones hacen MATCH sobre los nodos: la etapa de nodos termina antes
+    estadisticas['nodos'] = _etapa(driver, database, lotes_nodos, sesiones)
+    estadisticas['relaciones'] = _etapa(driver, database, lotes_relaciones, sesiones)
+
+    segundos = time.perf_counter() - inicio
+    filas = estadisticas['nodos']['filas'] + estadisticas['relaciones']['filas']
+    estadisticas.update(omitidas=omitidas, segundos=segundos,
+                        filas_por_segundo=filas / segundos if segundos > 0 else 0.0)
+    return estadisticas
+
+
+# --- Driver de prueba (sin servidor) ---
+class _ResultadoGrabado:
+    def consume(self):
+        return None
+
+
+class _TransaccionGrabada:
+    def __init__(self, driver: 'DriverGrabador'):
+        self._driver = driver
+
+    def run(self, consulta: str, **parametros):
+        self._driver._registrar(consulta, parametros)
+        return _ResultadoGrabado()
+
+
+class _SesionGrabada:
+    def __init__(self, driver: 'DriverGrabador', database: Optional[str]):
+        self._driver = driver
+        self.database = database
+
+    def __enter__(self):
+        self._driver._abrir_sesion()
+        return self
+
+    def __exit__(self, *_):
+        self._driver._cerrar_sesion()
+
+    def run(self, consulta: str, **parametros):
+        return _TransaccionGrabada(self._driver).run(consulta, **parametros)
+
+    def execute_write(self, funcion, *args, **kwargs):
+        return funcion(_TransaccionGrabada(self._driver), *args, **kwargs)
+
+
+class DriverGrabador:
+    """
+    Reemplazo local del driver de neo4j: guarda cada consulta con sus
+    parámetros en `consultas` y cuenta cuántas sesiones estuvieron abiertas
+    a la vez. `latencia` (segundos por consulta) simula el viaje al servidor.
+    `responder(consulta, parametros)` da los registros de las lecturas.
+    """
+
+    def __init__(self, latencia: float = 0.0, responder: Optional[Callable[[str, Dict], List[Dict]]] = None):
+        self.latencia = latencia
+        self.responder = responder
+        self.consultas: List[Tuple[str, Dict]] = []
+        self.sesiones_abiertas = 0
+        self.max_sesiones_simultaneas = 0
+        self._candado = threading.Lock()
+
+    def session(self, database: Optional[str] = None, **_):
+        return _SesionGrabada(self, database)
+
+    def execute_query(self, consulta: str, parametros: Optional[Dict] = None, **_):
+        """ Lecturas (consulta_grafo.py): se graban igual; registros de `responder` (o ninguno). """
+        parametros = dict(parametros or {})
+        self._registrar(consulta, parametros)
+        registros = self.responder(consulta, parametros) if self.responder else []
+        return registros, None, list(registros[0].keys()) if registros else []
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        return None
+
+    @property
+    def lotes(self) -> List[Tuple[str, List[Dict]]]:
+        """ Solo las consultas con $filas (sin las restricciones). """
+        return [(consulta, parametros['filas']) for consulta, parametros in self.consultas if 'filas' in parametros]
+
+    def _registrar(self, consulta: str, parametros: Dict) -> None:
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._candado:
+            self.consultas.append((consulta, parametros))
+
+    def _abrir_sesion(self) -> None:
+        with self._candado:
+            self.sesiones_abiertas += 1
+            self.max_sesiones_simultaneas = max(self.max_sesiones_simultaneas, self.sesiones_abiertas)
+
+    def _cerrar_sesion(self) -> None:
+        with self._candado:
+            self.sesiones_abiertas -= 1
+
+
+def verificar_lotes(driver: DriverGrabador, nodos: pd.DataFrame, aristas: pd.DataFrame, tamano_lote: int) -> None:
+    """
+    Lo grabado reconstruye exactamente las filas a cargar (cada una una vez,
+    lotes <= tamano_lote), y en orden: restricciones, nodos, relaciones.
+    """
+    filas_nodos, filas_relaciones, _ = preparar_filas(nodos, aristas)
+    esperado = {consulta_nodos(e): filas for e, filas in filas_nodos.items()}
+    esperado.update({consulta_relaciones(*clave): filas for clave, filas in filas_relaciones.items()})
+    grabado = {consulta: [] for consulta in esperado}
+    for consulta, filas in driver.lotes:
+        assert 0 < len(filas) <= tamano_lote, f"Lote de {len(filas)} filas"
+        grabado[consulta].extend(filas)
+    clave = lambda fila: tuple(sorted(fila.items()))
+    for consulta, filas in esperado.items():
+        assert sorted(map(clave, grabado[consulta])) == sorted(map(clave, filas)), consulta
+    restricciones = {consulta for consulta, parametros in driver.consultas if not parametros}
+    assert restricciones == {consulta_restriccion(e) for e in ETIQUETAS}
+
+    # Orden: restricciones -> todos los nodos -> relaciones (los MATCH necesitan los nodos)
+    con_filas = [i for i, (_, parametros) in enumerate(driver.consultas) if 'filas' in parametros]
+    posiciones_restricciones = [i for i, (_, parametros) in enumerate(driver.consultas) if not parametros]
+    assert not con_filas or max(posiciones_restricciones) < con_filas[0], "Datos enviados antes de las restricciones"
+    consultas_nodos = set(map(consulta_nodos, ETIQUETAS))
+    posiciones_nodos = [i for i in con_filas if driver.consultas[i][0] in consultas_nodos]
+    posiciones_relaciones = [i for i in con_filas if driver.consultas[i][0] not in consultas_nodos]
+    assert not posiciones_nodos or not posiciones_relaciones or max(posiciones_nodos) < min(posiciones_relaciones), \
+        "Relaciones enviadas antes de terminar los nodos"
+
+
+def _resumen(estadisticas: Dict) -> str:
+    return (f"nodos {estadisticas['nodos']['filas']:,} en {estadisticas['nodos']['lotes']} lotes "
+            f"({estadisticas['nodos']['filas_por_segundo']:,.0f} filas/s) | "
+            f"relaciones {estadisticas['relaciones']['filas']:,} en {estadisticas['relaciones']['lotes']} lotes "
+            f"({estadisticas['relaciones']['filas_por_segundo']:,.0f} filas/s) | "
+            f"total {estadisticas['segundos']:.2f} s ({estadisticas['filas_por_segundo']:,.0f} filas/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva del grafo de compras a Neo4j.")
+    parser.add_argument('--csv', default=os.path.join('data', 'dataset_compras_completo.csv'))
+    parser.add_argument('--estado', default=None, help='Usar el grafo guardado por ingesta_compras.py (.npz)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por UNWIND')
+    parser.add_argument('--sesiones', type=int, default=SESIONES, help='Sesiones (hilos) en paralelo')
+    parser.add_argument('--uri', default=URI)
+    parser.add_argument('--usuario', default=AUTH[0])
+    parser.add_argument('--clave', default=AUTH[1])
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--simular', action='store_true', help='Sin servidor: DriverGrabador + verificación')
+    parser.add_argument('--latencia', type=float, default=0.005, help='Segundos por lote simulados (--simular)')
+    args = parser.parse_args()
+
+    if args.estado:
+        nodos, aristas = GrafoAcumulado.cargar(args.estado).tablas()
+    else:
+        nodos, aristas = tablas_grafo(pd.read_csv(args.csv))
+    print(f"✅ Grafo: {len(nodos):,} nodos / {len(aristas):,} aristas")
+
+    if not args.simular:
+        driver = crear_driver(args.uri, (args.usuario, args.clave), tamano_pool=max(args.sesiones, 1) + 1)
+        try:
+            driver.verify_connectivity()
+            estadisticas = cargar_grafo(driver, nodos, aristas, args.lote, args.sesiones, args.database)
+        finally:
+            driver.close()
+        print(f"🚀 Cargado en Neo4j: {_resumen(estadisticas)}")
+        return
+
+    # Simulación: mismos lotes, verificados, con 1 sesión vs N en paralelo
+    for sesiones in sorted({1, args.sesiones}):
+        driver = DriverGrabador(latencia=args.latencia)
+        estadisticas = cargar_grafo(driver, nodos, aristas, args.lote, sesiones)
+        verificar_lotes(driver, nodos, aristas, args.lote)
+        print(f"🧪 {sesiones} sesión(es), máx. {driver.max_sesiones_simultaneas} simultáneas: {_resumen(estadisticas)}")
+    if any(estadisticas['omitidas'].values()):
+        print(f"⚠️ Omitidas: {estadisticas['omitidas']['nodos']} nodos sin nombre, "
+              f"{estadisticas['omitidas']['relaciones']} aristas sin relación definida")
+    print("✅ Lotes grabados = filas esperadas (cada una una vez); orden: restricciones, nodos, relaciones.")
+
+
+if __name__ == "__main__":
+    main()
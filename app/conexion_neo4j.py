@@ -1,4 +1,3 @@
-from neo4j import GraphDatabase
 # =============================================================================
 # TÉCNICA: INTEGRACIÓN CON BASE DE DATOS DE GRAFOS (NEO4J) - S13
 # =============================================================================
@@ -12,6 +11,8 @@ from neo4j import GraphDatabase
 #   3. Permite enviar sentencias CYPHER (el lenguaje de los grafos) desde Python
 #      para obtener datos como: "¿Qué productos se venden en esta tienda?" o 
 #      "¿Qué familias compran productos similares?".
+#   4. Un solo driver por proceso: el driver mantiene el pool de conexiones y
+#      cada hilo abre su propia sesión (carga masiva: ver carga_neo4j.py).
 #
 # IMPORTANCIA:
 #   Permite pasar de un análisis visual estático (Gephi) a un sistema de 
@@ -20,12 +21,21 @@ from neo4j import GraphDatabase
 # --- CONFIGURACIÓN ---
 URI = "bolt://localhost:7687"
 AUTH = ("neo4j", "12345678") 
+TAMANO_POOL = 50   # Conexiones máximas del pool (>= sesiones en paralelo)
+
+
+def crear_driver(uri: str = URI, auth=AUTH, tamano_pool: int = TAMANO_POOL):
+    """ Driver con pool de conexiones, compartido por todas las sesiones del proceso. """
+    # Import diferido: la carga se puede probar sin el paquete neo4j (ver carga_neo4j.DriverGrabador)
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(uri, auth=auth, max_connection_pool_size=tamano_pool)
+
 
 def probar_conexion():
     print("🔌 Intentando conectar a Neo4J...")
     try:
         # Conectamos
-        driver = GraphDatabase.driver(URI, auth=AUTH)
+        driver = crear_driver()
         driver.verify_connectivity()
         print("✅ ¡CONEXIÓN EXITOSA CON NEO4J!")
         
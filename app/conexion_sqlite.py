@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+# =============================================================================
+# BASE DE DATOS DE PRUEBA (SQLite en memoria)
+# =============================================================================
+# OBJETIVO:
+#   Tener un reemplazo local de SQL Server para probar el optimizador sin
+#   restaurar el .bak. Se crean las mismas tablas (PRODUCTOS, TIENDAS y
+#   OFERTAS) a partir de los CSV de la carpeta data/.
+#
+# USO:
+#   engine = crear_engine_sqlite()
+#   pd.read_sql("SELECT * FROM OFERTAS", engine)
+# =============================================================================
+
+CARPETA_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def crear_engine_sqlite(ruta: str = ':memory:', carpeta_datos: str = CARPETA_DATOS):
+    """ Crea un engine SQLite con PRODUCTOS, TIENDAS y OFERTAS (precios.csv). """
+    if ruta == ':memory:':
+        # StaticPool: todas las conexiones comparten la misma base en memoria
+        engine = create_engine('sqlite://', poolclass=StaticPool,
+                               connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(f'sqlite:///{ruta}', connect_args={'check_same_thread': False})
+
+    tablas = {
+        'PRODUCTOS': 'productos.csv',
+        'TIENDAS': 'tiendas.csv',
+        'OFERTAS': 'precios.csv',
+    }
+    for tabla, archivo in tablas.items():
+        df = pd.read_csv(os.path.join(carpeta_datos, archivo))
+        df.to_sql(tabla, engine, if_exists='replace', index=False)
+
+    return engine
+
+
+if __name__ == "__main__":
+    engine = crear_engine_sqlite()
+    for tabla in ('PRODUCTOS', 'TIENDAS', 'OFERTAS'):
+        total = pd.read_sql(f"SELECT COUNT(*) AS n FROM {tabla}", engine)['n'].iloc[0]
+        print(f"✅ {tabla}: {total} filas")
@@ -0,0 +1,277 @@
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from motores_canasta import EPSILON, LimiteBusqueda, resolver_branch_and_bound
+
+# =============================================================================
+# CONSOLIDACIÓN DE VIAJES (Traslado por TIENDA visitada, no por ítem)
+# =============================================================================
+# PROBLEMA:
+#   El modelo original suma el traslado hogar -> tienda a CADA producto. Si se
+#   compran 5 cosas en la misma tienda se cobran 5 viajes, el "Total KM" sale
+#   inflado y el optimizador evita concentrar las compras en una tienda.
+#
+# CÓMO FUNCIONA:
+#   1. Se elige un CONJUNTO de tiendas a visitar; cada tienda cobra su
+#      traslado una sola vez y cada producto se compra en la más barata del
+#      conjunto.
+#   2. Para un conjunto fijo, la mejor canasta es greedy: los productos más
+#      baratos mientras alcance el presupuesto (descontando los traslados).
+#   3. Búsqueda por subconjuntos (bitmask/DFS) con podas:
+#      - Dominancia: se descarta una tienda si otra está igual o más cerca y
+#        es igual o más barata en todos los productos.
+#      - Traslados: las tiendas van ordenadas por distancia; si agregar una ya
+#        no cabe en el presupuesto, tampoco caben las siguientes.
+#      - Cota: ni con los mejores precios de todas las tiendas restantes se
+#        supera la mejor canasta encontrada -> se poda la rama.
+#   Objetivo (igual que el original): máxima cantidad de ítems; en empate,
+#   menor costo total (productos + traslados).
+#
+#   Con un LimiteBusqueda (modo anytime) primero se evalúa cada tienda sola
+#   para tener una buena canasta desde el inicio; si el límite corta el DFS
+#   se devuelve la mejor encontrada y la brecha contra la cota de la raíz.
+# =============================================================================
+
+MAX_TIENDAS_CANDIDATAS = 20
+
+
+def _greedy(precios_min: np.ndarray, presupuesto: float) -> Tuple[int, float]:
+    """ (cantidad, costo) de comprar los productos más baratos que alcancen. """
+    disponibles = np.sort(precios_min[np.isfinite(precios_min)])
+    acumulado = np.cumsum(disponibles)
+    cantidad = int(np.searchsorted(acumulado, presupuesto + EPSILON, side='right'))
+    return cantidad, float(acumulado[cantidad - 1]) if cantidad else 0.0
+
+
+def _tiendas_no_dominadas(precios: np.ndarray, distancias: np.ndarray) -> List[int]:
+    """ Índices de tiendas que no son dominadas por otra (más cerca y más barata en todo). """
+    vigentes = []
+    m = len(distancias)
+    for j in range(m):
+        dominada = False
+        for i in range(m):
+            if i == j or distancias[i] > distancias[j] or np.any(precios[i] > precios[j]):
+                continue
+            # Empate exacto: se conserva solo la de menor índice
+            if distancias[i] < distancias[j] or np.any(precios[i] < precios[j]) or i < j:
+                dominada = True
+                break
+        if not dominada:
+            vigentes.append(j)
+    return vigentes
+
+
+class _BusquedaCortada(Exception):
+    pass
+
+
+def resolver_consolidado(precios: np.ndarray, distancias: np.ndarray, presupuesto: float,
+                         estadisticas: Optional[Dict] = None,
+                         limite: Optional[LimiteBusqueda] = None,
+                         al_mejorar: Optional[Callable[[List[int], Dict[int, int], Dict], None]] = None
+                         ) -> Tuple[List[int], Dict[int, int]]:
+    """
+    precios: matriz (tiendas x productos) con np.inf si la tienda no lo vende.
+    distancias: costo de traslado de cada tienda (se cobra una vez si se visita).
+    limite / al_mejorar: modo anytime (ver encabezado).
+    Devuelve (tiendas visitadas, {producto: tienda}).
+    """
+    vigentes = _tiendas_no_dominadas(precios, distancias)
+    orden = sorted(vigentes, key=lambda j: (distancias[j], j))
+    precios_o = precios[orden]
+    distancias_o = distancias[orden]
+    m, n = precios_o.shape
+
+    # Mejor precio posible usando cualquier tienda desde la posición j en adelante
+    sufijo_min = np.full((m + 1, n), np.inf)
+    for j in range(m - 1, -1, -1):
+        sufijo_min[j] = np.minimum(sufijo_min[j + 1], precios_o[j])
+
+    mejor = {'cantidad': 0, 'costo': 0.0, 'conjunto': ()}
+    contador = {'nodos': 0, 'podados': 0}
+    # Cota de la raíz: mejores precios de todas las tiendas y el traslado más barato
+    cota_raiz = _greedy(sufijo_min[0], presupuesto - distancias_o[0])[0] if m else 0
+
+    def asignar(conjunto, cantidad):
+        """ Cada producto elegido en la tienda más barata del conjunto. """
+        if not conjunto:
+            return [], {}
+        sub = precios_o[list(conjunto)]
+        mejor_precio = sub.min(axis=0)
+        tienda_de = sub.argmin(axis=0)
+        elegidos = np.argsort(mejor_precio, kind='stable')[:cantidad]
+        asignacion = {int(p): orden[conjunto[int(tienda_de[p])]] for p in elegidos}
+        visitadas = sorted(set(asignacion.values()), key=lambda j: (distancias[j], j))
+        return visitadas, asignacion
+
+    def evaluar(conjunto, precios_min, traslado):
+        cantidad, costo = _greedy(precios_min, presupuesto - traslado)
+        costo += traslado
+        if cantidad > mejor['cantidad'] or (cantidad == mejor['cantidad'] and costo < mejor['costo'] - EPSILON):
+            mejor.update(cantidad=cantidad, costo=costo, conjunto=conjunto)
+            if al_mejorar is not None:
+                al_mejorar(*asignar(conjunto, cantidad), {'cantidad': cantidad, 'cota_superior': cota_raiz,
+                                                          'brecha': cota_raiz - cantidad, 'definitiva': False})
+
+    def explorar(inicio, conjunto, precios_min, traslado):
+        contador['nodos'] += 1
+        if limite is not None and limite.agotado(contador['nodos']):
+            raise _BusquedaCortada
+        if conjunto:
+            evaluar(conjunto, precios_min, traslado)
+
+        if inicio >= m:
+            return
+        # Cota para cualquier superconjunto: agrega al menos una tienda (la más cercana restante)
+        traslado_min = traslado + distancias_o[inicio]
+        optimista = np.minimum(precios_min, sufijo_min[inicio])
+        cota, costo_cota = _greedy(optimista, presupuesto - traslado_min)
+        if cota < mejor['cantidad'] or (cota == mejor['cantidad'] and
+                                        costo_cota + traslado_min >= mejor['costo'] - EPSILON):
+            contador['podados'] += 1
+            return
+
+        for j in range(inicio, m):
+            if traslado + distancias_o[j] > presupuesto:
+                break  # Ordenadas por distancia: las siguientes tampoco caben
+            explorar(j + 1, conjunto + (j,), np.minimum(precios_min, precios_o[j]), traslado + distancias_o[j])
+
+    completo = True
+    try:
+        if limite is not None:
+            # Modo anytime: cada tienda sola da una buena canasta inicial
+            for j in range(m):
+                if distancias_o[j] <= presupuesto:
+                    evaluar((j,), precios_o[j], distancias_o[j])
+        explorar(0, (), np.full(n, np.inf), 0.0)
+    except _BusquedaCortada:
+        completo = False
+
+    if estadisticas is not None:
+        estadisticas.update(contador)
+        estadisticas['tiendas_candidatas'] = len(distancias)
+        estadisticas['tiendas_no_dominadas'] = m
+        estadisticas['completo'] = completo
+        estadisticas['cota_superior'] = mejor['cantidad'] if completo else max(cota_raiz, mejor['cantidad'])
+        estadisticas['brecha'] = estadisticas['cota_superior'] - mejor['cantidad']
+
+    return asignar(mejor['conjunto'], mejor['cantidad'])
+
+
+def _candidatas(df_ofertas: pd.DataFrame, max_tiendas: int) -> pd.DataFrame:
+    """ Si hay demasiadas tiendas, se quedan las que venden más productos (y más cercanas). """
+    resumen = (df_ofertas.groupby('id_tienda')
+               .agg(productos=('producto', 'nunique'), costo_traslado=('costo_traslado', 'first'))
+               .sort_values(['productos', 'costo_traslado'], ascending=[False, True]))
+    return df_ofertas[df_ofertas['id_tienda'].isin(resumen.index[:max_tiendas])]
+
+
+def resolver_canasta_consolidada(df_ofertas: pd.DataFrame, presupuesto: float,
+                                 max_tiendas: int = MAX_TIENDAS_CANDIDATAS,
+                                 estadisticas: Optional[Dict] = None,
+                                 limite: Optional[LimiteBusqueda] = None,
+                                 al_mejorar: Optional[Callable[[List[Dict], Dict], None]] = None
+                                 ) -> Tuple[List[Dict], List[Dict], float]:
+    """
+    df_ofertas: TODAS las ofertas ponderadas (una fila por producto-tienda).
+    Devuelve (canasta, tiendas a visitar, km totales de traslado).
+    al_mejorar(canasta, info) recibe cada mejora parcial en modo anytime.
+    """
+    if df_ofertas.empty:
+        return [], [], 0.0
+    df = _candidatas(df_ofertas, max_tiendas)
+
+    matriz = df.pivot_table(index='id_tienda', columns='producto', values='precio_producto', aggfunc='min')
+    tiendas = df.drop_duplicates('id_tienda').set_index('id_tienda').loc[matriz.index]
+    precios = matriz.to_numpy(dtype=float, na_value=np.inf)
+    distancias = tiendas['costo_traslado'].to_numpy(dtype=float)
+
+    def armar(visitadas, asignacion):
+        return _armar_resultado(matriz, tiendas, precios, distancias, visitadas, asignacion)
+
+    reportar = None
+    if al_mejorar is not None:
+        def reportar(visitadas, asignacion, info):
+            al_mejorar(armar(visitadas, asignacion)[0], info)
+
+    visitadas, asignacion = resolver_consolidado(precios, distancias, presupuesto, estadisticas, limite, reportar)
+    return armar(visitadas, asignacion)
+
+
+def _armar_resultado(matriz, tiendas, precios, distancias, visitadas, asignacion):
+    canasta = [
+        {
+            'producto': matriz.columns[p],
+            'precio_producto': float(precios[t, p]),
+            'tienda': tiendas['nombre_tienda'].iloc[t],
+            'costo_traslado': float(distancias[t]),
+        }
+        for p, t in sorted(asignacion.items())
+    ]
+    ruta = [
+        {
+            'tienda': tiendas['nombre_tienda'].iloc[t],
+            'distrito': tiendas['distrito_tienda'].iloc[t],
+            'costo_traslado': float(distancias[t]),
+        }
+        for t in visitadas
+    ]
+    return canasta, ruta, float(sum(distancias[t] for t in visitadas))
+
+
+# --- BENCHMARK CONTRA EL MODELO POR ÍTEM ---
+def _ofertas_sinteticas(n_productos: int, n_tiendas: int, semilla: int) -> pd.DataFrame:
+    rng = random.Random(semilla)
+    distancias = {t: rng.randint(0, 15) for t in range(n_tiendas)}
+    filas = []
+    for p in range(n_productos):
+        base = rng.uniform(2, 25)
+        for t in rng.sample(range(n_tiendas), rng.randint(1, n_tiendas)):
+            filas.append({
+                'producto': f'Producto {p:03d}',
+                'precio_producto': round(base * rng.uniform(0.8, 1.3), 2),
+                'nombre_tienda': f'Tienda {t:02d}',
+                'id_tienda': t,
+                'distrito_tienda': f'Distrito {t % 5}',
+                'costo_traslado': float(distancias[t]),
+            })
+    return pd.DataFrame(filas)
+
+
+if __name__ == "__main__":
+    print(f"{'productos':>9} {'tiendas':>7} | {'por ítem: ítems':>15} {'costo real':>10} {'ms':>7} | "
+          f"{'consolidado: ítems':>18} {'costo real':>10} {'ms':>7} {'nodos':>7}")
+    for n_productos, n_tiendas in ((10, 6), (20, 10), (40, 15), (60, 20)):
+        df = _ofertas_sinteticas(n_productos, n_tiendas, semilla=n_productos)
+        presupuesto = 12.0 * n_productos * 0.5
+
+        # Modelo actual: mejor oferta ponderada por producto y traslado por ítem
+        inicio = time.perf_counter()
+        df['precio_total_ponderado'] = df['precio_producto'] + df['costo_traslado']
+        mejores = df.loc[df.groupby('producto')['precio_total_ponderado'].idxmin()].reset_index(drop=True)
+        indices = resolver_branch_and_bound(mejores['precio_total_ponderado'].to_numpy(), presupuesto)
+        t_item = (time.perf_counter() - inicio) * 1000
+        elegidas = mejores.iloc[indices]
+        # Costo real: productos + cada tienda visitada una sola vez
+        costo_item = elegidas['precio_producto'].sum() + elegidas.drop_duplicates('id_tienda')['costo_traslado'].sum()
+
+        estadisticas = {}
+        inicio = time.perf_counter()
+        canasta, ruta, km = resolver_canasta_consolidada(df, presupuesto, estadisticas=estadisticas)
+        t_cons = (time.perf_counter() - inicio) * 1000
+        costo_cons = sum(item['precio_producto'] for item in canasta) + km
+        assert costo_cons <= presupuesto + EPSILON and len(canasta) >= len(indices)
+
+        print(f"{n_productos:>9} {n_tiendas:>7} | {len(indices):>15} {costo_item:>10.2f} {t_item:>7.1f} | "
+              f"{len(canasta):>18} {costo_cons:>10.2f} {t_cons:>7.1f} {estadisticas['nodos']:>7}")
+
+    # Modo anytime: mismo caso grande con un plazo de 50 ms
+    estadisticas = {}
+    canasta, ruta, km = resolver_canasta_consolidada(df, presupuesto, estadisticas=estadisticas,
+                                                     limite=LimiteBusqueda(segundos=0.05))
+    print(f"\n⏱️ Anytime (50 ms): {len(canasta)} ítems, completo={estadisticas['completo']}, "
+          f"brecha <= {estadisticas['brecha']} ítems, {estadisticas['nodos']} nodos")
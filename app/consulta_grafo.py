@@ -0,0 +1,640 @@
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import diags
+
+from grafo_compras import adyacencia_desde_aristas, tablas_grafo
+from ingesta_compras import GrafoAcumulado
+
+# =============================================================================
+# CONSULTAS DE LECTURA SOBRE EL GRAFO DE COMPRAS (Backend CSR o Neo4j + caché)
+# =============================================================================
+# OBJETIVO:
+#   Responder las preguntas de conexion_neo4j.py ("¿qué productos vende esta
+#   tienda?", "¿qué familias compran productos parecidos?") sin un viaje de
+#   red a Neo4j por cada una.
+#
+# CÓMO FUNCIONA:
+#   1. Tres consultas, siempre por lotes (lista de nodos -> dict de respuestas):
+#      - vecinos:   nodos conectados (con peso = compras), filtrables por tipo
+#      - dos_saltos: nodos a 2 pasos, con cuántos intermedios comparten
+#                    (familia -> productos -> otras familias)
+#      - comunes:   vecinos en común de un par de nodos
+#   2. Backends intercambiables con la misma interfaz:
+#      - BackendCSR: snapshot en memoria (adyacencia CSR de grafo_compras.py,
+#        desde dataset_compras_completo.csv o el estado de ingesta_compras.py).
+#        Los 2 saltos se arman con rebanadas de `indices` + np.unique, sin
+#        Python por arista. Los "hubs" (nodos con más de GRADO_HUB vecinos,
+#        ej. el arroz) no se recorren arista por arista: como intermedio
+#        suman una fila densa de vecinos (solo del tipo pedido, con tope de
+#        memoria) y como origen usan su conteo disperso A[hub]·diag(tipo)·A,
+#        calculado en la primera consulta y guardado en un LRU.
+#        Empates ordenados por nombre, igual que en Neo4j.
+#      - BackendNeo4j: un solo `UNWIND $nombres` por lote de Cypher (no una
+#        consulta por nodo), leyendo del grafo cargado con carga_neo4j.py.
+#   3. ServicioConsultasGrafo pone un caché LRU con vencimiento (TTL) delante:
+#      de un lote solo se consultan al backend los nodos que faltan o vencieron.
+#
+# USO (desde la raíz del proyecto):
+#   python app/consulta_grafo.py                        # CSR: verificación + tiempos
+#   python app/consulta_grafo.py --backend neo4j        # contra bolt://localhost:7687
+#   servicio = ServicioConsultasGrafo(BackendCSR.desde_csv(), ttl=300)
+#   servicio.familias_similares('Ana Torres', k=5)
+# =============================================================================
+
+RUTA_CSV = os.path.join('data', 'dataset_compras_completo.csv')
+CAPACIDAD = 50_000
+TTL_SEGUNDOS = 300.0
+LOTE_CYPHER = 1_000    # Nodos por llamada UNWIND a Neo4j
+GRADO_HUB = 2_048      # Nodos con más vecinos son "hubs" en los 2 saltos
+MAX_BYTES_CONTEOS_HUB = 64 * 2**20   # Conteos de 2 saltos de hubs origen guardados (LRU)
+MAX_CELDAS_HUB = 16_000_000   # Tope de hubs x nodos de un tipo para filas densas (int32: 64 MB)
+
+Vecinos = Tuple[Tuple[str, float], ...]
+
+
+# --- Backend en memoria (CSR) ---
+class BackendCSR:
+    """ Snapshot inmutable del grafo: CSR sin lazos + catálogo nombre -> índice. """
+
+    def __init__(self, nodos: pd.DataFrame, aristas: pd.DataFrame, grado_hub: int = GRADO_HUB,
+                 max_bytes_conteos_hub: int = MAX_BYTES_CONTEOS_HUB, max_celdas_hub: int = MAX_CELDAS_HUB):
+        self.nombres = nodos['nombre'].to_numpy(dtype=object)
+        self.tipos, self.catalogo_tipos = pd.factorize(nodos['tipo'])
+        self.codigos_tipo = {tipo: codigo for codigo, tipo in enumerate(self.catalogo_tipos)}
+        self.indice = {nombre: i for i, nombre in enumerate(self.nombres.tolist()) if isinstance(nombre, str)}
+        # Empates por nombre, igual que BackendNeo4j (Neo4j no conserva el orden de los nodos)
+        self.rango_nombre = np.empty(len(self.nombres), dtype=np.int64)
+        self.rango_nombre[np.argsort(self.nombres.astype(str), kind='stable')] = np.arange(len(self.nombres))
+
+        # Sin lazos y sin los nodos sin nombre (NaN), igual que lo cargado en Neo4j
+        con_nombre = np.array([isinstance(nombre, str) for nombre in self.nombres], dtype=float)
+        adyacencia = adyacencia_desde_aristas(len(nodos), aristas)
+        adyacencia = (diags(con_nombre) @ adyacencia @ diags(con_nombre)).tolil()
+        adyacencia.setdiag(0)
+        adyacencia = adyacencia.tocsr()
+        adyacencia.eliminate_zeros()
+        adyacencia.sort_indices()
+        self.indptr = adyacencia.indptr.astype(np.int64)
+        self.indices = adyacencia.indices.astype(np.int64)
+        self.pesos = adyacencia.data.astype(float)
+
+        # Conteos densos en coordenadas del tipo pedido (None = todos los nodos)
+        self.nodos_tipo = {None: np.arange(len(self.nombres))}
+        self.nodos_tipo.update((codigo, np.flatnonzero(self.tipos == codigo)) for codigo in range(len(self.catalogo_tipos)))
+        self.posicion_tipo = np.arange(len(self.nombres))
+        for codigo in range(len(self.catalogo_tipos)):
+            self.posicion_tipo[self.nodos_tipo[codigo]] = np.arange(len(self.nodos_tipo[codigo]))
+
+        # Hubs (ej. el arroz, que compran casi todas las familias): sus 2 saltos no se arman
+        # arista por arista en cada consulta. Nada se precalcula para todos los hubs:
+        #   - como intermedio: filas densas de vecinos solo del tipo pedido, al primer uso, para
+        #     los hubs con más vecinos de ese tipo que quepan en max_celdas_hub (hubs x nodos del
+        #     tipo); las aristas del resto de hubs se recorren
+        #   - como origen: conteo disperso A[hub]·diag(tipo)·A al primer uso, en un LRU
+        #     de hasta max_bytes_conteos_hub bytes
+        self.hubs = np.flatnonzero(np.diff(self.indptr) > grado_hub)
+        self.fila_hub = np.full(len(self.nombres), -1, dtype=np.int64)
+        self.fila_hub[self.hubs] = np.arange(len(self.hubs))
+        self.max_bytes_conteos_hub = max_bytes_conteos_hub
+        self._bytes_conteos_hub = 0
+        self.max_celdas_hub = max_celdas_hub
+        binaria = adyacencia.astype(np.float32)
+        binaria.data[:] = 1.0
+        self._por_tipo = {None: binaria}
+        self._por_tipo.update((codigo, (diags((self.tipos == codigo).astype(np.float32)) @ binaria).tocsr())
+                              for codigo in range(len(self.catalogo_tipos)))
+        self._filas_densas: Dict[Optional[int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._conteos_hub: 'OrderedDict[Tuple[int, Optional[int]], Tuple[np.ndarray, np.ndarray]]' = OrderedDict()
+        self._candado_hubs = threading.Lock()
+
+    @classmethod
+    def desde_csv(cls, ruta: str = RUTA_CSV) -> 'BackendCSR':
+        return cls(*tablas_grafo(pd.read_csv(ruta)))
+
+    @classmethod
+    def desde_estado(cls, ruta: str) -> 'BackendCSR':
+        return cls(*GrafoAcumulado.cargar(ruta).tablas())
+
+    def _codigo_tipo(self, tipo: Optional[str]) -> Optional[int]:
+        if tipo is None:
+            return None
+        return self.codigos_tipo.get(tipo, -1)   # -1 si el tipo no existe: ningún nodo lo tiene
+
+    # --- Consultas sobre un nodo ---
+    def _vecinos(self, i: int, tipo: Optional[int]) -> Vecinos:
+        inicio, fin = self.indptr[i], self.indptr[i + 1]
+        vecinos, pesos = self.indices[inicio:fin], self.pesos[inicio:fin]
+        if tipo is not None:
+            elegidos = self.tipos[vecinos] == tipo
+            vecinos, pesos = vecinos[elegidos], pesos[elegidos]
+        orden = np.lexsort((self.rango_nombre[vecinos], -pesos))
+        return tuple(zip(self.nombres[vecinos[orden]].tolist(), pesos[orden].tolist()))
+
+    def _dos_saltos(self, i: int, tipo: Optional[int], tipo_intermedio: Optional[int],
+                    k: Optional[int]) -> Vecinos:
+        if tipo is not None and tipo < 0:
+            return ()
+        if tipo_intermedio is not None and tipo_intermedio < 0:
+            return ()
+        if self.fila_hub[i] >= 0:
+            # Origen hub: conteo disperso guardado en el LRU
+            nodos, comunes = self._conteo_hub(i, tipo_intermedio)
+            elegidos = nodos != i
+            if tipo is not None:
+                elegidos &= self.tipos[nodos] == tipo
+            return self._ordenar(nodos[elegidos], comunes[elegidos], k)
+
+        nodos = self.nodos_tipo[tipo]
+        intermedios = self.indices[self.indptr[i]:self.indptr[i + 1]]
+        if tipo_intermedio is not None:
+            intermedios = intermedios[self.tipos[intermedios] == tipo_intermedio]
+        filas_densas = np.zeros(0, dtype=np.int64)
+        es_hub = self.fila_hub[intermedios] >= 0
+        if es_hub.any():
+            posicion, densas = self._filas_densas_hub(tipo)
+            filas = np.full(len(intermedios), -1, dtype=np.int64)
+            filas[es_hub] = posicion[self.fila_hub[intermedios[es_hub]]]
+            intermedios, filas_densas = intermedios[filas < 0], filas[filas >= 0]
+        destinos = self._destinos(intermedios)
+        if tipo is not None:
+            destinos = destinos[self.tipos[destinos] == tipo]
+        if len(filas_densas) == 0 and len(destinos) <= len(nodos) // 8:
+            # Pocos destinos: conteo por ordenamiento (sin multiaristas, cada aparición es un intermedio distinto)
+            destinos = destinos[destinos != i]
+            nodos, comunes = np.unique(destinos, return_counts=True)
+            return self._ordenar(nodos, comunes, k)
+        # Muchos destinos o intermedios hub: conteo denso, cada hub suma su fila de vecinos
+        conteo = np.bincount(self.posicion_tipo[destinos] if tipo is not None else destinos,
+                             minlength=len(nodos)).astype(np.int32)
+        for fila in filas_densas:
+            conteo += densas[fila]
+        return self._mejores_densos(conteo, i, tipo, k)
+
+    def _conteo_hub(self, i: int, tipo_intermedio: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """ (nodos, intermedios en común) a 2 saltos del hub i, incluido i; LRU por bytes. """
+        clave = (i, tipo_intermedio)
+        with self._candado_hubs:
+            if clave in self._conteos_hub:
+                self._conteos_hub.move_to_end(clave)
+                return self._conteos_hub[clave]
+        fila = (self._por_tipo[None][i] @ self._por_tipo[tipo_intermedio]).tocoo()
+        conteo = (fila.col.astype(np.int32), np.rint(fila.data).astype(np.int32))
+        with self._candado_hubs:
+            if clave not in self._conteos_hub:
+                self._conteos_hub[clave] = conteo
+                self._bytes_conteos_hub += conteo[0].nbytes + conteo[1].nbytes
+            # El recién calculado se conserva aunque solo pase el tope
+            while self._bytes_conteos_hub > self.max_bytes_conteos_hub and len(self._conteos_hub) > 1:
+                _, (nodos, comunes) = self._conteos_hub.popitem(last=False)
+                self._bytes_conteos_hub -= nodos.nbytes + comunes.nbytes
+        return conteo
+
+    def _filas_densas_hub(self, tipo: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (fila densa de cada hub o -1, filas x nodos del tipo). Solo los hubs con más
+        vecinos del tipo, hasta max_celdas_hub celdas.
+        """
+        with self._candado_hubs:
+            if tipo not in self._filas_densas:
+                nodos = self.nodos_tipo[tipo]
+                vecinos = self._por_tipo[None][self.hubs][:, nodos].tocsr()
+                cuantos = min(len(self.hubs), self.max_celdas_hub // max(len(nodos), 1))
+                elegidos = np.argsort(-vecinos.getnnz(axis=1), kind='stable')[:cuantos]
+                posicion = np.full(len(self.hubs), -1, dtype=np.int64)
+                posicion[elegidos] = np.arange(len(elegidos))
+                self._filas_densas[tipo] = (posicion, vecinos[elegidos].toarray().astype(np.int32))
+            return self._filas_densas[tipo]
+
+    def bytes_hubs(self) -> int:
+        """ Memoria de las estructuras de hubs (filas densas + conteos en el LRU). """
+        with self._candado_hubs:
+            return sum(filas.nbytes for _, filas in self._filas_densas.values()) + self._bytes_conteos_hub
+
+    def _destinos(self, intermedios: np.ndarray) -> np.ndarray:
+        """ Rebanadas indices[inicio:fin] de los intermedios, concatenadas sin Python por arista. """
+        inicios, fines = self.indptr[intermedios], self.indptr[intermedios + 1]
+        largos = fines - inicios
+        desplazamiento = np.repeat(inicios - (np.cumsum(largos) - largos), largos)
+        return self.indices[desplazamiento + np.arange(int(largos.sum()))]
+
+    def _mejores_densos(self, conteo: np.ndarray, i: int, tipo: Optional[int], k: Optional[int]) -> Vecinos:
+        """ Top-k de un conteo denso sobre `nodos_tipo[tipo]`, sin el propio nodo. """
+        if tipo is None or self.tipos[i] == tipo:
+            conteo[self.posicion_tipo[i] if tipo is not None else i] = 0
+        if k is None:
+            elegidos = np.flatnonzero(conteo)
+        else:
+            # Menor conteo que todavía entra al top-k (empates incluidos), con un histograma de conteos
+            frecuencia = np.bincount(conteo)
+            frecuencia[0] = 0
+            acumulada = np.cumsum(frecuencia[::-1])
+            elegidos = np.flatnonzero(conteo >= max(len(frecuencia) - 1 - np.searchsorted(acumulada, k), 1))
+        return self._ordenar(self.nodos_tipo[tipo][elegidos], conteo[elegidos], k)
+
+    def _ordenar(self, nodos: np.ndarray, comunes: np.ndarray, k: Optional[int]) -> Vecinos:
+        """ Mayor número de intermedios primero, empates por nombre; solo los k primeros. """
+        if k is not None and len(nodos) > 4 * k:
+            # Solo se ordenan los que llegan al k-ésimo mayor conteo (empates incluidos)
+            corte = np.partition(comunes, len(comunes) - k)[len(comunes) - k]
+            elegidos = comunes >= corte
+            nodos, comunes = nodos[elegidos], comunes[elegidos]
+        orden = np.lexsort((self.rango_nombre[nodos], -comunes))[:k]
+        return tuple(zip(self.nombres[nodos[orden]].tolist(), comunes[orden].astype(float).tolist()))
+
+    def _comunes(self, a: int, b: int, tipo: Optional[int]) -> Tuple[str, ...]:
+        vecinos_a = self.indices[self.indptr[a]:self.indptr[a + 1]]
+        vecinos_b = self.indices[self.indptr[b]:self.indptr[b + 1]]
+        comunes = np.intersect1d(vecinos_a, vecinos_b, assume_unique=True)
+        if tipo is not None:
+            comunes = comunes[self.tipos[comunes] == tipo]
+        return tuple(sorted(self.nombres[comunes].tolist()))
+
+    # --- Interfaz por lotes (igual que BackendNeo4j) ---
+    def vecinos(self, nombres: Sequence[str], tipo: Optional[str] = None) -> Dict[str, Vecinos]:
+        codigo = self._codigo_tipo(tipo)
+        return {nombre: self._vecinos(self.indice[nombre], codigo) if nombre in self.indice else ()
+                for nombre in nombres}
+
+    def dos_saltos(self, nombres: Sequence[str], tipo: Optional[str] = None, tipo_intermedio: Optional[str] = None,
+                   k: Optional[int] = None) -> Dict[str, Vecinos]:
+        codigo, codigo_intermedio = self._codigo_tipo(tipo), self._codigo_tipo(tipo_intermedio)
+        return {nombre: self._dos_saltos(self.indice[nombre], codigo, codigo_intermedio, k)
+                if nombre in self.indice else () for nombre in nombres}
+
+    def comunes(self, pares: Sequence[Tuple[str, str]], tipo: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+        codigo = self._codigo_tipo(tipo)
+        return {(a, b): self._comunes(self.indice[a], self.indice[b], codigo)
+                if a in self.indice and b in self.indice else () for a, b in pares}
+
+
+# --- Backend Neo4j (Cypher por lotes) ---
+NODO = "(n:Familia|Producto|Tienda {nombre: nombre})"   # Usa los índices de unicidad de carga_neo4j.py
+FILTRO_TIPO = "($tipo IS NULL OR $tipo IN labels({var}))"
+
+CYPHER_VECINOS = (
+    f"UNWIND $nombres AS nombre MATCH {NODO}-[r]-(m) "
+    f"WHERE m <> n AND {FILTRO_TIPO.format(var='m')} "
+    "RETURN nombre, m.nombre AS vecino, toFloat(r.veces) AS peso")
+
+CYPHER_DOS_SALTOS = (
+    f"UNWIND $nombres AS nombre MATCH {NODO}--(m)--(d) "
+    f"WHERE d <> n AND m <> n AND d <> m AND {FILTRO_TIPO.format(var='d')} "
+    "AND ($tipo_intermedio IS NULL OR $tipo_intermedio IN labels(m)) "
+    "RETURN nombre, d.nombre AS vecino, toFloat(count(DISTINCT m)) AS peso")
+
+CYPHER_COMUNES = (
+    "UNWIND $pares AS par "
+    "MATCH (a:Familia|Producto|Tienda {nombre: par[0]})--(m)--(b:Familia|Producto|Tienda {nombre: par[1]}) "
+    f"WHERE m <> a AND m <> b AND {FILTRO_TIPO.format(var='m')} "
+    "RETURN par[0] AS a, par[1] AS b, collect(DISTINCT m.nombre) AS comunes")
+
+
+class BackendNeo4j:
+    """ Misma interfaz que BackendCSR, resuelta con un UNWIND por cada `lote` nodos. """
+
+    def __init__(self, driver, database: Optional[str] = None, lote: int = LOTE_CYPHER):
+        self.driver = driver
+        self.database = database
+        self.lote = lote
+        self.llamadas = 0
+
+    def _consultar(self, cypher: str, clave: str, elementos: List, **parametros) -> List:
+        registros = []
+        for inicio in range(0, len(elementos), self.lote):
+            resultado = self.driver.execute_query(cypher, {clave: elementos[inicio:inicio + self.lote], **parametros},
+                                                  routing_='r', database_=self.database)
+            self.llamadas += 1
+            registros.extend(resultado[0])
+        return registros
+
+    @staticmethod
+    def _agrupar(nombres: Sequence[str], registros: List, k: Optional[int]) -> Dict[str, Vecinos]:
+        grupos = {nombre: [] for nombre in nombres}
+        for registro in registros:
+            grupos[registro['nombre']].append((registro['vecino'], float(registro['peso'] or 0.0)))
+        # Mismo orden que BackendCSR: peso descendente, luego nombre
+        return {nombre: tuple(sorted(filas, key=lambda fila: (-fila[1], fila[0]))[:k]) for nombre, filas in grupos.items()}
+
+    def vecinos(self, nombres: Sequence[str], tipo: Optional[str] = None) -> Dict[str, Vecinos]:
+        nombres = list(dict.fromkeys(nombres))
+        return self._agrupar(nombres, self._consultar(CYPHER_VECINOS, 'nombres', nombres, tipo=tipo), None)
+
+    def dos_saltos(self, nombres: Sequence[str], tipo: Optional[str] = None, tipo_intermedio: Optional[str] = None,
+                   k: Optional[int] = None) -> Dict[str, Vecinos]:
+        nombres = list(dict.fromkeys(nombres))
+        registros = self._consultar(CYPHER_DOS_SALTOS, 'nombres', nombres, tipo=tipo, tipo_intermedio=tipo_intermedio)
+        return self._agrupar(nombres, registros, k)
+
+    def comunes(self, pares: Sequence[Tuple[str, str]], tipo: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+        pares = list(dict.fromkeys(tuple(par) for par in pares))
+        respuesta = {par: () for par in pares}
+        for registro in self._consultar(CYPHER_COMUNES, 'pares', [list(par) for par in pares], tipo=tipo):
+            respuesta[(registro['a'], registro['b'])] = tuple(sorted(registro['comunes']))
+        return respuesta
+
+
+# --- Servicio con caché ---
+class ServicioConsultasGrafo:
+    """
+    Consultas de lectura con caché LRU + TTL, seguro entre hilos.
+    En cada lote solo se piden al backend las claves que faltan o vencieron,
+    en UNA llamada (que BackendNeo4j divide en lotes de Cypher).
+    """
+
+    def __init__(self, backend, capacidad: int = CAPACIDAD, ttl: Optional[float] = TTL_SEGUNDOS,
+                 reloj: Callable[[], float] = time.monotonic):
+        if capacidad <= 0:
+            raise ValueError("La capacidad del caché debe ser mayor a 0")
+        self.backend = backend
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.reloj = reloj
+        self._memoria: 'OrderedDict[Hashable, Tuple[float, object]]' = OrderedDict()
+        self._candado = threading.Lock()
+        self.estadisticas = {'aciertos': 0, 'fallos': 0, 'vencidos': 0, 'desalojos': 0, 'llamadas_backend': 0}
+
+    def _lote(self, operacion: str, claves: Iterable, parametros: Tuple, calcular: Callable[[List], Dict]) -> Dict:
+        claves = list(dict.fromkeys(claves))
+        ahora = self.reloj()
+        respuesta, faltantes = {}, []
+        with self._candado:
+            for clave in claves:
+                entrada = self._memoria.get((operacion, parametros, clave))
+                if entrada is not None and (self.ttl is None or entrada[0] > ahora):
+                    self._memoria.move_to_end((operacion, parametros, clave))
+                    respuesta[clave] = entrada[1]
+                    self.estadisticas['aciertos'] += 1
+                else:
+                    if entrada is not None:
+                        self.estadisticas['vencidos'] += 1
+                    faltantes.append(clave)
+            self.estadisticas['fallos'] += len(faltantes)
+        if not faltantes:
+            return respuesta
+
+        # El backend se consulta fuera del candado (Neo4j puede tardar)
+        calculadas = calcular(faltantes)
+        vence = self.reloj() + self.ttl if self.ttl is not None else None
+        with self._candado:
+            self.estadisticas['llamadas_backend'] += 1
+            for clave in faltantes:
+                self._memoria[(operacion, parametros, clave)] = (vence, calculadas[clave])
+                self._memoria.move_to_end((operacion, parametros, clave))
+            while len(self._memoria) > self.capacidad:
+                self._memoria.popitem(last=False)
+                self.estadisticas['desalojos'] += 1
+        respuesta.update((clave, calculadas[clave]) for clave in faltantes)
+        return respuesta
+
+    def invalidar(self) -> None:
+        """ Vacía el caché (ej. después de recargar el grafo). """
+        with self._candado:
+            self._memoria.clear()
+
+    # --- Lotes ---
+    def vecinos_lote(self, nombres: Iterable[str], tipo: Optional[str] = None) -> Dict[str, Vecinos]:
+        return self._lote('vecinos', nombres, (tipo,), lambda faltan: self.backend.vecinos(faltan, tipo))
+
+    def dos_saltos_lote(self, nombres: Iterable[str], tipo: Optional[str] = None,
+                        tipo_intermedio: Optional[str] = None, k: Optional[int] = None) -> Dict[str, Vecinos]:
+        return self._lote('dos_saltos', nombres, (tipo, tipo_intermedio, k),
+                          lambda faltan: self.backend.dos_saltos(faltan, tipo, tipo_intermedio, k))
+
+    def comunes_lote(self, pares: Iterable[Tuple[str, str]], tipo: Optional[str] = None):
+        return self._lote('comunes', (tuple(par) for par in pares), (tipo,),
+                          lambda faltan: self.backend.comunes(faltan, tipo))
+
+    # --- Un solo nodo ---
+    def vecinos(self, nombre: str, tipo: Optional[str] = None) -> Vecinos:
+        return self.vecinos_lote([nombre], tipo)[nombre]
+
+    def dos_saltos(self, nombre: str, tipo: Optional[str] = None, tipo_intermedio: Optional[str] = None,
+                   k: Optional[int] = None) -> Vecinos:
+        return self.dos_saltos_lote([nombre], tipo, tipo_intermedio, k)[nombre]
+
+    def comunes(self, a: str, b: str, tipo: Optional[str] = None) -> Tuple[str, ...]:
+        return self.comunes_lote([(a, b)], tipo)[(a, b)]
+
+    # --- Preguntas de negocio (conexion_neo4j.py) ---
+    def productos_de_tienda(self, tienda: str) -> Vecinos:
+        """ Productos vendidos en la tienda, del más comprado al menos. """
+        return self.vecinos(tienda, 'Producto')
+
+    def familias_similares(self, familia: str, k: int = 5) -> Vecinos:
+        """ Familias que compran más productos en común con `familia`. """
+        return self.dos_saltos(familia, 'Familia', 'Producto', k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas de lectura sobre el grafo de compras (con caché).")
+    parser.add_argument('--backend', default='csr', choices=['csr', 'neo4j'])
+    parser.add_argument('--csv', default=RUTA_CSV)
+    parser.add_argument('--estado', default=None, help='Grafo guardado por ingesta_compras.py (.npz)')
+    parser.add_argument('--ttl', type=float, default=TTL_SEGUNDOS)
+    parser.add_argument('--capacidad', type=int, default=CAPACIDAD)
+    parser.add_argument('--repeticiones', type=int, default=2_000)
+    args = parser.parse_args()
+
+    if args.backend == 'neo4j':
+        from conexion_neo4j import crear_driver
+        driver = crear_driver()
+        try:
+            servicio = ServicioConsultasGrafo(BackendNeo4j(driver), args.capacidad, args.ttl)
+            familias = [registro['nombre'] for registro in
+                        driver.execute_query("MATCH (f:Familia) RETURN f.nombre AS nombre LIMIT 100")[0]]
+            inicio = time.perf_counter()
+            similares = servicio.dos_saltos_lote(familias, 'Familia', 'Producto', 5)
+            print(f"🌐 {len(similares)} familias similares en {servicio.backend.llamadas} llamada(s) Cypher "
+                  f"({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+        finally:
+            driver.close()
+        return
+
+    backend = BackendCSR.desde_estado(args.estado) if args.estado else BackendCSR.desde_csv(args.csv)
+    servicio = ServicioConsultasGrafo(backend, args.capacidad, args.ttl)
+    tiendas = [n for n, t in zip(backend.nombres, backend.tipos) if isinstance(n, str)
+               and backend.catalogo_tipos[t] == 'Tienda']
+    familias = [n for n, t in zip(backend.nombres, backend.tipos) if isinstance(n, str)
+                and backend.catalogo_tipos[t] == 'Familia']
+    print(f"✅ Snapshot CSR: {len(backend.nombres):,} nodos / {len(backend.indices) // 2:,} aristas")
+    if tiendas and familias:
+        print(f"🏪 {tiendas[0]} vende: " + ', '.join(p for p, _ in servicio.productos_de_tienda(tiendas[0])[:5]))
+        print(f"👪 Familias parecidas a {familias[0]}: " +
+              ', '.join(f"{f} ({int(c)} productos)" for f, c in servicio.familias_similares(familias[0])))
+
+    # Tiempos: backend directo (sin caché) y con caché caliente
+    nombres = [n for n in backend.nombres.tolist() if isinstance(n, str)]
+    rng = np.random.default_rng(0)
+    muestra = [nombres[i] for i in rng.integers(0, len(nombres), args.repeticiones)]
+    inicio = time.perf_counter()
+    for nombre in muestra:
+        backend.dos_saltos([nombre])
+    directo = (time.perf_counter() - inicio) / len(muestra) * 1e6
+    servicio.dos_saltos_lote(nombres)
+    inicio = time.perf_counter()
+    for nombre in muestra:
+        servicio.dos_saltos(nombre)
+    cacheado = (time.perf_counter() - inicio) / len(muestra) * 1e6
+    print(f"⏱️ Dos saltos: {directo:.1f} µs por consulta (CSR) | {cacheado:.1f} µs con caché | "
+          f"estadísticas {servicio.estadisticas}")
+
+
+# --- PRUEBA: MISMAS RESPUESTAS QUE networkx + ESCALA ---
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        main()
+        sys.exit(0)
+
+    import networkx as nx
+    from grafo_compras import COL_FAMILIA, COL_PRODUCTO, COL_TIENDA, construir_grafo_tripartito
+
+    df = pd.read_csv(RUTA_CSV)
+    G = construir_grafo_tripartito(df)
+    G.remove_nodes_from([n for n in list(G) if not isinstance(n, str)])
+    tipo = nx.get_node_attributes(G, 'tipo')
+
+    def esperado_vecinos(n, t=None):
+        filas = [(m, float(G[n][m]['weight'])) for m in G[n] if m != n and (t is None or tipo[m] == t)]
+        return tuple(sorted(filas, key=lambda f: (-f[1], f[0])))
+
+    def esperado_dos_saltos(n, t=None, ti=None):
+        conteo = {}
+        for m in G[n]:
+            if m == n or (ti is not None and tipo[m] != ti):
+                continue
+            for d in G[m]:
+                if d not in (n, m) and (t is None or tipo[d] == t):
+                    conteo[d] = conteo.get(d, 0) + 1
+        return {d: float(c) for d, c in conteo.items()}
+
+    def esperado_comunes(a, b, t=None):
+        return tuple(sorted(m for m in set(G[a]) & set(G[b]) if m not in (a, b) and (t is None or tipo[m] == t)))
+
+    # CSR contra networkx; grado_hub=2 obliga a pasar por los hubs (como origen y como intermedio),
+    # y con un LRU chico y pocas (o ninguna) filas densas se recalculan conteos y se recorren aristas de hubs
+    combinaciones = ((None, None), ('Familia', 'Producto'), ('Producto', 'Familia'), ('Tienda', None),
+                     ('Familia', None), (None, 'Tienda'))
+    pares = [(a, b) for a in list(G)[:20] for b in list(G)[:20]]
+    for grado_hub, max_bytes, max_celdas_hub in ((GRADO_HUB, MAX_BYTES_CONTEOS_HUB, MAX_CELDAS_HUB),
+                                                 (2, MAX_BYTES_CONTEOS_HUB, MAX_CELDAS_HUB), (2, 1_000, 100), (2, 0, 0)):
+        backend = BackendCSR(*tablas_grafo(df), grado_hub=grado_hub, max_bytes_conteos_hub=max_bytes,
+                             max_celdas_hub=max_celdas_hub)
+        for n in G:
+            for t in (None, 'Producto', 'Familia'):
+                assert backend.vecinos([n], t)[n] == esperado_vecinos(n, t)
+            for t, ti in combinaciones:
+                esperado = esperado_dos_saltos(n, t, ti)
+                assert dict(backend.dos_saltos([n], t, ti)[n]) == esperado
+                assert backend.dos_saltos([n], t, ti, 3)[n] == tuple(sorted(esperado.items(), key=lambda f: (-f[1], f[0])))[:3]
+        for (a, b), comunes in backend.comunes(pares).items():
+            assert comunes == esperado_comunes(a, b)
+        assert backend._bytes_conteos_hub <= max(max_bytes, 8 * len(backend.nombres))
+        print(f"✅ Vecinos, 2 saltos y comunes iguales a networkx en los {len(G)} nodos "
+              f"({len(backend.hubs)} hubs con grado > {grado_hub}, LRU de {max_bytes:,} bytes, "
+              f"filas densas hasta {max_celdas_hub:,} celdas).")
+    backend = BackendCSR.desde_csv()
+
+    # Caché: TTL con reloj controlado, LRU y un solo llamado al backend por lote
+    reloj = [0.0]
+    servicio = ServicioConsultasGrafo(backend, capacidad=10, ttl=60, reloj=lambda: reloj[0])
+    nombres = list(G)[:10]
+    servicio.vecinos_lote(nombres)
+    servicio.vecinos_lote(nombres[:5] + list(G)[10:12])
+    assert servicio.estadisticas['llamadas_backend'] == 2 and servicio.estadisticas['aciertos'] == 5
+    assert servicio.estadisticas['desalojos'] == 2
+    reloj[0] = 61.0
+    servicio.vecinos(nombres[4])
+    assert servicio.estadisticas['vencidos'] == 1
+    print(f"✅ Caché LRU + TTL: {servicio.estadisticas}")
+
+    # Neo4j sin servidor: el driver falso responde cada Cypher con las filas que devolvería sobre G
+    from carga_neo4j import DriverGrabador
+
+    def responder(consulta, parametros):
+        t, ti = parametros.get('tipo'), parametros.get('tipo_intermedio')
+        if consulta == CYPHER_VECINOS:
+            return [{'nombre': n, 'vecino': m, 'peso': float(G[n][m]['weight'])}
+                    for n in parametros['nombres'] if n in G for m, _ in esperado_vecinos(n, t)]
+        if consulta == CYPHER_DOS_SALTOS:
+            return [{'nombre': n, 'vecino': d, 'peso': c}
+                    for n in parametros['nombres'] if n in G for d, c in esperado_dos_saltos(n, t, ti).items()]
+        assert consulta == CYPHER_COMUNES
+        return [{'a': a, 'b': b, 'comunes': list(esperado_comunes(a, b, t))}
+                for a, b in parametros['pares'] if a in G and b in G and esperado_comunes(a, b, t)]
+
+    neo4j = BackendNeo4j(DriverGrabador(responder=responder), lote=100)
+    todos = list(G)
+    for t in (None, 'Producto', 'Familia'):
+        assert neo4j.vecinos(todos, t) == backend.vecinos(todos, t)
+    for t, ti in combinaciones:
+        for k in (None, 5):
+            assert neo4j.dos_saltos(todos, t, ti, k) == backend.dos_saltos(todos, t, ti, k)
+    for t in (None, 'Tienda'):
+        assert neo4j.comunes(pares, t) == backend.comunes(pares, t)
+    print(f"✅ Neo4j (registros simulados) = CSR en vecinos, 2 saltos y comunes ({neo4j.llamadas} llamadas Cypher).")
+
+    # 2,500 nodos -> 3 llamadas UNWIND (lote de 1,000)
+    driver = DriverGrabador()
+    neo4j = ServicioConsultasGrafo(BackendNeo4j(driver), capacidad=10_000)
+    neo4j.dos_saltos_lote([f"Familia {i}" for i in range(2_500)], 'Familia', 'Producto', 5)
+    neo4j.dos_saltos_lote([f"Familia {i}" for i in range(2_500)], 'Familia', 'Producto', 5)
+    assert len(driver.consultas) == 3 and all(len(p['nombres']) <= LOTE_CYPHER for _, p in driver.consultas)
+    print(f"✅ Neo4j: 2 lotes de 2,500 nodos -> {len(driver.consultas)} llamadas Cypher (el 2º sale del caché).")
+
+    # Escala: 1M compras sintéticas (50k familias, 500 productos, 2k tiendas)
+    rng = np.random.default_rng(5)
+    n = 1_000_000
+    familia = rng.integers(0, 50_000, n)
+    grande = pd.DataFrame({COL_FAMILIA: np.array([f"Familia {i}" for i in range(50_000)], dtype=object)[familia],
+                           COL_PRODUCTO: np.array([f"Producto {i}" for i in range(500)], dtype=object)[
+                               np.minimum(rng.zipf(1.3, n) - 1, 499)],
+                           COL_TIENDA: np.array([f"Tienda {i}" for i in range(2_000)], dtype=object)[
+                               (familia * 7 + rng.integers(0, 20, n)) % 2_000]})
+    inicio = time.perf_counter()
+    backend = BackendCSR(*tablas_grafo(grande))
+    print(f"⏱️ Snapshot de {len(backend.nombres):,} nodos / {len(backend.indices) // 2:,} aristas "
+          f"({len(backend.hubs)} hubs): {time.perf_counter() - inicio:.2f} s")
+
+    def referencia(nombre, t, ti, k):
+        """ 2 saltos arista por arista (sin hubs), para comparar. """
+        i = backend.indice[nombre]
+        intermedios = backend.indices[backend.indptr[i]:backend.indptr[i + 1]]
+        if ti is not None:
+            intermedios = intermedios[backend.tipos[intermedios] == backend.codigos_tipo[ti]]
+        destinos = backend._destinos(intermedios)
+        destinos = destinos[destinos != i]
+        if t is not None:
+            destinos = destinos[backend.tipos[destinos] == backend.codigos_tipo[t]]
+        return backend._ordenar(*np.unique(destinos, return_counts=True), k)
+
+    # Todos los casos medidos, sin caché
+    for nombre, t, ti in (('Familia 42', 'Familia', 'Producto'), ('Producto 3', 'Producto', 'Familia'),
+                          ('Producto 400', 'Producto', 'Familia'), ('Producto 3', 'Familia', None),
+                          ('Tienda 7', 'Tienda', 'Familia'), ('Tienda 7', 'Tienda', 'Producto'),
+                          ('Familia 42', 'Familia', 'Tienda'), ('Familia 42', 'Tienda', None),
+                          ('Familia 42', 'Producto', None), ('Familia 42', None, None)):
+        inicio = time.perf_counter()
+        respuesta = backend.dos_saltos([nombre], t, ti, 10)[nombre]
+        primera = (time.perf_counter() - inicio) * 1e6
+        assert respuesta == referencia(nombre, t, ti, 10)
+        inicio = time.perf_counter()
+        for _ in range(1_000):
+            respuesta = backend.dos_saltos([nombre], t, ti, 10)[nombre]
+        print(f"⏱️ 2 saltos {nombre} -> {t or 'todos'} (vía {ti or 'todos'}): "
+              f"{(time.perf_counter() - inicio) * 1000:.1f} µs (1ª consulta {primera:,.0f} µs), top: {respuesta[0]}")
+    print(f"💾 Estructuras de hubs tras las consultas: {backend.bytes_hubs() / 2**20:.1f} MB")
+    servicio = ServicioConsultasGrafo(backend)
+    servicio.familias_similares('Familia 42')
+    inicio = time.perf_counter()
+    for _ in range(100_000):
+        servicio.familias_similares('Familia 42')
+    print(f"⏱️ Con caché: {(time.perf_counter() - inicio) * 10:.2f} µs por consulta")
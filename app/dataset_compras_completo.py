@@ -1,38 +1,33 @@
+import argparse
+
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
+from exportar_grafo import exportar_gexf
+from grafo_compras import construir_grafo_tripartito
+from ingesta_compras import RUTA_ESTADO, ingerir_compras
+from render_grafos import dibujar_networkx
 
-df = pd.read_csv('data/dataset_compras_completo.csv')
+parser = argparse.ArgumentParser(description="Grafo tripartito Familia - Producto - Tienda.")
+parser.add_argument('--streaming', action='store_true',
+                    help='Leer el CSV por bloques y fusionar solo las compras nuevas en el grafo guardado')
+parser.add_argument('--bloque', type=int, default=100_000, help='Filas por bloque en modo --streaming')
+parser.add_argument('--estado', default=RUTA_ESTADO, help='Grafo + checkpoint del modo --streaming')
+args = parser.parse_args()
 
-col_familia = 'nombre_representante' # Columna B
-col_producto = 'producto'            # Columna D
-col_tienda = 'nombre_tienda'         # Columna H
+ruta_csv = 'data/dataset_compras_completo.csv'
 
 # ===  grafo ===
-G = nx.Graph()
-
 print("Construyendo el grafo tripartito...")
-for _, fila in df.iterrows():
-
-    # Obtener los valores de cada entidad en la fila
-    nodo_familia = fila[col_familia]
-    nodo_producto = fila[col_producto]
-    nodo_tienda = fila[col_tienda]
-
-
-    # Añadir los 3 tipos de nodos con su atributo 'tipo'
-    G.add_node(nodo_familia, tipo='Familia', label=str(nodo_familia))
-    G.add_node(nodo_producto, tipo='Producto', label=str(nodo_producto))
-    G.add_node(nodo_tienda, tipo='Tienda', label=str(nodo_tienda))
-
-
-    # Crear las aristas (Conexiones de la compra)
-    # 1. Familia -> Producto (Qué compró la familia)
-    G.add_edge(nodo_familia, nodo_producto)
-    # 2. Producto -> Tienda (Dónde se compró ese producto)
-    G.add_edge(nodo_producto, nodo_tienda)
-    # 3. Familia -> Tienda (Dónde compró la familia)
-    G.add_edge(nodo_familia, nodo_tienda)
+if args.streaming:
+    # Memoria acotada: bloques de `--bloque` filas, se reanuda desde el
+    # checkpoint (ver ingesta_compras.py)
+    G = ingerir_compras(ruta_csv, args.estado, args.bloque).a_grafo()
+else:
+    # Construcción vectorizada (ver grafo_compras.py): los pares familia-producto,
+    # producto-tienda y familia-tienda se deduplican con pandas/NumPy y se cargan
+    # en bloque; el peso de cada arista es la cantidad de compras que la repiten.
+    df = pd.read_csv(ruta_csv)
+    G = construir_grafo_tripartito(df)
 
 print("Grafo construido.")
 
@@ -42,20 +37,23 @@ print("Grafo construido.")
 
 # Usamos un nuevo nombre para no confundirnos y abrir en ghepi y selecionar :D
 output_gexf_file = 'output/grafo_compras_FINAL_nombres.gexf'
-nx.write_gexf(G, output_gexf_file)
+# Escritura en streaming (ver exportar_grafo.py): memoria plana aunque el grafo
+# sea enorme; con '.gexf.gz' se comprime y Gephi lo abre igual
+exportar_gexf(G, output_gexf_file)
 print(f"✅ Grafo exportado a '{output_gexf_file}' para Gephi.")
 
 
-plt.figure(figsize=(12, 10))
 pos = nx.spring_layout(G, k=0.5, iterations=20, seed=42) # Layout rápido
-nx.draw(
+# Render masivo: aristas en un solo LineCollection (o imagen raster si son
+# muchísimas) y nodos en un solo scatter, ver render_grafos.py
+dibujar_networkx(
     G,
     pos,
-    node_size=10,
-    with_labels=False,
-    edge_color="#EEEEEE",
-    alpha=0.6
+    "output/grafo_dataset_completo_denso_v3.png",
+    figsize=(12, 10),
+    tamano_nodo=10,
+    color_arista="#EEEEEE",
+    alpha=0.6,
+    titulo="Visualización Densa (Usar Gephi para análisis)",
 )
-plt.title("Visualización Densa (Usar Gephi para análisis)")
-plt.savefig("output/grafo_dataset_completo_denso_v3.png", dpi=300)
 print("✅ Grafo generado y guardado (versión densa).")
\ No newline at end of file
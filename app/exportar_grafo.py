@@ -0,0 +1,252 @@
+import datetime
+import gzip
+import re
+import time
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import networkx as nx
+import numpy as np
+
+# =============================================================================
+# EXPORTACIÓN EN STREAMING A GEXF / GRAPHML (Gephi)
+# =============================================================================
+# OBJETIVO:
+#   `nx.write_gexf` arma todo el árbol XML en memoria antes de escribir; con
+#   grafos grandes la exportación para Gephi es el cuello de botella de
+#   memoria de `dataset_compras_completo.py`.
+#
+# CÓMO FUNCIONA:
+#   1. Se escribe el encabezado, luego los nodos y al final las aristas,
+#      directamente al archivo (texto escapado a mano), en lotes de
+#      LINEAS_POR_ESCRITURA líneas: la memoria no depende del tamaño del grafo.
+#   2. Acepta un `nx.Graph`, las tablas (nodos, aristas) de grafo_compras /
+#      ingesta_compras o un `GrafoAcumulado` (sin pasar por networkx).
+#   3. Atributos: `label` y `tipo` en los nodos, `weight` en las aristas.
+#      Se pueden agregar otros atributos de nodo (ej. métricas de
+#      analitica_grafo.py) con su tipo: 'string', 'integer' o 'double'.
+#   4. Si la ruta termina en `.gz` (o comprimir=True) se escribe con gzip;
+#      `nx.read_gexf` / `nx.read_graphml` y Gephi los leen igual.
+#
+# USO:
+#   from exportar_grafo import exportar_gexf
+#   exportar_gexf(G, 'output/grafo_compras_FINAL_nombres.gexf')
+#   exportar_graphml(acumulado, 'output/grafo_compras.graphml.gz')
+# =============================================================================
+
+LINEAS_POR_ESCRITURA = 10_000
+# Caracteres de control que XML 1.0 no admite (ni escapados)
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+Nodo = Tuple[str, str, dict]          # (id, label, atributos)
+Arista = Tuple[str, str, float]       # (origen, destino, peso)
+
+
+def _texto(valor) -> str:
+    return _CARACTERES_INVALIDOS.sub('', str(valor))
+
+
+def _attr(valor) -> str:
+    return quoteattr(_texto(valor))
+
+
+def _valor(valor, tipo: str) -> str:
+    if tipo == 'double':
+        return repr(float(valor))
+    if tipo == 'integer':
+        return str(int(valor))
+    return _texto(valor)
+
+
+# --- Fuentes: networkx o tablas ---
+def _fuentes(grafo, atributos: Sequence[str]) -> Tuple[Iterator[Nodo], Iterator[Arista], bool]:
+    if hasattr(grafo, 'tablas'):  # GrafoAcumulado (ingesta_compras)
+        grafo = grafo.tablas()
+    if isinstance(grafo, nx.Graph):
+        def nodos():
+            for nodo, datos in grafo.nodes(data=True):
+                yield str(nodo), datos.get('label', nodo), {a: datos[a] for a in atributos if a in datos}
+
+        def aristas():
+            for u, v, peso in grafo.edges(data='weight', default=1.0):
+                yield str(u), str(v), peso
+        return nodos(), aristas(), grafo.is_directed()
+
+    tabla_nodos, tabla_aristas = grafo
+    ids = np.array([str(nombre) for nombre in tabla_nodos['nombre']], dtype=object)
+
+    def nodos():
+        columnas = [tabla_nodos[a].tolist() for a in atributos if a in tabla_nodos]
+        nombres_atributos = [a for a in atributos if a in tabla_nodos]
+        labels = tabla_nodos['label'].tolist() if 'label' in tabla_nodos else ids.tolist()
+        for i, (nodo, label) in enumerate(zip(ids.tolist(), labels)):
+            yield nodo, label, {a: columna[i] for a, columna in zip(nombres_atributos, columnas)}
+
+    def aristas():
+        # Por tramos: no se materializa la lista completa de strings
+        for inicio in range(0, len(tabla_aristas), LINEAS_POR_ESCRITURA):
+            tramo = tabla_aristas.iloc[inicio:inicio + LINEAS_POR_ESCRITURA]
+            yield from zip(ids[tramo['origen'].to_numpy()].tolist(), ids[tramo['destino'].to_numpy()].tolist(),
+                           tramo['weight'].tolist())
+    return nodos(), aristas(), False
+
+
+def _abrir(ruta: str, comprimir: Optional[bool]):
+    if comprimir is None:
+        comprimir = ruta.endswith('.gz')
+    if comprimir:
+        return gzip.open(ruta, 'wt', encoding='utf-8', compresslevel=6)
+    return open(ruta, 'w', encoding='utf-8', buffering=1 << 20)
+
+
+def _escribir_por_lotes(archivo, lineas: Iterable[str]) -> int:
+    lote, total = [], 0
+    for linea in lineas:
+        lote.append(linea)
+        if len(lote) >= LINEAS_POR_ESCRITURA:
+            archivo.write(''.join(lote))
+            total += len(lote)
+            lote = []
+    archivo.write(''.join(lote))
+    return total + len(lote)
+
+
+# --- GEXF 1.2 ---
+def exportar_gexf(grafo, ruta: str, atributos_nodo: Sequence[str] = ('tipo',),
+                  comprimir: Optional[bool] = None,
+                  tipos_atributo: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+    """
+    Escribe el grafo en GEXF sin armar el XML en memoria. Devuelve (nodos, aristas).
+    tipos_atributo: {atributo: 'string' | 'integer' | 'double'} (por defecto 'string').
+    """
+    nodos, aristas, dirigido = _fuentes(grafo, atributos_nodo)
+    tipos = {atributo: (tipos_atributo or {}).get(atributo, 'string') for atributo in atributos_nodo}
+    with _abrir(ruta, comprimir) as archivo:
+        archivo.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<gexf xmlns="http://www.gexf.net/1.2draft" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" version="1.2">\n'
+            f'  <meta lastmodifieddate="{datetime.date.today().isoformat()}">\n'
+            '    <creator>exportar_grafo.py</creator>\n'
+            '  </meta>\n'
+            f'  <graph defaultedgetype="{"directed" if dirigido else "undirected"}" mode="static" name="">\n'
+            '    <attributes mode="static" class="node">\n')
+        for i, atributo in enumerate(atributos_nodo):
+            archivo.write(f'      <attribute id="{i}" title={_attr(atributo)} type="{tipos[atributo]}" />\n')
+        archivo.write('    </attributes>\n    <nodes>\n')
+
+        posicion = {atributo: i for i, atributo in enumerate(atributos_nodo)}
+
+        def lineas_nodos():
+            for nodo, label, valores in nodos:
+                if valores:
+                    attvalues = ''.join(f'          <attvalue for="{posicion[a]}" '
+                                        f'value={_attr(_valor(v, tipos[a]))} />\n'
+                                        for a, v in valores.items())
+                    yield (f'      <node id={_attr(nodo)} label={_attr(label)}>\n'
+                           f'        <attvalues>\n{attvalues}        </attvalues>\n      </node>\n')
+                else:
+                    yield f'      <node id={_attr(nodo)} label={_attr(label)} />\n'
+
+        def lineas_aristas():
+            for i, (u, v, peso) in enumerate(aristas):
+                yield f'      <edge source={_attr(u)} target={_attr(v)} id="{i}" weight="{float(peso)!r}" />\n'
+
+        total_nodos = _escribir_por_lotes(archivo, lineas_nodos())
+        archivo.write('    </nodes>\n    <edges>\n')
+        total_aristas = _escribir_por_lotes(archivo, lineas_aristas())
+        archivo.write('    </edges>\n  </graph>\n</gexf>\n')
+    return total_nodos, total_aristas
+
+
+# --- GraphML ---
+def exportar_graphml(grafo, ruta: str, atributos_nodo: Sequence[str] = ('tipo',),
+                     comprimir: Optional[bool] = None,
+                     tipos_atributo: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+    """ Igual que `exportar_gexf` pero en GraphML (label/tipo en nodos, weight en aristas). """
+    nodos, aristas, dirigido = _fuentes(grafo, atributos_nodo)
+    tipos = {atributo: (tipos_atributo or {}).get(atributo, 'string') for atributo in atributos_nodo}
+    tipos['label'] = 'string'
+    tipos_graphml = {'string': 'string', 'integer': 'int', 'double': 'double'}
+    claves = {atributo: f'd{i}' for i, atributo in enumerate(('label',) + tuple(atributos_nodo))}
+    clave_peso = f'd{len(claves)}'
+    with _abrir(ruta, comprimir) as archivo:
+        archivo.write(
+            "<?xml version='1.0' encoding='utf-8'?>\n"
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+            'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+        for atributo, clave in claves.items():
+            archivo.write(f'  <key id="{clave}" for="node" attr.name={_attr(atributo)} '
+                          f'attr.type="{tipos_graphml[tipos[atributo]]}" />\n')
+        archivo.write(f'  <key id="{clave_peso}" for="edge" attr.name="weight" attr.type="double" />\n'
+                      f'  <graph edgedefault="{"directed" if dirigido else "undirected"}">\n')
+
+        def lineas_nodos():
+            for nodo, label, valores in nodos:
+                datos = ''.join(f'      <data key="{claves[a]}">{escape(_valor(v, tipos[a]))}</data>\n'
+                                for a, v in (('label', label),) + tuple(valores.items()))
+                yield f'    <node id={_attr(nodo)}>\n{datos}    </node>\n'
+
+        def lineas_aristas():
+            for u, v, peso in aristas:
+                yield (f'    <edge source={_attr(u)} target={_attr(v)}>\n'
+                       f'      <data key="{clave_peso}">{float(peso)!r}</data>\n    </edge>\n')
+
+        total_nodos = _escribir_por_lotes(archivo, lineas_nodos())
+        total_aristas = _escribir_por_lotes(archivo, lineas_aristas())
+        archivo.write('  </graph>\n</graphml>\n')
+    return total_nodos, total_aristas
+
+
+# --- PRUEBA: IDA Y VUELTA CON NETWORKX + MEMORIA ---
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import tracemalloc
+
+    import pandas as pd
+
+    from grafo_compras import COL_FAMILIA, COL_PRODUCTO, COL_TIENDA, construir_grafo_tripartito, tablas_grafo
+
+    def resumen(G):
+        return ({str(n): (d.get('tipo'), str(d.get('label'))) for n, d in G.nodes(data=True)},
+                {frozenset((str(u), str(v))): float(p) for u, v, p in G.edges(data='weight')})
+
+    carpeta_datos = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+    df = pd.read_csv(os.path.join(carpeta_datos, 'dataset_compras_completo.csv'))
+    G = construir_grafo_tripartito(df)
+    carpeta = tempfile.mkdtemp()
+
+    # 1. Ida y vuelta (networkx y tablas, con y sin gzip)
+    esperado = resumen(G)
+    for fuente, nombre in ((G, 'nx'), (tablas_grafo(df), 'tablas')):
+        for extension, lector in (('gexf', nx.read_gexf), ('gexf.gz', nx.read_gexf),
+                                  ('graphml', nx.read_graphml), ('graphml.gz', nx.read_graphml)):
+            ruta = os.path.join(carpeta, f'{nombre}.{extension}')
+            (exportar_gexf if 'gexf' in extension else exportar_graphml)(fuente, ruta)
+            assert resumen(lector(ruta)) == esperado, ruta
+    print(f"✅ GEXF/GraphML (con y sin gzip) leídos por networkx: mismos {len(G)} nodos, "
+          f"tipos, labels y {G.number_of_edges()} pesos.")
+
+    # 2. Memoria: escritura en streaming vs nx.write_gexf
+    rng = np.random.default_rng(7)
+    n = 200_000
+    familias = np.array([f"Familia {i}" for i in range(20_000)], dtype=object)
+    grande = pd.DataFrame({COL_FAMILIA: familias[rng.integers(0, len(familias), n)],
+                           COL_PRODUCTO: [f"Producto {i}" for i in rng.integers(0, 500, n)],
+                           COL_TIENDA: [f"Tienda {i}" for i in rng.integers(0, 2_000, n)]})
+    tablas = tablas_grafo(grande)
+    G_grande = construir_grafo_tripartito(grande)
+    for nombre, exportar in (('streaming', lambda r: exportar_gexf(tablas, r)),
+                             ('nx.write_gexf', lambda r: nx.write_gexf(G_grande, r))):
+        ruta = os.path.join(carpeta, f'grande_{nombre}.gexf')
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        exportar(ruta)
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"⏱️ {nombre:<14} {len(tablas[1]):,} aristas: {segundos:.1f} s, pico {pico / 2**20:,.1f} MiB, "
+              f"{os.path.getsize(ruta) / 2**20:,.0f} MiB en disco")
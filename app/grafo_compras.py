@@ -0,0 +1,198 @@
+import time
+from typing import Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix, diags
+
+# =============================================================================
+# GRAFO TRIPARTITO DE COMPRAS VECTORIZADO (Familia - Producto - Tienda)
+# =============================================================================
+# OBJETIVO:
+#   Armar el grafo de `dataset_compras_completo.csv` sin `iterrows()`: antes
+#   se hacían 6 llamadas a networkx por fila, re-agregando los mismos nodos y
+#   aristas miles de veces.
+#
+# CÓMO FUNCIONA:
+#   1. `pd.factorize` convierte cada columna (familia, producto, tienda) en
+#      códigos enteros; los nombres se unen en un solo catálogo de nodos.
+#      Igual que antes: el orden de los nodos es el de su primera aparición y
+#      si un nombre aparece en dos columnas se queda con el `tipo` de la última
+#      (los NaN cuentan como un nodo más, como con iterrows).
+#   2. Cada fila da 3 pares (familia-producto, producto-tienda,
+#      familia-tienda). Cada tipo de par se cuenta con `bincount` sobre los
+#      códigos locales (o COO -> CSR si la grilla es enorme); luego los pares
+#      distintos se pasan a (menor, mayor) global y se suman: el conteo es el peso.
+#   3. Carga en bloque con `add_nodes_from` / `add_weighted_edges_from`, o
+#      directamente como matriz dispersa CSR (simétrica).
+#   Resultado: mismo grafo que antes (mismos nodos, tipos y aristas) y ahora
+#   con `weight` = cuántas compras repiten esa conexión.
+# =============================================================================
+
+COL_FAMILIA = 'nombre_representante'  # Columna B
+COL_PRODUCTO = 'producto'             # Columna D
+COL_TIENDA = 'nombre_tienda'          # Columna H
+
+COLUMNAS_TIPO = ((COL_FAMILIA, 'Familia'), (COL_PRODUCTO, 'Producto'), (COL_TIENDA, 'Tienda'))
+PARES = ((0, 1), (1, 2), (0, 2))      # Familia-Producto, Producto-Tienda, Familia-Tienda
+
+
+MAX_CELDAS_BINCOUNT = 100_000_000   # Más celdas que esto: el par se cuenta con COO -> CSR
+
+
+def _codigos_globales(df: pd.DataFrame):
+    """
+    Catálogo de nodos (nombre, tipo, label) y, por columna, (códigos locales,
+    código global de cada valor único).
+    """
+    n = len(df)
+    filas = np.arange(n, dtype=np.int64)
+    partes, locales = [], []
+    for k, (columna, tipo) in enumerate(COLUMNAS_TIPO):
+        codigos, unicos = pd.factorize(df[columna], use_na_sentinel=False)
+        primera = np.full(len(unicos), n, dtype=np.int64)
+        ultima = np.full(len(unicos), -1, dtype=np.int64)
+        np.minimum.at(primera, codigos, filas)
+        np.maximum.at(ultima, codigos, filas)
+        # Posición en la secuencia original de add_node (familia, producto, tienda por fila)
+        partes.append(pd.DataFrame({'nombre': pd.Series(unicos, dtype=object), 'tipo': tipo,
+                                    'primera': primera * 3 + k, 'ultima': ultima * 3 + k}))
+        locales.append((codigos, unicos))
+
+    catalogo = pd.concat(partes, ignore_index=True)
+    tipos = catalogo.sort_values('ultima').drop_duplicates('nombre', keep='last').set_index('nombre')['tipo']
+    nodos = catalogo.sort_values('primera').drop_duplicates('nombre', keep='first')[['nombre']]
+    nodos = nodos.reset_index(drop=True)
+    nodos['tipo'] = tipos.reindex(pd.Index(nodos['nombre'])).to_numpy()
+    nodos['label'] = nodos['nombre'].map(str)
+
+    indice = pd.Index(nodos['nombre'])
+    columnas = [(codigos, indice.get_indexer(pd.Index(unicos, dtype=object))) for codigos, unicos in locales]
+    return nodos, columnas
+
+
+def _pares_columna(codigos_a, codigos_b, n_a: int, n_b: int):
+    """ Pares (local a, local b) distintos con su conteo. """
+    if n_a * n_b <= MAX_CELDAS_BINCOUNT:
+        conteo = np.bincount(codigos_a.astype(np.int64) * n_b + codigos_b, minlength=n_a * n_b)
+        claves = np.flatnonzero(conteo)
+        return claves // n_b, claves % n_b, conteo[claves]
+    matriz = coo_matrix((np.ones(len(codigos_a), dtype=np.int64), (codigos_a, codigos_b)), shape=(n_a, n_b)).tocsr()
+    matriz.sum_duplicates()
+    matriz = matriz.tocoo()
+    return matriz.row, matriz.col, matriz.data
+
+
+def _conteo_pares(columnas, n_nodos: int) -> coo_matrix:
+    """ Triángulo superior (menor, mayor) con cuántas veces aparece cada par. """
+    filas, cols, datos = [], [], []
+    for a, b in PARES:
+        (codigos_a, global_a), (codigos_b, global_b) = columnas[a], columnas[b]
+        local_a, local_b, conteo = _pares_columna(codigos_a, codigos_b, len(global_a), len(global_b))
+        u, v = global_a[local_a], global_b[local_b]
+        filas.append(np.minimum(u, v))
+        cols.append(np.maximum(u, v))
+        datos.append(conteo)
+    # Un mismo par puede salir de dos columnas si un nombre se repite entre tipos: se suman
+    conteo = coo_matrix((np.concatenate(datos), (np.concatenate(filas), np.concatenate(cols))),
+                        shape=(n_nodos, n_nodos)).tocsr()
+    conteo.sum_duplicates()
+    return conteo.tocoo()
+
+
+def tablas_grafo(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Devuelve (nodos, aristas):
+      nodos:   nombre, tipo, label (orden de primera aparición)
+      aristas: origen, destino, weight (índices de `nodos`; un par por arista)
+    """
+    nodos, columnas = _codigos_globales(df)
+    conteo = _conteo_pares(columnas, len(nodos))
+    aristas = pd.DataFrame({'origen': conteo.row.astype(np.int64), 'destino': conteo.col.astype(np.int64),
+                            'weight': conteo.data})
+    return nodos, aristas
+
+
+def construir_grafo_tripartito(df: pd.DataFrame) -> nx.Graph:
+    """ Grafo de networkx con atributos tipo/label en nodos y weight en aristas. """
+    nodos, aristas = tablas_grafo(df)
+    nombres = nodos['nombre'].to_numpy()
+    G = nx.Graph()
+    G.add_nodes_from((nombre, {'tipo': tipo, 'label': label})
+                     for nombre, tipo, label in zip(nombres, nodos['tipo'], nodos['label']))
+    G.add_weighted_edges_from(zip(nombres[aristas['origen'].to_numpy()].tolist(),
+                                  nombres[aristas['destino'].to_numpy()].tolist(),
+                                  aristas['weight'].tolist()))
+    return G
+
+
+def adyacencia_desde_aristas(n_nodos: int, aristas: pd.DataFrame) -> csr_matrix:
+    """ CSR simétrica (n x n) con los pesos de la tabla de aristas (lazos una sola vez). """
+    origen, destino = aristas['origen'].to_numpy(), aristas['destino'].to_numpy()
+    pesos = aristas['weight'].to_numpy()
+    superior = coo_matrix((pesos, (origen, destino)), shape=(n_nodos, n_nodos)).tocsr()
+    superior.sum_duplicates()
+    simetrica = superior + superior.T - diags(superior.diagonal(), format='csr', dtype=superior.dtype)
+    simetrica.eliminate_zeros()
+    return simetrica.tocsr()
+
+
+def matriz_adyacencia(df: pd.DataFrame) -> Tuple[pd.DataFrame, csr_matrix]:
+    """ (nodos, adyacencia CSR simétrica con pesos), sin pasar por networkx. """
+    nodos, aristas = tablas_grafo(df)
+    return nodos, adyacencia_desde_aristas(len(nodos), aristas)
+
+
+# --- PRUEBA: MISMO GRAFO QUE LA VERSIÓN CON iterrows + ESCALA ---
+if __name__ == "__main__":
+    import os
+
+    def construir_con_iterrows(df):
+        """ Versión original de dataset_compras_completo.py (referencia). """
+        G = nx.Graph()
+        for _, fila in df.iterrows():
+            nodo_familia, nodo_producto, nodo_tienda = fila[COL_FAMILIA], fila[COL_PRODUCTO], fila[COL_TIENDA]
+            G.add_node(nodo_familia, tipo='Familia', label=str(nodo_familia))
+            G.add_node(nodo_producto, tipo='Producto', label=str(nodo_producto))
+            G.add_node(nodo_tienda, tipo='Tienda', label=str(nodo_tienda))
+            G.add_edge(nodo_familia, nodo_producto)
+            G.add_edge(nodo_producto, nodo_tienda)
+            G.add_edge(nodo_familia, nodo_tienda)
+        return G
+
+    def mismo_grafo(G1, G2):
+        # Las claves NaN no se comparan por igualdad: se pasan a texto
+        nodos = lambda G: {str(n): d for n, d in G.nodes(data=True)}
+        aristas = lambda G: {frozenset((str(a), str(b))) for a, b in G.edges()}
+        return nodos(G1) == nodos(G2) and aristas(G1) == aristas(G2)
+
+    carpeta = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+    df = pd.read_csv(os.path.join(carpeta, 'dataset_compras_completo.csv'))
+    antes, ahora = construir_con_iterrows(df), construir_grafo_tripartito(df)
+    assert mismo_grafo(antes, ahora)
+    assert nx.is_isomorphic(antes, ahora, node_match=lambda a, b: a['tipo'] == b['tipo'])
+    assert sum(d['weight'] for *_, d in ahora.edges(data=True)) == 3 * len(df)
+    nodos, matriz = matriz_adyacencia(df)
+    assert matriz.nnz == 2 * ahora.number_of_edges() - nx.number_of_selfloops(ahora)
+    print(f"✅ dataset_compras_completo.csv: {ahora.number_of_nodes()} nodos / {ahora.number_of_edges()} aristas, "
+          f"igual (e isomorfo) al grafo con iterrows.")
+
+    # Escala: 10M compras sintéticas (cada familia compra en ~20 tiendas cercanas,
+    # los productos siguen una distribución de Zipf)
+    rng = np.random.default_rng(3)
+    n = 10_000_000
+    familias = np.array([f"Familia {i}" for i in range(20_000)], dtype=object)
+    productos = np.array([f"Producto {i}" for i in range(500)], dtype=object)
+    tiendas = np.array([f"Tienda {i}" for i in range(2_000)], dtype=object)
+    familia = rng.integers(0, len(familias), n)
+    grande = pd.DataFrame({COL_FAMILIA: familias[familia],
+                           COL_PRODUCTO: productos[np.minimum(rng.zipf(1.3, n) - 1, len(productos) - 1)],
+                           COL_TIENDA: tiendas[(familia * 7 + rng.integers(0, 20, n)) % len(tiendas)]})
+    inicio = time.perf_counter()
+    nodos, aristas = tablas_grafo(grande)
+    medio = time.perf_counter()
+    G = construir_grafo_tripartito(grande)
+    fin = time.perf_counter()
+    print(f"⏱️ {n:,} compras -> {len(nodos):,} nodos / {len(aristas):,} aristas: "
+          f"tablas {medio - inicio:.2f} s | grafo networkx {fin - medio:.2f} s")
@@ -0,0 +1,236 @@
+import bisect
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# ÍNDICE DE OFERTAS EN MEMORIA (Snapshot columnar)
+# =============================================================================
+# OBJETIVO:
+#   Evitar el JOIN OFERTAS/PRODUCTOS/TIENDAS contra SQL en cada optimización.
+#
+# CÓMO FUNCIONA:
+#   1. Se lee UNA vez el JOIN completo y se ordena por producto.
+#   2. Cada columna se guarda como un arreglo NumPy (formato columnar).
+#   3. Un diccionario producto -> (inicio, fin) apunta al tramo contiguo de
+#      ofertas de ese producto.
+#   4. Consultar las ofertas de una lista = búsqueda en el diccionario +
+#      rebanado de arreglos, sin viajar a la base de datos.
+#   5. El snapshot se recarga con `refrescar()` o automáticamente cuando pasa
+#      el `intervalo_refresco` (segundos). Cada recarga sube la `version`
+#      (contador del proceso, solo informativo). Para cachés compartidos entre
+#      procesos se usa `huella(productos)`: depende solo del CONTENIDO de las
+#      ofertas de esos productos (hash de sus filas, precalculado por producto).
+#   6. Para las recomendaciones de vuelto, cada snapshot guarda además el
+#      precio mínimo de cada producto ordenado de menor a mayor: el top-k
+#      "más caros que aún alcanzan" es una búsqueda binaria + recorrido hacia
+#      atrás saltando los productos ya comprados.
+# =============================================================================
+
+QUERY_OFERTAS_COMPLETAS = """
+SELECT
+    P.producto,
+    O.precio_soles AS precio_producto,
+    T.nombre_tienda,
+    T.id_tienda,
+    T.distrito AS distrito_tienda
+FROM OFERTAS O
+INNER JOIN PRODUCTOS P ON O.id_producto = P.id_producto
+INNER JOIN TIENDAS T ON O.id_tienda = T.id_tienda
+"""
+
+COLUMNAS_OFERTAS = ['producto', 'precio_producto', 'nombre_tienda', 'id_tienda', 'distrito_tienda']
+
+
+class SnapshotOfertas:
+    """ Foto inmutable de las ofertas: columnas NumPy + tramos por producto. """
+
+    def __init__(self, df_ofertas: pd.DataFrame, version: int):
+        df = df_ofertas[COLUMNAS_OFERTAS].sort_values('producto', kind='stable').reset_index(drop=True)
+        self.version = version
+        self.cargado_en = time.monotonic()
+        self.columnas = {col: df[col].to_numpy() for col in COLUMNAS_OFERTAS}
+        self.precios = df['precio_producto'].to_numpy(dtype=float)
+
+        productos, inicios = np.unique(df['producto'].to_numpy(dtype=object), return_index=True)
+        fines = np.append(inicios[1:], len(df))
+        self.tramos: Dict[str, Tuple[int, int]] = {
+            producto: (int(inicio), int(fin)) for producto, inicio, fin in zip(productos, inicios, fines)
+        }
+
+        # Precio mínimo por producto, ascendente (en empate, nombre descendente
+        # para que al recorrer hacia atrás salgan en orden alfabético)
+        minimos = np.minimum.reduceat(self.precios, inicios) if len(inicios) else np.zeros(0)
+        orden = np.lexsort((-np.arange(len(productos)), minimos))
+        self.precios_minimos = minimos[orden].tolist()
+        self.productos_por_precio = productos[orden].tolist()
+        self._tiendas_por_producto: Dict[str, np.ndarray] = {}
+
+        # Hash de cada fila sumado por producto (mod 2^64): no depende del orden de las filas
+        filas = pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+        sumas = np.add.reduceat(filas, inicios) if len(inicios) else np.zeros(0, dtype=np.uint64)
+        self._huellas_producto: Dict[str, int] = dict(zip(productos.tolist(), sumas.tolist()))
+
+    def __len__(self):
+        return len(self.precios)
+
+    def posiciones(self, productos: List[str]) -> np.ndarray:
+        """ Índices de todas las ofertas de los productos pedidos (los desconocidos se ignoran). """
+        tramos = [self.tramos[p] for p in dict.fromkeys(productos) if p in self.tramos]
+        if not tramos:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(inicio, fin) for inicio, fin in tramos])
+
+    def ofertas(self, productos: List[str], tiendas: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Mismas columnas que el JOIN de obtener_ofertas_y_distrito, solo para
+        `productos` (y, si se pasa, solo de los id_tienda en `tiendas`).
+        """
+        posiciones = self.posiciones(productos)
+        if tiendas is not None:
+            posiciones = posiciones[np.isin(self.columnas['id_tienda'][posiciones], tiendas)]
+        return pd.DataFrame({col: valores[posiciones] for col, valores in self.columnas.items()})
+
+    def huella(self, productos: List[str]) -> str:
+        """ Huella del contenido de las ofertas de `productos` (igual en cualquier proceso). """
+        partes = sorted((p, self._huellas_producto.get(p, 0)) for p in set(productos))
+        return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+    def tiendas_con(self, productos: List[str], todos: bool = False) -> np.ndarray:
+        """ id_tienda (ordenados) que venden alguno de los `productos` (todos=True: todos los conocidos). """
+        por_producto = [self.tiendas_producto(p) for p in dict.fromkeys(productos) if p in self.tramos]
+        if not por_producto:
+            return np.zeros(0, dtype=np.int64)
+        combinar = np.intersect1d if todos else np.union1d
+        resultado = por_producto[0]
+        for tiendas in por_producto[1:]:
+            resultado = combinar(resultado, tiendas)
+        return resultado
+
+    def tiendas_producto(self, producto: str) -> np.ndarray:
+        """ id_tienda (ordenados, sin repetir) que venden `producto`; se calcula la primera vez. """
+        tiendas = self._tiendas_por_producto.get(producto)
+        if tiendas is None:
+            inicio, fin = self.tramos[producto]
+            tiendas = np.unique(self.columnas['id_tienda'][inicio:fin].astype(np.int64))
+            self._tiendas_por_producto[producto] = tiendas
+        return tiendas
+
+    def top_k(self, presupuesto: float, excluidos: Set[str], k: int = 5) -> List[Tuple[str, float]]:
+        """ Top-k (producto, precio mínimo <= presupuesto) del más caro al más barato. """
+        i = bisect.bisect_right(self.precios_minimos, presupuesto) - 1
+        elegidos = []
+        while i >= 0 and len(elegidos) < k:
+            producto = self.productos_por_precio[i]
+            if producto not in excluidos:
+                elegidos.append((producto, self.precios_minimos[i]))
+            i -= 1
+        return elegidos
+
+    def recomendar(self, presupuesto: float, excluidos: Set[str], k: int = 5) -> pd.DataFrame:
+        """ Mismas columnas que la consulta SQL de recomendar_productos_extra. """
+        return pd.DataFrame(self.top_k(presupuesto, excluidos, k), columns=['producto', 'precio'])
+
+
+class IndiceOfertas:
+    """ Snapshot de ofertas recargable y seguro entre hilos. """
+
+    def __init__(self, engine, intervalo_refresco: Optional[float] = None):
+        self.engine = engine
+        self.intervalo_refresco = intervalo_refresco
+        self._candado = threading.Lock()
+        self._snapshot: Optional[SnapshotOfertas] = None
+        self.refrescar()
+
+    def _cargar(self) -> SnapshotOfertas:
+        df = pd.read_sql(QUERY_OFERTAS_COMPLETAS, self.engine)
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        return SnapshotOfertas(df, version)
+
+    def refrescar(self) -> SnapshotOfertas:
+        """ Relee el JOIN completo y reemplaza el snapshot de forma atómica. """
+        with self._candado:
+            self._snapshot = self._cargar()
+            return self._snapshot
+
+    @property
+    def snapshot(self) -> SnapshotOfertas:
+        """ Snapshot vigente; se recarga si ya venció el intervalo de refresco. """
+        snapshot = self._snapshot
+        if self.intervalo_refresco is not None and \
+                time.monotonic() - snapshot.cargado_en >= self.intervalo_refresco:
+            with self._candado:
+                # Si otro hilo ya lo recargó mientras esperábamos, se usa ese
+                if self._snapshot is snapshot:
+                    self._snapshot = self._cargar()
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def ofertas(self, productos: List[str], tiendas: Optional[np.ndarray] = None) -> pd.DataFrame:
+        return self.snapshot.ofertas(productos, tiendas)
+
+    def tiendas_con(self, productos: List[str], todos: bool = False) -> np.ndarray:
+        return self.snapshot.tiendas_con(productos, todos)
+
+    def huella(self, productos: List[str]) -> str:
+        return self.snapshot.huella(productos)
+
+    def recomendar(self, presupuesto: float, excluidos: Set[str], k: int = 5) -> pd.DataFrame:
+        return self.snapshot.recomendar(presupuesto, excluidos, k)
+
+
+# --- PRUEBA CONTRA SQLITE ---
+if __name__ == "__main__":
+    from conexion_sqlite import crear_engine_sqlite
+
+    engine = crear_engine_sqlite()
+    indice = IndiceOfertas(engine)
+    print(f"✅ Snapshot v{indice.version}: {len(indice.snapshot)} ofertas, {len(indice.snapshot.tramos)} productos.")
+
+    productos = list(indice.snapshot.tramos)[:6] + ['Producto inexistente']
+    placeholders = ','.join(['?'] * len(productos))
+    esperado = pd.read_sql(QUERY_OFERTAS_COMPLETAS + f" WHERE P.producto IN ({placeholders})",
+                           engine, params=tuple(productos))
+
+    obtenido = indice.ofertas(productos)
+    orden = ['producto', 'id_tienda']
+    pd.testing.assert_frame_equal(
+        obtenido.sort_values(orden).reset_index(drop=True),
+        esperado.sort_values(orden).reset_index(drop=True),
+        check_dtype=False,
+    )
+    print(f"✅ {len(obtenido)} ofertas idénticas a la consulta SQL.")
+
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        indice.ofertas(productos)
+    print(f"⏱️ Consulta en memoria: {(time.perf_counter() - inicio):.3f} ms promedio")
+
+    # Recomendaciones: mismo top 5 que el GROUP BY ... HAVING (LIMIT en SQLite)
+    query_top = """
+    SELECT P.producto, MIN(O.precio_soles) AS precio
+    FROM OFERTAS O
+    INNER JOIN PRODUCTOS P ON O.id_producto = P.id_producto
+    GROUP BY P.producto
+    HAVING MIN(O.precio_soles) <= ? AND P.producto NOT IN ({})
+    ORDER BY MIN(O.precio_soles) DESC, P.producto ASC
+    LIMIT 5
+    """
+    for extra in (0.5, 3.0, 10.0, 25.0, 100.0):
+        comprados = productos[:3]
+        esperado = pd.read_sql(query_top.format(','.join(['?'] * len(comprados))), engine,
+                               params=tuple([extra] + comprados))
+        obtenido = indice.recomendar(extra, set(comprados))
+        pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False)
+    inicio = time.perf_counter()
+    for _ in range(10000):
+        indice.snapshot.top_k(10.0, set(comprados))
+    print(f"✅ Recomendaciones idénticas al SQL ({(time.perf_counter() - inicio) * 100:.1f} µs promedio).")
@@ -0,0 +1,279 @@
+import math
+import os
+import time
+import unicodedata
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# =============================================================================
+# ÍNDICE ESPACIAL DE TIENDAS ("ofertas a menos de X km")
+# =============================================================================
+# OBJETIVO:
+#   `obtener_ofertas_y_distrito` traía TODAS las tiendas de la ciudad que
+#   venden un producto y recién después ponderaba por distancia. Con decenas
+#   de miles de tiendas, el optimizador recibiría cientos de miles de ofertas.
+#
+# CÓMO FUNCIONA:
+#   1. Cada tienda tiene `latitud` / `longitud` en TIENDAS (tiendas.csv; en
+#      SQL Server se agregan con scripts/migracion_tiendas_coordenadas.sql).
+#   2. Las coordenadas se proyectan a km sobre un plano local
+#      (equirectangular centrado en la ciudad: error < 0.1% dentro de Lima)
+#      y se indexan en un KD-tree (`scipy.spatial.cKDTree`).
+#   3. Consultas:
+#      - k más cercanas      -> `query` (O(log n) por consulta)
+#      - todas en un radio   -> `query_ball_point`
+#      Filtradas por productos: el snapshot de ofertas (indice_ofertas.py)
+#      guarda, por producto, los id_tienda ordenados que lo venden; los
+#      candidatos del KD-tree se prueban con búsqueda binaria. Si el filtro
+#      deja pasar pocos, se busca más lejos (k x 4) hasta completar k, o se
+#      miden directamente las tiendas que venden (si son pocas).
+#   4. El optimizador (OptimizadorCanasta con indice_tiendas + k_tiendas /
+#      radio_km) solo lee las ofertas de esas tiendas candidatas.
+#
+# USO:
+#   indice = IndiceTiendas.desde_csv()
+#   indice.cercanas(-12.12, -77.03, k=5, productos=['Arroz (kg)'], ofertas=indice_ofertas)
+#   indice.cercanas(-12.12, -77.03, radio_km=3)
+# =============================================================================
+
+CARPETA_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+RUTA_TIENDAS = os.path.join(CARPETA_DATOS, 'tiendas.csv')
+QUERY_TIENDAS = "SELECT id_tienda, nombre_tienda, distrito, latitud, longitud FROM TIENDAS"
+COLUMNAS_TIENDAS = ['id_tienda', 'nombre_tienda', 'distrito', 'latitud', 'longitud']
+RADIO_TIERRA_KM = 6371.0088
+FACTOR_BUSQUEDA = 4   # Si el filtro por productos deja menos de k, se busca k x 4 más lejos
+
+
+def normalizar_distrito(distrito: str) -> str:
+    """ 'Jesús María' y 'Jesus Maria' son el mismo distrito (data/mapa_lima.csv no usa tildes). """
+    sin_tildes = unicodedata.normalize('NFKD', str(distrito)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_tildes.lower().split())
+
+
+class IndiceTiendas:
+    """ KD-tree inmutable sobre las coordenadas de las tiendas (en km). """
+
+    def __init__(self, df_tiendas: pd.DataFrame):
+        faltantes = [col for col in COLUMNAS_TIENDAS if col not in df_tiendas.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en TIENDAS: {', '.join(faltantes)}")
+        df = df_tiendas[COLUMNAS_TIENDAS]
+        con_coordenadas = df['latitud'].notna() & df['longitud'].notna()
+        self.sin_coordenadas = int((~con_coordenadas).sum())
+        df = df[con_coordenadas].reset_index(drop=True)
+
+        self.ids = df['id_tienda'].to_numpy(dtype=np.int64)
+        self.nombres = df['nombre_tienda'].to_numpy(dtype=object)
+        self.distritos = df['distrito'].to_numpy(dtype=object)
+        self.latitudes = df['latitud'].to_numpy(dtype=float)
+        self.longitudes = df['longitud'].to_numpy(dtype=float)
+        self.latitud_0 = float(self.latitudes.mean()) if len(df) else 0.0
+        self.longitud_0 = float(self.longitudes.mean()) if len(df) else 0.0
+        self.puntos = self.a_km(self.latitudes, self.longitudes)
+        self.arbol = cKDTree(self.puntos) if len(df) else None
+        self._orden_ids = np.argsort(self.ids, kind='stable')
+
+        # Centro de cada distrito = promedio de sus tiendas (para quien solo da su distrito)
+        centros = df.assign(clave=df['distrito'].map(normalizar_distrito)).groupby('clave')[['latitud', 'longitud']]
+        self.centros = {clave: (float(fila.latitud), float(fila.longitud))
+                        for clave, fila in centros.mean().iterrows()}
+
+    @classmethod
+    def desde_csv(cls, ruta: str = RUTA_TIENDAS) -> 'IndiceTiendas':
+        return cls(pd.read_csv(ruta))
+
+    @classmethod
+    def desde_sql(cls, engine) -> 'IndiceTiendas':
+        """ Requiere las columnas de scripts/migracion_tiendas_coordenadas.sql. """
+        return cls(pd.read_sql(QUERY_TIENDAS, engine))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Proyección ---
+    def a_km(self, latitud, longitud) -> np.ndarray:
+        """ (x, y) en km sobre el plano local de la ciudad. """
+        latitud = np.asarray(latitud, dtype=float)
+        longitud = np.asarray(longitud, dtype=float)
+        escala = math.pi / 180.0 * RADIO_TIERRA_KM
+        x = (longitud - self.longitud_0) * escala * math.cos(math.radians(self.latitud_0))
+        y = (latitud - self.latitud_0) * escala
+        return np.column_stack([np.atleast_1d(x), np.atleast_1d(y)])
+
+    def centro_distrito(self, distrito: str) -> Optional[Tuple[float, float]]:
+        """ (latitud, longitud) promedio de las tiendas del distrito, o None si no hay. """
+        return self.centros.get(normalizar_distrito(distrito))
+
+    # --- Consultas ---
+    @staticmethod
+    def _filtro(productos: Optional[Iterable[str]], ofertas, todos: bool):
+        """ (id_tienda ordenados de cada producto, todos) o None si no se filtra. """
+        if productos is None or ofertas is None:
+            return None
+        snapshot = getattr(ofertas, 'snapshot', ofertas)
+        return [snapshot.tiendas_producto(p) for p in dict.fromkeys(productos) if p in snapshot.tramos], todos
+
+    @staticmethod
+    def _contiene(filtro, ids: np.ndarray) -> np.ndarray:
+        """ Qué `ids` pasan el filtro: búsqueda binaria en cada lista (sin unirlas). """
+        listas, todos = filtro
+        if not listas:
+            return np.zeros(len(ids), dtype=bool)
+        pruebas = [lista[np.minimum(np.searchsorted(lista, ids), len(lista) - 1)] == ids
+                   for lista in listas if len(lista)]
+        if len(pruebas) < len(listas):
+            pruebas.append(np.full(len(ids), not todos))
+        return np.logical_and.reduce(pruebas) if todos else np.logical_or.reduce(pruebas)
+
+    @staticmethod
+    def _cantidad(filtro) -> int:
+        """ Cota superior de tiendas que pasan el filtro. """
+        listas, todos = filtro
+        tamanos = [len(lista) for lista in listas] or [0]
+        return min(tamanos) if todos else sum(tamanos)
+
+    def _posiciones_filtro(self, filtro) -> np.ndarray:
+        listas, todos = filtro
+        if not listas:
+            return np.zeros(0, dtype=np.int64)
+        ids = listas[0]
+        for lista in listas[1:]:
+            ids = np.intersect1d(ids, lista, assume_unique=True) if todos else np.union1d(ids, lista)
+        return self._posiciones_de(ids)
+
+    def _ordenar(self, punto: np.ndarray, posiciones: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        distancias = np.hypot(*(self.puntos[posiciones] - punto).T) if len(posiciones) else np.zeros(0)
+        orden = np.lexsort((posiciones, distancias))
+        return posiciones[orden], distancias[orden]
+
+    def _k_cercanas(self, punto: np.ndarray, k: int, radio_km: float, filtro) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self.ids)
+        if filtro is not None:
+            cantidad = self._cantidad(filtro)
+            # Pocas tiendas venden lo pedido (el KD-tree tendría que recorrer
+            # ~k·n/cantidad vecinos para hallar k): se miden directamente
+            if cantidad <= k * FACTOR_BUSQUEDA or cantidad * cantidad < k * n:
+                posiciones, distancias = self._ordenar(punto, self._posiciones_filtro(filtro))
+                dentro = distancias[:k] <= radio_km
+                return posiciones[:k][dentro], distancias[:k][dentro]
+
+        buscar = k
+        while True:
+            distancias, posiciones = self.arbol.query(punto, k=min(buscar, n), distance_upper_bound=radio_km)
+            distancias, posiciones = np.atleast_1d(distancias), np.atleast_1d(posiciones)
+            validas = posiciones < n   # cKDTree marca "no hay más" con n
+            if filtro is not None:
+                validas[validas] = self._contiene(filtro, self.ids[posiciones[validas]])
+            agotado = buscar >= n or np.isinf(distancias[-1])
+            if validas.sum() >= k or agotado:
+                return posiciones[validas][:k], distancias[validas][:k]
+            buscar *= FACTOR_BUSQUEDA
+
+    def _posiciones_de(self, ids: np.ndarray) -> np.ndarray:
+        """ Posición en el índice de cada id_tienda (se omiten las tiendas sin coordenadas). """
+        lugar = np.minimum(np.searchsorted(self.ids[self._orden_ids], ids), max(len(self.ids) - 1, 0))
+        posiciones = self._orden_ids[lugar]
+        return posiciones[self.ids[posiciones] == ids]
+
+    def posiciones_cercanas(self, latitud: float, longitud: float, k: Optional[int] = None,
+                            radio_km: Optional[float] = None, productos: Optional[Iterable[str]] = None,
+                            ofertas=None, todos: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """ (posiciones en el índice, distancias en km), de la más cercana a la más lejana. """
+        if self.arbol is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        punto = self.a_km(latitud, longitud)[0]
+        filtro = self._filtro(productos, ofertas, todos)
+        radio = math.inf if radio_km is None else float(radio_km)
+
+        if k is not None:
+            return self._k_cercanas(punto, int(k), radio, filtro)
+        if radio_km is not None:
+            posiciones = np.asarray(self.arbol.query_ball_point(punto, radio), dtype=np.int64)
+            if filtro is not None:
+                posiciones = posiciones[self._contiene(filtro, self.ids[posiciones])]
+        else:
+            posiciones = self._posiciones_filtro(filtro) if filtro is not None else np.arange(len(self.ids))
+        return self._ordenar(punto, posiciones)
+
+    def ids_cercanas(self, *args, **kwargs) -> np.ndarray:
+        """ Igual que `cercanas` pero solo los id_tienda (lo que usa el optimizador). """
+        posiciones, _ = self.posiciones_cercanas(*args, **kwargs)
+        return self.ids[posiciones]
+
+    def cercanas(self, latitud: float, longitud: float, k: Optional[int] = None,
+                 radio_km: Optional[float] = None, productos: Optional[Iterable[str]] = None,
+                 ofertas=None, todos: bool = False) -> pd.DataFrame:
+        """
+        Tiendas más cercanas a (latitud, longitud):
+          k:         las k más cercanas (combinable con radio_km como tope)
+          radio_km:  todas a menos de radio_km
+          productos + ofertas (IndiceOfertas / SnapshotOfertas): solo tiendas
+                     que venden alguno de los productos (todos=True: todos).
+        Columnas: id_tienda, nombre_tienda, distrito, latitud, longitud, distancia_km.
+        """
+        posiciones, distancias = self.posiciones_cercanas(latitud, longitud, k, radio_km, productos, ofertas, todos)
+        return pd.DataFrame({'id_tienda': self.ids[posiciones], 'nombre_tienda': self.nombres[posiciones],
+                             'distrito': self.distritos[posiciones], 'latitud': self.latitudes[posiciones],
+                             'longitud': self.longitudes[posiciones], 'distancia_km': distancias})
+
+
+# --- PRUEBA: MISMAS RESPUESTAS QUE LA FUERZA BRUTA + ESCALA ---
+if __name__ == "__main__":
+    from conexion_sqlite import crear_engine_sqlite
+    from indice_ofertas import IndiceOfertas
+
+    engine = crear_engine_sqlite()
+    indice_ofertas = IndiceOfertas(engine)
+    indice = IndiceTiendas.desde_sql(engine)
+    print(f"✅ {len(indice)} tiendas con coordenadas ({indice.sin_coordenadas} sin coordenadas).")
+
+    latitud, longitud = indice.centro_distrito('Miraflores')
+    productos = list(indice_ofertas.snapshot.tramos)[:2]
+    print(f"📍 Cerca de Miraflores que venden {', '.join(productos)}:")
+    print(indice.cercanas(latitud, longitud, k=3, productos=productos, ofertas=indice_ofertas).to_string(index=False))
+
+    def fuerza_bruta(ind, lat, lon, k, radio, mascara):
+        distancias = np.hypot(*(ind.puntos - ind.a_km(lat, lon)[0]).T)
+        posiciones = np.arange(len(ind.ids))
+        if mascara is not None:
+            posiciones = posiciones[mascara]
+        if radio is not None:
+            posiciones = posiciones[distancias[posiciones] <= radio]
+        posiciones = posiciones[np.lexsort((posiciones, distancias[posiciones]))]
+        return posiciones[:k] if k is not None else posiciones
+
+    # Escala: 50k tiendas sintéticas en un área como Lima (~40 x 50 km), 200 productos
+    rng = np.random.default_rng(7)
+    n, n_productos = 50_000, 200
+    tiendas = pd.DataFrame({'id_tienda': np.arange(1, n + 1), 'nombre_tienda': [f"Tienda {i}" for i in range(n)],
+                            'distrito': 'Lima', 'latitud': rng.uniform(-12.25, -11.85, n),
+                            'longitud': rng.uniform(-77.15, -76.85, n)})
+    ofertas_id = rng.integers(1, n + 1, 500_000)
+    ofertas_producto = np.minimum(rng.zipf(1.5, 500_000), n_productos)
+    df_ofertas = pd.DataFrame({'producto': [f"Producto {p}" for p in ofertas_producto],
+                               'precio_producto': rng.uniform(1, 30, 500_000), 'nombre_tienda': '',
+                               'id_tienda': ofertas_id, 'distrito_tienda': 'Lima'})
+    from indice_ofertas import SnapshotOfertas
+    snapshot = SnapshotOfertas(df_ofertas, version=1)
+
+    inicio = time.perf_counter()
+    grande = IndiceTiendas(tiendas)
+    print(f"⏱️ KD-tree de {n:,} tiendas: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    consultas = rng.uniform([-12.2, -77.1], [-11.9, -76.9], (200, 2))
+    for k, radio, productos in ((10, None, None), (None, 2.0, None), (5, None, ['Producto 150']),
+                                (None, 3.0, ['Producto 1', 'Producto 40']), (20, 1.0, ['Producto 7'])):
+        mascara = None if productos is None else np.isin(grande.ids, snapshot.tiendas_con(productos))
+        inicio = time.perf_counter()
+        respuestas = [grande.posiciones_cercanas(lat, lon, k, radio, productos, snapshot)[0] for lat, lon in consultas]
+        indice_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+        inicio = time.perf_counter()
+        esperadas = [fuerza_bruta(grande, lat, lon, k, radio, mascara) for lat, lon in consultas]
+        bruta_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+        assert all(np.array_equal(a, b) for a, b in zip(respuestas, esperadas))
+        print(f"✅ k={k}, radio={radio}, productos={productos}: igual a la fuerza bruta | "
+              f"{indice_ms:.3f} ms vs {bruta_ms:.3f} ms por consulta "
+              f"(~{np.mean([len(r) for r in respuestas]):.0f} tiendas)")
@@ -0,0 +1,292 @@
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+from grafo_compras import COL_FAMILIA, COL_PRODUCTO, COL_TIENDA, tablas_grafo
+
+# =============================================================================
+# INGESTA POR BLOQUES DEL HISTORIAL DE COMPRAS (Grafo incremental + checkpoint)
+# =============================================================================
+# OBJETIVO:
+#   `dataset_compras_completo.py` lee todo el CSV con `pd.read_csv` antes de
+#   armar el grafo; con un historial de varios GB no entra en memoria. Además
+#   el proceso nocturno solo debería procesar las compras NUEVAS.
+#
+# CÓMO FUNCIONA:
+#   1. El CSV se lee en bloques (`chunksize`) y solo con las 4 columnas que
+#      se usan: memoria acotada por el tamaño del bloque + el grafo.
+#   2. Cada bloque se resume con `tablas_grafo` (grafo_compras.py) y se
+#      fusiona con el acumulado: nodos nuevos al final (orden de primera
+#      aparición), `tipo` del último visto, pesos de aristas sumados.
+#   3. Las aristas pendientes se consolidan (COO -> CSR suma duplicados)
+#      cuando superan al acumulado: costo amortizado lineal.
+#   4. Estado persistido (.npz, escritura atómica) = grafo + checkpoint:
+#      filas del archivo ya procesadas, última `fecha` vista y cuántas filas
+#      de esa fecha ya se ingirieron.
+#      - desde='fila'  (por defecto): el historial solo crece al final; se
+#        saltan las filas ya procesadas.
+#      - desde='fecha': el archivo se regenera completo (export diario); se
+#        procesan las filas con `fecha` >= la última vista, saltando las
+#        primeras N de ese mismo día (ya ingeridas). `fecha` es por día: si
+#        la corrida fue antes del cierre, las compras tardías de ese día
+#        llegan en el siguiente export y no se pierden. Se asume que el
+#        export mantiene el orden relativo de las filas de un mismo día.
+#   Resultado: mismo grafo (nodos, tipos y pesos) que construirlo de una vez.
+#
+# USO (desde la raíz del proyecto):
+#   python app/ingesta_compras.py                       # primera vez o reanudar
+#   python app/ingesta_compras.py --bloque 500000 --desde fecha
+#   python app/ingesta_compras.py --verificar           # prueba de reanudación
+# =============================================================================
+
+RUTA_ESTADO = os.path.join('output', 'grafo_compras_estado.npz')
+COLUMNAS_LECTURA = [COL_FAMILIA, COL_PRODUCTO, COL_TIENDA, 'fecha']
+VERSION_ESTADO = 2   # 2: + filas_ultima_fecha
+
+
+class GrafoAcumulado:
+    """ Grafo tripartito que crece bloque a bloque (nodos + aristas con peso). """
+
+    def __init__(self):
+        self.nombres: List = []
+        self.tipos: List[str] = []
+        self._indice = pd.Index([], dtype=object)
+        self.origen = np.zeros(0, dtype=np.int64)
+        self.destino = np.zeros(0, dtype=np.int64)
+        self.peso = np.zeros(0, dtype=np.int64)
+        self._pendientes: List[np.ndarray] = []
+        self._cantidad_pendiente = 0
+        # Checkpoint
+        self.filas_procesadas = 0
+        self.ultima_fecha: Optional[str] = None
+        self.filas_ultima_fecha = 0   # Filas con fecha == ultima_fecha ya ingeridas (-1: todas)
+
+    # --- Fusión de un bloque ---
+    def agregar_bloque(self, bloque: pd.DataFrame) -> None:
+        if len(bloque) == 0:
+            return
+        nodos, aristas = tablas_grafo(bloque)
+        ids = self._indice.get_indexer(pd.Index(nodos['nombre'], dtype=object))
+        nuevos = np.flatnonzero(ids == -1)
+        if len(nuevos):
+            ids[nuevos] = np.arange(len(self.nombres), len(self.nombres) + len(nuevos))
+            self.nombres.extend(nodos['nombre'].iloc[nuevos].tolist())
+            self.tipos.extend([None] * len(nuevos))
+            self._indice = pd.Index(self.nombres, dtype=object)
+        # El tipo del bloque es el último visto (igual que add_node al recorrer filas)
+        for id_nodo, tipo in zip(ids.tolist(), nodos['tipo'].tolist()):
+            self.tipos[id_nodo] = tipo
+
+        u = ids[aristas['origen'].to_numpy()]
+        v = ids[aristas['destino'].to_numpy()]
+        self._pendientes.append(np.column_stack([np.minimum(u, v), np.maximum(u, v), aristas['weight'].to_numpy()]))
+        self._cantidad_pendiente += len(u)
+        if self._cantidad_pendiente > max(len(self.peso), 100_000):
+            self._consolidar()
+
+    def _consolidar(self) -> None:
+        if not self._pendientes:
+            return
+        todo = np.concatenate([np.column_stack([self.origen, self.destino, self.peso])] + self._pendientes)
+        n = len(self.nombres)
+        suma = coo_matrix((todo[:, 2], (todo[:, 0], todo[:, 1])), shape=(n, n)).tocsr()
+        suma.sum_duplicates()
+        suma = suma.tocoo()
+        self.origen, self.destino, self.peso = (suma.row.astype(np.int64), suma.col.astype(np.int64),
+                                                suma.data.astype(np.int64))
+        self._pendientes, self._cantidad_pendiente = [], 0
+
+    # --- Resultado ---
+    def tablas(self):
+        """ (nodos, aristas) con el mismo formato que `grafo_compras.tablas_grafo`. """
+        self._consolidar()
+        nodos = pd.DataFrame({'nombre': pd.Series(self.nombres, dtype=object), 'tipo': self.tipos})
+        nodos['label'] = nodos['nombre'].map(str)
+        aristas = pd.DataFrame({'origen': self.origen, 'destino': self.destino, 'weight': self.peso})
+        return nodos, aristas
+
+    def a_grafo(self) -> nx.Graph:
+        nodos, aristas = self.tablas()
+        nombres = nodos['nombre'].to_numpy()
+        G = nx.Graph()
+        G.add_nodes_from((nombre, {'tipo': tipo, 'label': label})
+                         for nombre, tipo, label in zip(nombres, nodos['tipo'], nodos['label']))
+        G.add_weighted_edges_from(zip(nombres[aristas['origen'].to_numpy()].tolist(),
+                                      nombres[aristas['destino'].to_numpy()].tolist(),
+                                      aristas['weight'].tolist()))
+        return G
+
+    # --- Persistencia (grafo + checkpoint en un solo archivo) ---
+    def guardar(self, ruta: str) -> None:
+        self._consolidar()
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        es_nan = np.array([isinstance(nombre, float) and np.isnan(nombre) for nombre in self.nombres], dtype=bool)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            np.savez_compressed(
+                archivo, version=VERSION_ESTADO,
+                nombres=np.array([str(nombre) for nombre in self.nombres], dtype=str), es_nan=es_nan,
+                tipos=np.array(self.tipos, dtype=str),
+                origen=self.origen, destino=self.destino, peso=self.peso,
+                filas_procesadas=self.filas_procesadas, ultima_fecha=self.ultima_fecha or '',
+                filas_ultima_fecha=self.filas_ultima_fecha)
+        os.replace(temporal, ruta)  # Un corte a mitad de escritura no daña el estado anterior
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'GrafoAcumulado':
+        with np.load(ruta) as datos:
+            version = int(datos['version'])
+            if version not in (1, VERSION_ESTADO):
+                raise ValueError(f"Versión de estado no soportada en {ruta}")
+            grafo = cls()
+            grafo.nombres = [np.nan if nan else nombre for nombre, nan in zip(datos['nombres'].tolist(),
+                                                                              datos['es_nan'].tolist())]
+            grafo.tipos = datos['tipos'].tolist()
+            grafo._indice = pd.Index(grafo.nombres, dtype=object)
+            grafo.origen, grafo.destino, grafo.peso = datos['origen'], datos['destino'], datos['peso']
+            grafo.filas_procesadas = int(datos['filas_procesadas'])
+            grafo.ultima_fecha = str(datos['ultima_fecha']) or None
+            # Estados v1 no guardaban el conteo: se asume el día completo (comportamiento anterior)
+            grafo.filas_ultima_fecha = int(datos['filas_ultima_fecha']) if version >= 2 else -1
+        return grafo
+
+
+def ingerir_compras(ruta_csv: str, ruta_estado: Optional[str] = RUTA_ESTADO, tamano_bloque: int = 100_000,
+                    desde: str = 'fila', guardar_cada: int = 10,
+                    estadisticas: Optional[Dict] = None) -> GrafoAcumulado:
+    """
+    Procesa `ruta_csv` por bloques y fusiona las compras nuevas en el estado
+    guardado en `ruta_estado` (si existe). Guarda cada `guardar_cada` bloques
+    y al final; si el proceso se corta, se reanuda desde el último guardado.
+    """
+    if desde not in ('fila', 'fecha'):
+        raise ValueError(f"desde debe ser 'fila' o 'fecha', no {desde!r}")
+    if ruta_estado and os.path.exists(ruta_estado):
+        grafo = GrafoAcumulado.cargar(ruta_estado)
+    else:
+        grafo = GrafoAcumulado()
+
+    inicio = time.perf_counter()
+    saltar = grafo.filas_procesadas if desde == 'fila' else 0
+    fecha_corte = pd.Timestamp(grafo.ultima_fecha) if (desde == 'fecha' and grafo.ultima_fecha) else None
+    # Filas del día de corte que ya están en el grafo (se saltan las primeras, en orden del archivo)
+    por_saltar = grafo.filas_ultima_fecha if fecha_corte is not None else 0
+    lector = pd.read_csv(ruta_csv, usecols=COLUMNAS_LECTURA, chunksize=tamano_bloque,
+                         skiprows=range(1, saltar + 1) if saltar else None)
+    bloques = filas_nuevas = 0
+    for bloque in lector:
+        fechas = pd.to_datetime(bloque['fecha'], errors='coerce')
+        if fecha_corte is not None:
+            nuevas = (fechas > fecha_corte).to_numpy().copy()
+            mismo_dia = np.flatnonzero((fechas == fecha_corte).to_numpy())
+            if por_saltar >= 0:
+                nuevas[mismo_dia[por_saltar:]] = True
+                por_saltar = max(por_saltar - len(mismo_dia), 0)
+            bloque, fechas_nuevas = bloque[nuevas], fechas[nuevas]
+        else:
+            fechas_nuevas = fechas
+        grafo.agregar_bloque(bloque)
+
+        # Checkpoint: filas del archivo recorridas + fecha máxima procesada (y sus filas)
+        grafo.filas_procesadas = (saltar if desde == 'fila' else 0) + bloques * tamano_bloque + len(fechas)
+        if fechas_nuevas.notna().any():
+            maxima = fechas_nuevas.max()
+            if grafo.ultima_fecha is None or maxima > pd.Timestamp(grafo.ultima_fecha):
+                grafo.ultima_fecha = maxima.date().isoformat()
+                grafo.filas_ultima_fecha = 0
+            if grafo.filas_ultima_fecha >= 0:
+                grafo.filas_ultima_fecha += int((fechas_nuevas == pd.Timestamp(grafo.ultima_fecha)).sum())
+        bloques += 1
+        filas_nuevas += len(bloque)
+        if ruta_estado and bloques % guardar_cada == 0:
+            grafo.guardar(ruta_estado)
+
+    if ruta_estado:
+        grafo.guardar(ruta_estado)
+    if estadisticas is not None:
+        segundos = time.perf_counter() - inicio
+        estadisticas.update(bloques=bloques, filas_nuevas=filas_nuevas, segundos=segundos,
+                            filas_por_segundo=filas_nuevas / segundos if segundos > 0 else 0.0,
+                            nodos=len(grafo.nombres), aristas=len(grafo.peso))
+    return grafo
+
+
+def _pesos_por_nombre(grafo: GrafoAcumulado) -> Dict:
+    nodos, aristas = grafo.tablas()
+    nombres = nodos['nombre'].to_numpy(dtype=object)
+    return {frozenset((nombres[u], nombres[v])): int(w)
+            for u, v, w in zip(aristas['origen'], aristas['destino'], aristas['weight'])}
+
+
+def verificar_reanudacion(tamano_bloque: int = 3) -> None:
+    """
+    Export diario regenerado: la primera corrida ve el 26/09 a medias; el
+    siguiente export trae compras tardías del 26/09 (intercaladas) y el 27/09.
+    El grafo reanudado debe ser igual al construido con el export final de una vez.
+    """
+    import tempfile
+
+    def compra(familia, producto, tienda, fecha):
+        return {COL_FAMILIA: familia, COL_PRODUCTO: producto, COL_TIENDA: tienda, 'fecha': fecha}
+
+    dia1 = [compra('Ana', 'Arroz', 'Metro', '2025-09-25'), compra('Luis', 'Leche', 'Wong', '2025-09-25')]
+    dia2 = [compra('Ana', 'Pan', 'Metro', '2025-09-26'), compra('Luis', 'Arroz', 'Metro', '2025-09-26'),
+            compra('Ana', 'Arroz', 'Metro', '2025-09-26'), compra('Rosa', 'Leche', 'Tottus', '2025-09-26')]
+    tardias = [compra('Rosa', 'Pan', 'Wong', '2025-09-26'), compra('Ana', 'Arroz', 'Metro', '2025-09-26')]
+    dia3 = [compra('Luis', 'Pan', 'Tottus', '2025-09-27'), compra('Ana', 'Leche', 'Wong', '2025-09-27')]
+
+    carpeta = tempfile.mkdtemp()
+    ruta_csv, ruta_estado = os.path.join(carpeta, 'compras.csv'), os.path.join(carpeta, 'estado.npz')
+    pd.DataFrame(dia1 + dia2).to_csv(ruta_csv, index=False)
+    ingerir_compras(ruta_csv, ruta_estado, tamano_bloque, desde='fecha')
+
+    # Export siguiente: las tardías del 26/09 quedan entre filas del 27/09
+    final = pd.DataFrame(dia1 + dia2 + dia3[:1] + tardias + dia3[1:])
+    final.to_csv(ruta_csv, index=False)
+    estadisticas = {}
+    reanudado = ingerir_compras(ruta_csv, ruta_estado, tamano_bloque, desde='fecha', estadisticas=estadisticas)
+    assert estadisticas['filas_nuevas'] == len(tardias) + len(dia3), estadisticas
+    assert (reanudado.ultima_fecha, reanudado.filas_ultima_fecha) == ('2025-09-27', len(dia3))
+    assert _pesos_por_nombre(reanudado) == _pesos_por_nombre(ingerir_compras(ruta_csv, None, tamano_bloque))
+
+    # Mismo export otra vez: nada nuevo
+    estadisticas = {}
+    ingerir_compras(ruta_csv, ruta_estado, tamano_bloque, desde='fecha', estadisticas=estadisticas)
+    assert estadisticas['filas_nuevas'] == 0, estadisticas
+    print(f"✅ Reanudación por fecha: {len(tardias)} compras tardías del mismo día ingeridas una sola vez "
+          f"(grafo igual al construido de una vez).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta por bloques del historial de compras al grafo tripartito.")
+    parser.add_argument('--csv', default=os.path.join('data', 'dataset_compras_completo.csv'))
+    parser.add_argument('--estado', default=RUTA_ESTADO, help='Archivo .npz con el grafo + checkpoint')
+    parser.add_argument('--bloque', type=int, default=100_000, help='Filas por bloque')
+    parser.add_argument('--desde', default='fila', choices=['fila', 'fecha'],
+                        help="fila: historial que solo crece; fecha: archivo regenerado completo")
+    parser.add_argument('--guardar-cada', type=int, default=10, help='Guardar el estado cada N bloques')
+    parser.add_argument('--verificar', action='store_true', help='Prueba de reanudación con compras tardías')
+    args = parser.parse_args()
+
+    if args.verificar:
+        verificar_reanudacion()
+        return
+
+    estadisticas = {}
+    grafo = ingerir_compras(args.csv, args.estado, args.bloque, args.desde, args.guardar_cada, estadisticas)
+    print(f"✅ {estadisticas['filas_nuevas']:,} compras nuevas en {estadisticas['bloques']} bloques "
+          f"({estadisticas['filas_por_segundo']:,.0f} filas/s).")
+    print(f"   Grafo: {estadisticas['nodos']:,} nodos / {estadisticas['aristas']:,} aristas | "
+          f"checkpoint: fila {grafo.filas_procesadas:,}, fecha {grafo.ultima_fecha}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, Optional
+
+# =============================================================================
+# INSTRUMENTACIÓN DEL PIPELINE (Tramos de tiempo + contadores)
+# =============================================================================
+# OBJETIVO:
+#   Saber en qué se fue el tiempo de una optimización lenta: lectura de
+#   ofertas, ponderación por distancia, el solver o la recomendación.
+#
+# CÓMO FUNCIONA:
+#   - `with tramo('ofertas.lectura'):` mide la duración de un bloque.
+#   - `contar('ofertas.filas', n)` acumula contadores (filas, nodos, podas...).
+#   - Deshabilitada (por defecto) y sin desglose activo, `tramo` devuelve un
+#     contexto vacío compartido y `contar` retorna de inmediato: costo casi nulo.
+#   - Habilitada, acumula totales globales exportables como texto Prometheus
+#     y, si se indica un archivo, escribe cada tramo como una línea JSON.
+#   - `with desglose() as d:` junta los tramos y contadores SOLO de la llamada
+#     actual (contextvars: cada hilo/petición tiene el suyo), aunque la
+#     instrumentación global esté deshabilitada.
+#
+# USO:
+#   from instrumentacion import INSTRUMENTACION
+#   INSTRUMENTACION.habilitar(ruta_jsonl='output/tramos.jsonl')
+#   ... optimizaciones ...
+#   print(INSTRUMENTACION.exportar_prometheus())
+# =============================================================================
+
+_NULO = nullcontext()
+_DESGLOSE_ACTUAL: contextvars.ContextVar = contextvars.ContextVar('desglose_actual', default=None)
+
+
+class Desglose:
+    """ Tiempos (ms) y contadores de una sola optimización. """
+
+    def __init__(self):
+        self.tramos_ms: Dict[str, float] = {}
+        self.contadores: Dict[str, float] = {}
+        self.total_ms = 0.0
+
+    def como_dict(self) -> Dict:
+        return {'total_ms': self.total_ms, 'tramos_ms': dict(self.tramos_ms), 'contadores': dict(self.contadores)}
+
+
+class _Tramo:
+    __slots__ = ('instrumentacion', 'nombre', 'desglose', 'inicio')
+
+    def __init__(self, instrumentacion, nombre, desglose):
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+        self.desglose = desglose
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        if self.desglose is not None:
+            self.desglose.tramos_ms[self.nombre] = self.desglose.tramos_ms.get(self.nombre, 0.0) + segundos * 1000
+        if self.instrumentacion.habilitada:
+            self.instrumentacion._registrar_tramo(self.nombre, segundos)
+        return False
+
+
+class Instrumentacion:
+    """ Registro de tramos y contadores, seguro entre hilos. """
+
+    def __init__(self):
+        self.habilitada = False
+        self._candado = threading.Lock()
+        self._tramos: Dict[str, list] = {}       # nombre -> [llamadas, segundos, máximo]
+        self._contadores: Dict[str, float] = {}
+        self._archivo_jsonl = None
+
+    # --- Configuración ---
+    def habilitar(self, ruta_jsonl: Optional[str] = None) -> None:
+        with self._candado:
+            if ruta_jsonl and self._archivo_jsonl is None:
+                carpeta = os.path.dirname(ruta_jsonl)
+                if carpeta:
+                    os.makedirs(carpeta, exist_ok=True)
+                self._archivo_jsonl = open(ruta_jsonl, 'a', encoding='utf-8', buffering=1)
+            self.habilitada = True
+
+    def deshabilitar(self) -> None:
+        with self._candado:
+            self.habilitada = False
+            if self._archivo_jsonl is not None:
+                self._archivo_jsonl.close()
+                self._archivo_jsonl = None
+
+    def reiniciar(self) -> None:
+        with self._candado:
+            self._tramos.clear()
+            self._contadores.clear()
+
+    # --- Puntos de medición (camino caliente) ---
+    def tramo(self, nombre: str):
+        desglose = _DESGLOSE_ACTUAL.get()
+        if not self.habilitada and desglose is None:
+            return _NULO
+        return _Tramo(self, nombre, desglose)
+
+    def contar(self, nombre: str, cantidad: float = 1) -> None:
+        desglose = _DESGLOSE_ACTUAL.get()
+        if not self.habilitada and desglose is None:
+            return
+        if desglose is not None:
+            desglose.contadores[nombre] = desglose.contadores.get(nombre, 0) + cantidad
+        if self.habilitada:
+            with self._candado:
+                self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def contar_estadisticas(self, prefijo: str, estadisticas: Dict) -> None:
+        """ Suma los contadores numéricos que dejan los solvers en `estadisticas`. """
+        for clave in ('nodos', 'podados', 'celdas'):
+            if clave in estadisticas:
+                self.contar(f'{prefijo}.{clave}', estadisticas[clave])
+
+    @contextmanager
+    def desglose(self) -> Iterator[Desglose]:
+        """ Recolecta los tramos y contadores de lo que se ejecute dentro del bloque. """
+        desglose = Desglose()
+        token = _DESGLOSE_ACTUAL.set(desglose)
+        inicio = time.perf_counter()
+        try:
+            yield desglose
+        finally:
+            desglose.total_ms = (time.perf_counter() - inicio) * 1000
+            _DESGLOSE_ACTUAL.reset(token)
+
+    def _registrar_tramo(self, nombre: str, segundos: float) -> None:
+        with self._candado:
+            acumulado = self._tramos.setdefault(nombre, [0, 0.0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+            acumulado[2] = max(acumulado[2], segundos)
+            if self._archivo_jsonl is not None:
+                self._archivo_jsonl.write(json.dumps({
+                    'ts': time.time(), 'tramo': nombre, 'ms': round(segundos * 1000, 4),
+                    'hilo': threading.current_thread().name,
+                }) + '\n')
+
+    # --- Exportación ---
+    def resumen(self) -> Dict:
+        with self._candado:
+            return {
+                'tramos': {nombre: {'llamadas': c, 'total_ms': s * 1000, 'max_ms': m * 1000}
+                           for nombre, (c, s, m) in self._tramos.items()},
+                'contadores': dict(self._contadores),
+            }
+
+    def exportar_prometheus(self, prefijo: str = 'canasta') -> str:
+        """ Volcado en formato de texto de Prometheus (summary por tramo + counters). """
+        with self._candado:
+            lineas = [f'# TYPE {prefijo}_tramo_segundos summary']
+            for nombre, (llamadas, segundos, _) in sorted(self._tramos.items()):
+                lineas.append(f'{prefijo}_tramo_segundos_count{{tramo="{nombre}"}} {llamadas}')
+                lineas.append(f'{prefijo}_tramo_segundos_sum{{tramo="{nombre}"}} {segundos:.9f}')
+            lineas.append(f'# TYPE {prefijo}_tramo_segundos_max gauge')
+            for nombre, (_, _, maximo) in sorted(self._tramos.items()):
+                lineas.append(f'{prefijo}_tramo_segundos_max{{tramo="{nombre}"}} {maximo:.9f}')
+            lineas.append(f'# TYPE {prefijo}_eventos_total counter')
+            for nombre, valor in sorted(self._contadores.items()):
+                lineas.append(f'{prefijo}_eventos_total{{contador="{nombre}"}} {valor:g}')
+        return '\n'.join(lineas) + '\n'
+
+
+# Instancia global usada por el pipeline
+INSTRUMENTACION = Instrumentacion()
+tramo = INSTRUMENTACION.tramo
+contar = INSTRUMENTACION.contar
+desglose = INSTRUMENTACION.desglose
+
+
+if __name__ == "__main__":
+    # Costo de un tramo vacío: deshabilitada vs habilitada
+    repeticiones = 200_000
+    for estado in ('deshabilitada', 'habilitada'):
+        if estado == 'habilitada':
+            INSTRUMENTACION.habilitar()
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            with tramo('vacio'):
+                pass
+            contar('vacio.eventos')
+        ns = (time.perf_counter() - inicio) / repeticiones * 1e9
+        print(f"⏱️ tramo + contador ({estado}): {ns:.0f} ns por llamada")
+    print(INSTRUMENTACION.exportar_prometheus())
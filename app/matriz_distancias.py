@@ -0,0 +1,132 @@
+import hashlib
+import os
+from typing import Iterable
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# MATRIZ DE DISTANCIAS (Todos contra todos, calculada una sola vez)
+# =============================================================================
+# OBJETIVO:
+#   Evitar correr un Dijkstra por cada fila de ofertas. Como el mapa de Lima
+#   es estático, se calculan de una vez todas las distancias mínimas entre
+#   distritos y luego cada consulta es una simple lectura de la matriz.
+#
+# CÓMO FUNCIONA:
+#   1. Floyd-Warshall sobre el mismo grafo que usa Dijkstra -> matriz NumPy
+#      (n x n) + mapa distrito -> índice.
+#   2. Se guarda en disco (.npz, en output/ de la raíz del proyecto) junto con
+#      una "firma" del grafo; en el primer uso se recarga si la firma
+#      coincide, si no se recalcula.
+#   3. `costos_desde` traduce una columna completa de distritos a índices y
+#      obtiene todos los costos con un solo indexado de NumPy.
+#
+# CENTINELAS (mismos que obtener_costo_traslado con networkx):
+#   - Distrito de ORIGEN que no existe en el mapa (NodeNotFound) -> 500.0
+#   - Sin camino, o destino que no existe en el mapa (NoPath)    -> 1000.0
+# =============================================================================
+
+COSTO_DISTRITO_DESCONOCIDO = 500.0
+COSTO_SIN_CAMINO = 1000.0
+
+# Anclada a la raíz del proyecto (no al directorio desde donde se ejecuta)
+CARPETA_SALIDA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output')
+RUTA_MATRIZ_DEFECTO = os.path.join(CARPETA_SALIDA, 'matriz_distancias.npz')
+
+
+def firma_grafo(grafo: nx.Graph) -> str:
+    """ Huella del grafo (distritos + aristas + pesos) para saber si la matriz guardada sigue vigente. """
+    aristas = sorted(
+        (*sorted((u, v)), repr(sorted(datos.items())))
+        for u, v, datos in grafo.edges(data=True)
+    )
+    return hashlib.sha1(repr((sorted(grafo.nodes), aristas)).encode('utf-8')).hexdigest()
+
+
+class MatrizDistancias:
+    """ Distancias mínimas (km) entre todos los distritos del mapa. """
+
+    def __init__(self, distritos, matriz: np.ndarray, firma: str = ''):
+        self.distritos = list(distritos)
+        self.indice = {distrito: i for i, distrito in enumerate(self.distritos)}
+        self.matriz = matriz
+        self.firma = firma
+
+    @classmethod
+    def desde_grafo(cls, grafo: nx.Graph) -> 'MatrizDistancias':
+        """ Calcula todos los caminos mínimos (Floyd-Warshall) del grafo. """
+        distritos = list(grafo.nodes)
+        matriz = nx.floyd_warshall_numpy(grafo, nodelist=distritos, weight='weight')
+        matriz = np.where(np.isinf(matriz), COSTO_SIN_CAMINO, matriz)
+        return cls(distritos, matriz, firma_grafo(grafo))
+
+    @classmethod
+    def cargar_o_calcular(cls, grafo: nx.Graph, ruta: str = RUTA_MATRIZ_DEFECTO) -> 'MatrizDistancias':
+        """ Recarga la matriz del disco si corresponde al mismo grafo; si no, la recalcula y guarda. """
+        firma = firma_grafo(grafo)
+        if os.path.exists(ruta):
+            try:
+                with np.load(ruta, allow_pickle=False) as datos:
+                    if str(datos['firma']) == firma:
+                        return cls(datos['distritos'].tolist(), datos['matriz'], firma)
+            except (OSError, KeyError, ValueError):
+                pass  # Archivo corrupto o de otra versión: se recalcula
+
+        matriz = cls.desde_grafo(grafo)
+        try:
+            matriz.guardar(ruta)
+        except OSError:
+            pass  # Sin permisos de escritura: se usa solo en memoria
+        return matriz
+
+    def guardar(self, ruta: str = RUTA_MATRIZ_DEFECTO) -> None:
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        np.savez(ruta, distritos=np.array(self.distritos), matriz=self.matriz, firma=np.array(self.firma))
+
+    def costo(self, distrito_origen: str, distrito_destino: str) -> float:
+        """ Costo entre dos distritos (misma semántica que obtener_costo_traslado). """
+        i = self.indice.get(distrito_origen)
+        if i is None:
+            return COSTO_DISTRITO_DESCONOCIDO
+        j = self.indice.get(distrito_destino)
+        if j is None:
+            return COSTO_SIN_CAMINO
+        return float(self.matriz[i, j])
+
+    def costos_desde(self, distrito_origen: str, distritos_destino: Iterable[str]) -> np.ndarray:
+        """ Costos vectorizados desde un origen hacia toda una columna de distritos. """
+        destinos = pd.Series(distritos_destino, dtype=object)
+        i = self.indice.get(distrito_origen)
+        if i is None:
+            return np.full(len(destinos), COSTO_DISTRITO_DESCONOCIDO)
+
+        indices = destinos.map(self.indice)
+        conocidos = indices.notna().to_numpy()
+        costos = np.full(len(destinos), COSTO_SIN_CAMINO)
+        costos[conocidos] = self.matriz[i, indices[conocidos].to_numpy(dtype=np.int64)]
+        return costos
+
+
+# --- PRUEBA DE EJEMPLO ---
+if __name__ == "__main__":
+    from algoritmo_distancia import GRAFO_DISTANCIA
+
+    def dijkstra(origen, destino):
+        try:
+            return float(nx.shortest_path_length(GRAFO_DISTANCIA, source=origen, target=destino, weight='weight'))
+        except nx.NetworkXNoPath:
+            return COSTO_SIN_CAMINO
+        except nx.NodeNotFound:
+            return COSTO_DISTRITO_DESCONOCIDO
+
+    matriz = MatrizDistancias.desde_grafo(GRAFO_DISTANCIA)
+    distritos = list(GRAFO_DISTANCIA.nodes) + ['Ate']
+    for origen in distritos:
+        for destino in distritos:
+            assert matriz.costo(origen, destino) == dijkstra(origen, destino), (origen, destino)
+    print(f"✅ Matriz {matriz.matriz.shape} idéntica a Dijkstra par a par.")
+    print(f"Costos desde Miraflores: {matriz.costos_desde('Miraflores', ['San Borja', 'Comas', 'Ate'])}")
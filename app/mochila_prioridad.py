@@ -0,0 +1,209 @@
+import itertools
+import math
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from motores_canasta import EPSILON, a_centimos
+
+# =============================================================================
+# MOCHILA ACOTADA CON CANTIDADES Y PRIORIDADES
+# =============================================================================
+# OBJETIVO:
+#   Usar las columnas `cantidad` y `prioridad` de las listas de compras:
+#   maximizar el VALOR (peso de prioridad x unidades) dentro del presupuesto,
+#   en lugar de solo contar productos.
+#
+# CÓMO FUNCIONA:
+#   1. Cada producto puede comprarse de 0 hasta `cantidad` unidades.
+#      Costo = traslado (una vez por producto, como hoy) + unidades x precio.
+#   2. Partición binaria: la primera unidad (que lleva el traslado) es una
+#      pieza obligatoria; el resto se parte en piezas de 1, 2, 4, ... unidades
+#      (+ la fracción sobrante, ej: 2.5 kg). Con log2(cantidad) piezas se
+#      puede armar cualquier número de unidades.
+#   3. Programación dinámica sobre el presupuesto en céntimos. Por producto
+#      se guardan las decisiones como bits empaquetados para reconstruir la
+#      canasta al final sin guardar toda la tabla.
+# =============================================================================
+
+PESOS_PRIORIDAD = {'Alta': 3.0, 'Media': 2.0, 'Baja': 1.0}
+PRIORIDAD_DEFECTO = 'Media'
+
+
+def peso_prioridad(prioridad) -> float:
+    """ Alta=3, Media=2, Baja=1 (cualquier otro valor se trata como Media). """
+    return PESOS_PRIORIDAD.get(str(prioridad).strip().capitalize(), PESOS_PRIORIDAD[PRIORIDAD_DEFECTO])
+
+
+def partir_binario(cantidad: float) -> List[float]:
+    """ Piezas 1, 2, 4, ..., resto (+ fracción) que suman `cantidad`. """
+    enteras = int(math.floor(cantidad + EPSILON))
+    piezas = []
+    tamano = 1
+    while enteras > 0:
+        pieza = min(tamano, enteras)
+        piezas.append(float(pieza))
+        enteras -= pieza
+        tamano *= 2
+    fraccion = cantidad - sum(piezas)
+    if fraccion > EPSILON:
+        piezas.append(fraccion)
+    return piezas
+
+
+def _bit(empaquetado: np.ndarray, posicion: int) -> bool:
+    return bool((empaquetado[posicion >> 3] >> (7 - (posicion & 7))) & 1)
+
+
+def resolver_mochila_acotada(precios: np.ndarray, costos_fijos: np.ndarray, cantidades: np.ndarray,
+                             pesos: np.ndarray, presupuesto: float,
+                             estadisticas: Optional[Dict] = None) -> List[float]:
+    """
+    Devuelve las unidades a comprar de cada producto, maximizando
+    sum(peso x unidades) con sum(costo_fijo + precio x unidades) <= presupuesto.
+    """
+    n = len(precios)
+    presupuesto_c = int(np.floor(presupuesto * 100 + EPSILON))
+    if presupuesto_c < 0:
+        return [0.0] * n
+
+    # float32: los valores (peso x unidades) son exactos y se mueve la mitad de memoria
+    tabla = np.zeros(presupuesto_c + 1, dtype=np.float32)
+    decisiones = []
+    piezas_totales = 0
+    for i in range(n):
+        cantidad = float(cantidades[i])
+        tamano_primera = min(1.0, cantidad)
+        costo_primera = int(a_centimos(costos_fijos[i] + tamano_primera * precios[i]))
+        if cantidad <= EPSILON or costo_primera > presupuesto_c:
+            decisiones.append(None)
+            continue
+
+        # Con este producto: la primera unidad (con traslado) es obligatoria
+        con_producto = np.empty(presupuesto_c + 1, dtype=np.float32)
+        con_producto[:costo_primera] = -np.inf
+        np.add(tabla[:presupuesto_c + 1 - costo_primera], pesos[i] * tamano_primera, out=con_producto[costo_primera:])
+
+        piezas = []
+        for tamano in partir_binario(cantidad - tamano_primera):
+            costo = int(a_centimos(tamano * precios[i]))
+            if costo > presupuesto_c:
+                continue
+            # mejora[b - costo] indica si conviene la pieza con presupuesto b
+            candidato = con_producto[:presupuesto_c + 1 - costo] + np.float32(pesos[i] * tamano)
+            mejora = candidato > con_producto[costo:]
+            np.maximum(con_producto[costo:], candidato, out=con_producto[costo:])
+            piezas.append((tamano, costo, np.packbits(mejora)))
+
+        tomado = con_producto > tabla
+        np.maximum(tabla, con_producto, out=tabla)
+        decisiones.append((np.packbits(tomado), tamano_primera, costo_primera, piezas))
+        piezas_totales += 1 + len(piezas)
+
+    if estadisticas is not None:
+        estadisticas['piezas'] = piezas_totales
+        estadisticas['celdas'] = piezas_totales * (presupuesto_c + 1)
+        estadisticas['valor'] = float(tabla[presupuesto_c])
+
+    # Reconstrucción: del último producto al primero
+    unidades = [0.0] * n
+    b = presupuesto_c
+    for i in range(n - 1, -1, -1):
+        if decisiones[i] is None or not _bit(decisiones[i][0], b):
+            continue
+        _, tamano_primera, costo_primera, piezas = decisiones[i]
+        for tamano, costo, mejora in reversed(piezas):
+            if b >= costo and _bit(mejora, b - costo):
+                unidades[i] += tamano
+                b -= costo
+        unidades[i] += tamano_primera
+        b -= costo_primera
+    return unidades
+
+
+def resolver_canasta_prioridad(df_ofertas: pd.DataFrame, presupuesto: float,
+                               cantidades: Optional[Dict[str, float]] = None,
+                               prioridades: Optional[Dict[str, str]] = None,
+                               estadisticas: Optional[Dict] = None) -> List[Dict]:
+    """ Canasta con unidades por producto (misma forma de ítem + 'cantidad'). """
+    if df_ofertas.empty:
+        return []
+    cantidades = cantidades or {}
+    prioridades = prioridades or {}
+
+    productos = df_ofertas['producto'].to_numpy()
+    precios = df_ofertas['precio_producto'].to_numpy(dtype=float)
+    traslados = df_ofertas['costo_traslado'].to_numpy(dtype=float)
+    tiendas = df_ofertas['nombre_tienda'].to_numpy()
+    q = np.array([float(cantidades.get(p, 1)) for p in productos])
+    pesos = np.array([peso_prioridad(prioridades.get(p, PRIORIDAD_DEFECTO)) for p in productos])
+
+    unidades = resolver_mochila_acotada(precios, traslados, q, pesos, presupuesto, estadisticas)
+    return [
+        {
+            'producto': productos[i],
+            'precio_producto': float(precios[i]),
+            'tienda': tiendas[i],
+            'costo_traslado': float(traslados[i]),
+            'cantidad': unidades[i],
+            'prioridad': prioridades.get(productos[i], PRIORIDAD_DEFECTO),
+        }
+        for i in range(len(productos)) if unidades[i] > 0
+    ]
+
+
+# --- PRUEBA CONTRA FUERZA BRUTA Y TIEMPOS ---
+def _valor_fuerza_bruta(precios, costos_fijos, cantidades, pesos, presupuesto) -> float:
+    """ Enumera todas las unidades posibles (solo para listas muy pequeñas). """
+    opciones = []
+    for q in cantidades:
+        # La primera unidad siempre es completa; la fracción se suma encima
+        enteras = [float(k) for k in range(1, int(math.floor(q)) + 1)] or [float(q)]
+        fraccion = q - math.floor(q)
+        if fraccion > EPSILON and q >= 1:
+            enteras += [k + fraccion for k in enteras]
+        opciones.append([0.0] + sorted(set(enteras)))
+    mejor = 0.0
+    for combinacion in itertools.product(*opciones):
+        costo = sum(int(a_centimos(f + u * p)) if u > 0 else 0
+                    for u, p, f in zip(combinacion, precios, costos_fijos))
+        if costo <= int(np.floor(presupuesto * 100 + EPSILON)):
+            mejor = max(mejor, sum(u * w for u, w in zip(combinacion, pesos)))
+    return mejor
+
+
+if __name__ == "__main__":
+    print("🔎 Verificando contra fuerza bruta (listas pequeñas, precios enteros)...")
+    for semilla in range(150):
+        rng = random.Random(semilla)
+        n = rng.randint(1, 4)
+        precios = np.array([float(rng.randint(1, 15)) for _ in range(n)])
+        fijos = np.array([float(rng.randint(0, 6)) for _ in range(n)])
+        cantidades = np.array([rng.choice([1, 2, 3, 4, 2.5]) for _ in range(n)])
+        pesos = np.array([rng.choice([1.0, 2.0, 3.0]) for _ in range(n)])
+        presupuesto = float(rng.randint(0, 60))
+
+        estadisticas = {}
+        unidades = resolver_mochila_acotada(precios, fijos, cantidades, pesos, presupuesto, estadisticas)
+        gasto = sum(f + u * p for u, p, f in zip(unidades, precios, fijos) if u > 0)
+        valor = sum(u * w for u, w in zip(unidades, pesos))
+        assert gasto <= presupuesto + EPSILON, semilla
+        assert abs(valor - estadisticas['valor']) < 1e-6, semilla
+        assert abs(valor - _valor_fuerza_bruta(precios, fijos, cantidades, pesos, presupuesto)) < 1e-6, semilla
+    print("✅ 150 casos con el valor óptimo.")
+
+    rng = random.Random(2000)
+    n = 200
+    precios = np.array([round(rng.uniform(1, 40), 2) for _ in range(n)])
+    fijos = np.array([float(rng.randint(0, 25)) for _ in range(n)])
+    cantidades = np.array([float(rng.randint(1, 20)) for _ in range(n)])
+    pesos = np.array([rng.choice([1.0, 2.0, 3.0]) for _ in range(n)])
+
+    inicio = time.perf_counter()
+    unidades = resolver_mochila_acotada(precios, fijos, cantidades, pesos, 2000.0)
+    transcurrido = time.perf_counter() - inicio
+    print(f"⏱️ 200 productos, cantidades hasta 20, S/ 2000: {transcurrido * 1000:.0f} ms "
+          f"({sum(u > 0 for u in unidades)} productos, {sum(unidades):.0f} unidades)")
@@ -0,0 +1,408 @@
+import bisect
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# MOTORES DE OPTIMIZACIÓN DE LA CANASTA (Solvers intercambiables)
+# =============================================================================
+# OBJETIVO:
+#   Reemplazar la fuerza bruta 2^n de `backtracking_compras` por motores que
+#   escalen, devolviendo EXACTAMENTE la misma canasta que el backtracking.
+#
+# CÓMO FUNCIONA:
+#   El backtracking original explora primero la rama "incluir" y solo acepta
+#   una canasta si tiene MÁS ítems que la mejor anterior. Por eso, entre todas
+#   las canastas de cantidad máxima, se queda con la primera en ese orden
+#   (la lexicográficamente mayor según el índice de la oferta).
+#
+#   1. "exact-bnb": Branch & Bound. Mismo orden de exploración, pero con una
+#      cota superior: cuántos ítems del resto aún caben comprando los más
+#      baratos (precios ponderados ordenados). Si ni así se supera al mejor,
+#      se poda la rama.
+#   2. "dp": Programación dinámica sobre el presupuesto discretizado en
+#      céntimos. La tabla guarda la máxima cantidad de ítems para cada monto.
+#   3. "greedy": Toma los más baratos primero. Garantiza la cantidad máxima,
+#      pero no necesariamente la misma canasta en caso de empate.
+#
+#   Modo "anytime" (resolver_anytime): con un límite de tiempo o de nodos
+#   se entrega primero la canasta greedy (ya con la cantidad máxima) y luego
+#   el Branch & Bound busca la canasta exacta del backtracking; si el límite
+#   se agota, queda la mejor encontrada hasta ese momento.
+# =============================================================================
+
+# Tolerancia para comparar sumas de precios en punto flotante
+EPSILON = 1e-9
+
+
+def _indices_fuerza_bruta(precios: np.ndarray, presupuesto: float) -> List[int]:
+    """ Réplica sin globales de `backtracking_compras` (referencia para equivalencia). """
+    n = len(precios)
+    mejor = {'cantidad': 0, 'indices': []}
+
+    def explorar(indice, restante, seleccion):
+        if indice >= n:
+            if len(seleccion) > mejor['cantidad']:
+                mejor['cantidad'] = len(seleccion)
+                mejor['indices'] = seleccion.copy()
+            return
+        if precios[indice] <= restante:
+            explorar(indice + 1, restante - precios[indice], seleccion + [indice])
+        explorar(indice + 1, restante, seleccion)
+
+    explorar(0, presupuesto, [])
+    return mejor['indices']
+
+
+def _cotas_por_sufijo(precios: np.ndarray) -> List[np.ndarray]:
+    """ Para cada índice i: sumas acumuladas de precios[i:] ordenados de menor a mayor. """
+    n = len(precios)
+    cotas = [np.zeros(1)] * (n + 1)
+    ordenados = []
+    for i in range(n - 1, -1, -1):
+        bisect.insort(ordenados, float(precios[i]))
+        cotas[i] = np.cumsum(ordenados)
+    cotas[n] = np.zeros(0)
+    return cotas
+
+
+class LimiteBusqueda:
+    """ Límite de tiempo (segundos) y/o de nodos para las búsquedas exponenciales. """
+
+    def __init__(self, segundos: Optional[float] = None, nodos: Optional[int] = None):
+        self.segundos = segundos
+        self.nodos = nodos
+        self.fin = time.perf_counter() + segundos if segundos is not None else None
+
+    def agotado(self, nodos: int) -> bool:
+        if self.nodos is not None and nodos >= self.nodos:
+            return True
+        # El reloj se consulta cada 256 nodos
+        return self.fin is not None and (nodos & 255) == 0 and time.perf_counter() >= self.fin
+
+
+def _camino_a_indices(camino) -> List[int]:
+    indices = []
+    while camino is not None:
+        indices.append(camino[0])
+        camino = camino[1]
+    return indices[::-1]
+
+
+def resolver_branch_and_bound(precios: np.ndarray, presupuesto: float,
+                              estadisticas: Optional[Dict] = None,
+                              limite: Optional[LimiteBusqueda] = None,
+                              piso: int = 0,
+                              al_mejorar: Optional[Callable[[List[int], int], None]] = None) -> List[int]:
+    """
+    Branch & Bound con cota de "los más baratos que aún caben" (exacto).
+    piso: cantidad ya conseguida por otra vía; solo se buscan canastas con
+          al menos esa cantidad (si no hay, devuelve []).
+    limite: corta la búsqueda; estadisticas['completo'] indica si terminó.
+    """
+    n = len(precios)
+    cotas = _cotas_por_sufijo(precios)
+
+    mejor_cantidad = piso - 1 if piso > 0 else 0
+    mejor_camino = None
+    nodos = 0
+    podados = 0
+    completo = True
+
+    # Pila explícita (evita el límite de recursión con listas grandes).
+    # Cada entrada: (indice, presupuesto_restante, cantidad, camino enlazado)
+    pila = [(0, float(presupuesto), 0, None)]
+    while pila:
+        indice, restante, cantidad, camino = pila.pop()
+        nodos += 1
+        if limite is not None and limite.agotado(nodos):
+            completo = False
+            break
+
+        # Cota: máximo de ítems que aún caben entre los restantes
+        cota = int(np.searchsorted(cotas[indice], restante + EPSILON, side='right'))
+        if cantidad + cota <= mejor_cantidad:
+            podados += 1
+            continue
+
+        if indice >= n:
+            mejor_cantidad = cantidad
+            mejor_camino = camino
+            if al_mejorar is not None:
+                al_mejorar(_camino_a_indices(camino), cantidad)
+            continue
+
+        # Se apila primero "excluir" para que "incluir" se explore antes
+        pila.append((indice + 1, restante, cantidad, camino))
+        if precios[indice] <= restante:
+            pila.append((indice + 1, restante - precios[indice], cantidad + 1, (indice, camino)))
+
+    if estadisticas is not None:
+        estadisticas['nodos'] = nodos
+        estadisticas['podados'] = podados
+        estadisticas['completo'] = completo
+
+    return _camino_a_indices(mejor_camino)
+
+
+def a_centimos(montos) -> np.ndarray:
+    """ Convierte montos en soles a céntimos enteros. """
+    return np.round(np.asarray(montos, dtype=float) * 100).astype(np.int64)
+
+
+def tabla_dp_cantidad(precios_centimos: np.ndarray, presupuesto_centimos: int) -> np.ndarray:
+    """
+    tabla[i][b] = máxima cantidad de ítems comprables con los ítems i..n-1
+    y un presupuesto de b céntimos.
+    """
+    n = len(precios_centimos)
+    tabla = np.zeros((n + 1, presupuesto_centimos + 1), dtype=np.int16)
+    for i in range(n - 1, -1, -1):
+        siguiente = tabla[i + 1]
+        fila = siguiente.copy()
+        p = int(precios_centimos[i])
+        if p <= presupuesto_centimos:
+            np.maximum(fila[p:], siguiente[:presupuesto_centimos + 1 - p] + 1, out=fila[p:])
+        tabla[i] = fila
+    return tabla
+
+
+def reconstruir_dp(tabla: np.ndarray, precios_centimos: np.ndarray, presupuesto_centimos: int) -> List[int]:
+    """ Recorre la tabla prefiriendo "incluir" (mismo desempate que el backtracking). """
+    indices = []
+    b = presupuesto_centimos
+    for i in range(len(precios_centimos)):
+        p = int(precios_centimos[i])
+        if p <= b and tabla[i + 1][b - p] + 1 == tabla[i][b]:
+            indices.append(i)
+            b -= p
+    return indices
+
+
+def resolver_dp(precios: np.ndarray, presupuesto: float,
+                estadisticas: Optional[Dict] = None) -> List[int]:
+    """ Programación dinámica con el presupuesto discretizado en céntimos. """
+    precios_c = a_centimos(precios)
+    presupuesto_c = int(np.floor(presupuesto * 100 + EPSILON))
+    if presupuesto_c < 0:
+        return []
+
+    tabla = tabla_dp_cantidad(precios_c, presupuesto_c)
+    if estadisticas is not None:
+        estadisticas['celdas'] = int(tabla.size)
+    return reconstruir_dp(tabla, precios_c, presupuesto_c)
+
+
+def resolver_greedy(precios: np.ndarray, presupuesto: float,
+                    estadisticas: Optional[Dict] = None) -> List[int]:
+    """ Más baratos primero: cantidad máxima, desempate no garantizado. """
+    indices = []
+    restante = float(presupuesto)
+    for i in np.argsort(precios, kind='stable'):
+        if precios[i] > restante:
+            break
+        restante -= precios[i]
+        indices.append(int(i))
+    if estadisticas is not None:
+        estadisticas['nodos'] = len(indices)
+    return sorted(indices)
+
+
+def resolver_anytime(precios: np.ndarray, presupuesto: float, estadisticas: Optional[Dict] = None,
+                     limite: Optional[LimiteBusqueda] = None,
+                     al_mejorar: Optional[Callable[[List[int], Dict], None]] = None) -> List[int]:
+    """
+    Siempre devuelve una canasta, aunque se agote el límite:
+      1. Greedy (orden por precio ponderado): ya logra la cantidad máxima,
+         que además es la cota superior -> para este objetivo la brecha es 0.
+      2. Branch & Bound en el orden original, con esa cantidad como piso,
+         para llegar a la MISMA canasta que el backtracking (desempate).
+    estadisticas: 'completo' (False si el límite cortó el paso 2),
+                  'cota_superior', 'brecha', 'nodos', 'podados'.
+    """
+    greedy = resolver_greedy(precios, presupuesto)
+    cota = len(greedy)
+    if al_mejorar is not None:
+        al_mejorar(greedy, {'cantidad': cota, 'cota_superior': cota, 'brecha': 0, 'definitiva': False})
+
+    bnb = {}
+    exacta = resolver_branch_and_bound(
+        precios, presupuesto, bnb, limite, piso=cota,
+        al_mejorar=None if al_mejorar is None else
+        lambda indices, cantidad: al_mejorar(indices, {'cantidad': cantidad, 'cota_superior': max(cota, cantidad),
+                                                       'brecha': 0, 'definitiva': False}))
+    # Sin canasta exacta (límite agotado antes de la primera hoja) queda la greedy
+    indices = exacta if exacta else greedy
+
+    if estadisticas is not None:
+        estadisticas.update(bnb)
+        estadisticas['cota_superior'] = max(cota, len(indices))
+        estadisticas['brecha'] = estadisticas['cota_superior'] - len(indices)
+    return indices
+
+
+def frontera_dp(precios: np.ndarray, presupuesto_max: float) -> Tuple[np.ndarray, List[List[int]]]:
+    """
+    Canasta óptima para TODOS los presupuestos de 0 a presupuesto_max con una
+    sola tabla DP. Devuelve los montos (céntimos) donde la canasta cambia y la
+    canasta (índices) vigente desde cada uno de esos montos.
+    """
+    precios_c = a_centimos(precios)
+    presupuesto_c = int(np.floor(presupuesto_max * 100 + EPSILON))
+    if presupuesto_c < 0:
+        return np.zeros(0, dtype=np.int64), []
+    tabla = tabla_dp_cantidad(precios_c, presupuesto_c)
+
+    def reconstruir_todos():
+        """ reconstruir_dp aplicado a todos los presupuestos a la vez (vectorizado). """
+        b = np.arange(presupuesto_c + 1)
+        for i, p in enumerate(precios_c):
+            toma = (b >= p) & (tabla[i + 1][np.maximum(b - p, 0)] + 1 == tabla[i][b])
+            b = b - p * toma
+            yield i, toma
+
+    # 1ra pasada: dónde cambia la canasta (sin guardar la matriz completa)
+    cambios = np.zeros(presupuesto_c + 1, dtype=bool)
+    cambios[0] = True
+    for _, toma in reconstruir_todos():
+        cambios[1:] |= toma[1:] != toma[:-1]
+    cortes = np.nonzero(cambios)[0]
+
+    # 2da pasada: canasta en cada corte
+    canastas: List[List[int]] = [[] for _ in cortes]
+    for i, toma in reconstruir_todos():
+        for k in np.nonzero(toma[cortes])[0]:
+            canastas[k].append(i)
+    return cortes, canastas
+
+
+# --- REGISTRO DE MOTORES ---
+SOLVERS: Dict[str, Callable] = {
+    'exact-bnb': resolver_branch_and_bound,
+    'dp': resolver_dp,
+    'greedy': resolver_greedy,
+}
+
+
+def armar_canasta(df_ofertas: pd.DataFrame, indices: List[int]) -> List[Dict]:
+    """ Convierte índices de ofertas en ítems con el mismo formato que el backtracking. """
+    # Se leen las columnas una sola vez (iloc fila por fila es muy lento)
+    productos = df_ofertas['producto'].to_numpy()
+    precios = df_ofertas['precio_producto'].to_numpy(dtype=float)
+    tiendas = df_ofertas['nombre_tienda'].to_numpy()
+    traslados = df_ofertas['costo_traslado'].to_numpy(dtype=float)
+    return [
+        {
+            'producto': productos[i],
+            'precio_producto': float(precios[i]),
+            'tienda': tiendas[i],
+            'costo_traslado': float(traslados[i]),
+        }
+        for i in indices
+    ]
+
+
+class FronteraPresupuesto:
+    """ Función escalonada presupuesto -> canasta óptima (consultas O(log n)). """
+
+    def __init__(self, cortes_centimos: np.ndarray, canastas: List[List[Dict]], presupuesto_max: float):
+        self.cortes_centimos = cortes_centimos
+        self.canastas = canastas
+        self.presupuesto_max = presupuesto_max
+
+    def __len__(self):
+        return len(self.canastas)
+
+    @property
+    def montos(self) -> np.ndarray:
+        """ Presupuestos (S/) desde los que cambia la canasta. """
+        return self.cortes_centimos / 100
+
+    def consultar(self, presupuesto: float) -> List[Dict]:
+        """ Canasta óptima para `presupuesto` (búsqueda binaria en los cortes). """
+        if presupuesto > self.presupuesto_max + EPSILON:
+            raise ValueError(f"Presupuesto S/ {presupuesto:.2f} fuera de la frontera (máx. S/ {self.presupuesto_max:.2f})")
+        k = int(np.searchsorted(self.cortes_centimos, int(np.floor(presupuesto * 100 + EPSILON)), side='right')) - 1
+        return self.canastas[k] if k >= 0 else []
+
+
+def frontera_canasta(df_ofertas: pd.DataFrame, presupuesto_max: float) -> FronteraPresupuesto:
+    """ Frontera completa de presupuestos para unas ofertas ya ponderadas. """
+    if df_ofertas.empty:
+        return FronteraPresupuesto(np.zeros(1, dtype=np.int64), [[]], presupuesto_max)
+    precios = df_ofertas['precio_total_ponderado'].to_numpy(dtype=float)
+    cortes, indices = frontera_dp(precios, presupuesto_max)
+    return FronteraPresupuesto(cortes, [armar_canasta(df_ofertas, i) for i in indices], presupuesto_max)
+
+
+def resolver_canasta(df_ofertas: pd.DataFrame, presupuesto: float, solver: str = 'exact-bnb',
+                     estadisticas: Optional[Dict] = None) -> List[Dict]:
+    """ Punto de entrada: elige el motor y devuelve la canasta óptima. """
+    if solver not in SOLVERS:
+        raise ValueError(f"Solver desconocido: '{solver}'. Opciones: {', '.join(SOLVERS)}")
+    if df_ofertas.empty:
+        return []
+
+    precios = df_ofertas['precio_total_ponderado'].to_numpy(dtype=float)
+    indices = SOLVERS[solver](precios, presupuesto, estadisticas)
+    return armar_canasta(df_ofertas, indices)
+
+
+# --- PRUEBA DE EQUIVALENCIA Y TIEMPOS ---
+def _precios_sinteticos(n: int, semilla: int) -> np.ndarray:
+    """ Precio del producto (S/ 1.00 - 30.00) + km de traslado (0 - 25). """
+    rng = random.Random(semilla)
+    return np.array([round(rng.uniform(1, 30), 2) + rng.randint(0, 25) for _ in range(n)])
+
+
+if __name__ == "__main__":
+    # 1. Equivalencia contra la recursión original en listas pequeñas
+    print("🔎 Verificando equivalencia contra el backtracking original...")
+    casos = 0
+    for semilla in range(300):
+        rng = random.Random(semilla)
+        n = rng.randint(0, 12)
+        precios = _precios_sinteticos(n, semilla)
+        presupuesto = round(rng.uniform(0, float(precios.sum()) + 10), 2)
+
+        esperado = _indices_fuerza_bruta(precios, presupuesto)
+        assert resolver_branch_and_bound(precios, presupuesto) == esperado, (semilla, 'exact-bnb')
+        assert resolver_dp(precios, presupuesto) == esperado, (semilla, 'dp')
+        assert len(resolver_greedy(precios, presupuesto)) == len(esperado), (semilla, 'greedy')
+        assert resolver_anytime(precios, presupuesto) == esperado, (semilla, 'anytime')
+        cortado = {}
+        parcial = resolver_anytime(precios, presupuesto, cortado, LimiteBusqueda(nodos=2))
+        assert len(parcial) == len(esperado) and cortado['brecha'] == 0, (semilla, 'anytime cortado')
+        casos += 1
+    print(f"✅ {casos} casos idénticos (exact-bnb, dp y anytime) / misma cantidad (greedy, anytime cortado).")
+
+    # 2. Frontera de presupuestos: cada tramo coincide con resolver_dp
+    for semilla in range(40):
+        rng = random.Random(semilla)
+        precios = _precios_sinteticos(rng.randint(1, 15), semilla)
+        presupuesto_max = round(float(precios.sum()) + 5, 2)
+        cortes, canastas = frontera_dp(precios, presupuesto_max)
+        for _ in range(25):
+            monto_c = rng.randint(0, int(presupuesto_max * 100))
+            k = bisect.bisect_right(cortes, monto_c) - 1
+            assert canastas[k] == resolver_dp(precios, monto_c / 100), (semilla, monto_c)
+    print("✅ Frontera de presupuestos idéntica a resolver cada monto por separado.")
+
+    # 3. Tiempos por tamaño de lista
+    print(f"\n{'n':>5} {'backtracking':>14} {'exact-bnb':>12} {'dp':>12} {'greedy':>12}")
+    for n in (10, 20, 40, 200):
+        precios = _precios_sinteticos(n, n)
+        presupuesto = round(float(precios.sum()) * 0.4, 2)
+        tiempos = {}
+        motores = dict(SOLVERS)
+        if n <= 20:
+            motores['backtracking'] = _indices_fuerza_bruta
+        for nombre, motor in motores.items():
+            inicio = time.perf_counter()
+            motor(precios, presupuesto)
+            tiempos[nombre] = f"{(time.perf_counter() - inicio) * 1000:.2f} ms"
+        print(f"{n:>5} {tiempos.get('backtracking', 'inviable'):>14} {tiempos['exact-bnb']:>12} "
+              f"{tiempos['dp']:>12} {tiempos['greedy']:>12}")
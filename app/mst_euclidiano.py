@@ -0,0 +1,193 @@
+import math
+import time
+from itertools import combinations
+from typing import Iterable, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.spatial import Delaunay, QhullError, cKDTree
+from scipy.spatial.distance import pdist, squareform
+
+# =============================================================================
+# MST EUCLIDIANO VECTORIZADO (Delaunay / k vecinos + SciPy)
+# =============================================================================
+# OBJETIVO:
+#   Calcular el árbol de expansión mínima de miles de tiendas sin armar el
+#   grafo completo (n^2 aristas) de networkx.
+#
+# CÓMO FUNCIONA:
+#   1. Los puntos repetidos se unen a su primer representante con peso 0.
+#   2. Aristas candidatas que contienen al MST euclidiano:
+#      - Los puntos se proyectan a su subespacio afín (SVD): colineales -> 1D,
+#        coplanares en 3D -> 2D. Las distancias no cambian.
+#      - 1D: los vecinos consecutivos al ordenar.
+#      - 2D/3D: las aristas de los símplices de Delaunay.
+#      - Más dimensiones, o si Qhull falla: todas las distancias (pdist),
+#        hasta MAX_PUNTOS_DENSO puntos; con más, error.
+#      metodo='knn' (k vecinos con cKDTree, duplicando k hasta conectar) es
+#      APROXIMADO: un grafo kNN conectado no siempre contiene el MST.
+#   3. `minimum_spanning_tree` de SciPy sobre la matriz dispersa de candidatos.
+#   Resultado (salvo 'knn'): mismo peso total que Kruskal sobre el grafo completo.
+# =============================================================================
+
+K_VECINOS_INICIAL = 8
+MAX_DIMENSION_DELAUNAY = 3     # Delaunay crece exponencialmente con la dimensión
+MAX_PUNTOS_DENSO = 5_000       # pdist: m(m-1)/2 distancias (~100 MB con 5,000)
+
+
+def posiciones_simuladas(ids_tienda: Iterable[int]) -> np.ndarray:
+    """ Coordenadas (x, y) ficticias basadas en el ID (siempre salen igual). """
+    ids = np.asarray(list(ids_tienda), dtype=np.int64)
+    return np.column_stack([(ids * 37) % 100, (ids * 73) % 100]).astype(float)
+
+
+def _subespacio_afin(puntos: np.ndarray) -> np.ndarray:
+    """ Coordenadas de los puntos en su subespacio afín (misma distancia entre pares). """
+    centrados = puntos - puntos.mean(axis=0)
+    _, valores, ejes = np.linalg.svd(centrados, full_matrices=False)
+    rango = int((valores > valores[0] * max(puntos.shape) * np.finfo(float).eps).sum()) if valores[0] > 0 else 0
+    return centrados @ ejes[:max(rango, 1)].T
+
+
+def _candidatas_delaunay(puntos: np.ndarray) -> np.ndarray:
+    simplices = Delaunay(puntos).simplices
+    return np.concatenate([simplices[:, [a, b]] for a, b in combinations(range(simplices.shape[1]), 2)])
+
+
+def _candidatas_recta(puntos: np.ndarray) -> np.ndarray:
+    orden = np.argsort(puntos[:, 0], kind='stable')
+    return np.column_stack([orden[:-1], orden[1:]])
+
+
+def _candidatas_vecinos(puntos: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(puntos) - 1)
+    _, vecinos = cKDTree(puntos).query(puntos, k=k + 1)
+    origenes = np.repeat(np.arange(len(puntos)), k)
+    return np.column_stack([origenes, vecinos[:, 1:].ravel()])
+
+
+def _matriz_candidatas(puntos: np.ndarray, aristas: np.ndarray) -> coo_matrix:
+    aristas = np.sort(aristas, axis=1)
+    aristas = np.unique(aristas, axis=0)
+    pesos = np.sqrt(((puntos[aristas[:, 0]] - puntos[aristas[:, 1]]) ** 2).sum(axis=1))
+    n = len(puntos)
+    return coo_matrix((pesos, (aristas[:, 0], aristas[:, 1])), shape=(n, n))
+
+
+def _candidatas_exactas(puntos: np.ndarray, metodo: str) -> np.ndarray:
+    """ Aristas que contienen al MST euclidiano ('auto', 'delaunay' o 'denso'). """
+    m = len(puntos)
+    if metodo != 'denso':
+        proyectados = _subespacio_afin(puntos)
+        if proyectados.shape[1] == 1:
+            return _candidatas_recta(proyectados)
+        if proyectados.shape[1] <= MAX_DIMENSION_DELAUNAY or metodo == 'delaunay':
+            try:
+                return _candidatas_delaunay(proyectados)
+            except QhullError:
+                if metodo == 'delaunay':
+                    raise
+    if m > MAX_PUNTOS_DENSO:
+        raise ValueError(f"{m:,} puntos en {puntos.shape[1]} dimensiones: sin Delaunay el MST exacto necesita "
+                         f"todas las distancias (máx. {MAX_PUNTOS_DENSO:,} puntos); use metodo='knn' (aproximado)")
+    filas, columnas = np.triu_indices(m, k=1)
+    return np.column_stack([filas, columnas])
+
+
+def mst_euclidiano(coordenadas: np.ndarray, metodo: str = 'auto',
+                   k: int = K_VECINOS_INICIAL) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    coordenadas: array (n x d) de posiciones.
+    metodo: 'auto' (exacto: Delaunay en el subespacio de los puntos, o todas
+            las distancias), 'delaunay', 'denso' o 'knn' (aproximado, ver cabecera).
+    Devuelve (aristas (n-1 x 2) con índices de `coordenadas`, pesos).
+    """
+    if metodo not in ('auto', 'delaunay', 'denso', 'knn'):
+        raise ValueError(f"Método desconocido: {metodo}")
+    puntos = np.asarray(coordenadas, dtype=float)
+    if puntos.ndim != 2:
+        raise ValueError("Las coordenadas deben ser un array (n x d)")
+    n = len(puntos)
+    if n < 2:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+
+    # 1. Repetidos: cada punto se une con peso 0 a la primera aparición
+    unicos, primera, inversa = np.unique(puntos, axis=0, return_index=True, return_inverse=True)
+    inversa = inversa.ravel()
+    repetidos = np.flatnonzero(primera[inversa] != np.arange(n))
+    aristas_cero = np.column_stack([primera[inversa[repetidos]], repetidos])
+
+    aristas, pesos = np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+    m = len(unicos)
+    if m >= 2:
+        # 2. Candidatas
+        if metodo != 'knn':
+            candidatas = _candidatas_exactas(unicos, metodo)
+        else:
+            while True:
+                candidatas = _candidatas_vecinos(unicos, k)
+                componentes, _ = connected_components(_matriz_candidatas(unicos, candidatas), directed=False)
+                if componentes == 1 or k >= m - 1:
+                    break
+                k *= 2
+
+        # 3. MST disperso (pesos > 0: los puntos ya son únicos)
+        arbol = minimum_spanning_tree(_matriz_candidatas(unicos, candidatas)).tocoo()
+        aristas = np.column_stack([primera[arbol.row], primera[arbol.col]])
+        pesos = arbol.data
+
+    aristas = np.concatenate([aristas, aristas_cero]).astype(np.int64)
+    pesos = np.concatenate([pesos, np.zeros(len(aristas_cero))])
+    return aristas, pesos
+
+
+# --- PRUEBA CONTRA KRUSKAL COMPLETO Y ESCALA ---
+if __name__ == "__main__":
+    import os
+
+    import networkx as nx
+    import pandas as pd
+
+    # 1. Mismo peso total que la versión con networkx sobre generated_tiendas.csv
+    carpeta = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+    df_tiendas = pd.read_csv(os.path.join(carpeta, 'generated_tiendas.csv'))
+    puntos = posiciones_simuladas(df_tiendas['id_tienda'])
+    G = nx.Graph()
+    for (i, p1), (j, p2) in combinations(enumerate(puntos), 2):
+        G.add_edge(i, j, weight=math.sqrt((p2[0] - p1[0]) ** 2 + (p2[1] - p1[1]) ** 2))
+    esperado = nx.minimum_spanning_tree(G, algorithm='kruskal').size(weight='weight')
+    _, pesos = mst_euclidiano(puntos)
+    assert math.isclose(pesos.sum(), esperado), (pesos.sum(), esperado)
+    print(f"✅ generated_tiendas.csv: peso {pesos.sum():.2f} (Kruskal completo: {esperado:.2f})")
+
+    # 2. Casos borde contra el MST denso de SciPy
+    rng = np.random.default_rng(5)
+    racimo = rng.uniform(0, 1, size=(9, 3))
+    # Dos racimos a 10 de distancia y un punto lejano: un kNN conectado une el punto
+    # lejano a los dos racimos y se salta la arista corta A-B
+    contraejemplo = np.vstack([racimo, racimo + [10.0, 0.0, 0.0], [[5.0, 30.0, 0.0]]])
+    plano = rng.uniform(0, 100, size=(200, 2))
+    casos = {'repetidos': rng.integers(0, 30, size=(400, 2)).astype(float),
+             'colineales 2D': np.column_stack([np.arange(50.0), 2 * np.arange(50.0)]),
+             'colineales 3D': np.outer(rng.uniform(0, 100, 60), [1.0, -2.0, 0.5]) + [3.0, 1.0, 7.0],
+             'coplanares 3D': np.column_stack([plano, plano @ [0.3, -0.7]]),
+             '3D': rng.uniform(0, 100, size=(300, 3)),
+             '5D -> denso': rng.uniform(0, 100, size=(200, 5)),
+             'racimos 3D': contraejemplo}
+    for nombre, puntos in casos.items():
+        unicos = np.unique(puntos, axis=0)
+        esperado = minimum_spanning_tree(squareform(pdist(unicos))).sum()
+        aristas, pesos = mst_euclidiano(puntos)
+        assert len(aristas) == len(puntos) - 1
+        assert math.isclose(pesos.sum(), esperado), (nombre, pesos.sum(), esperado)
+    aproximado = mst_euclidiano(contraejemplo, metodo='knn')[1].sum()
+    print(f"✅ {', '.join(casos)}: mismo peso que el MST denso "
+          f"(racimos 3D: {mst_euclidiano(contraejemplo)[1].sum():.2f}; kNN aproximado daría {aproximado:.2f}).")
+
+    # 3. Escala
+    for n, d in ((10_000, 2), (100_000, 2), (20_000, 3)):
+        puntos = rng.uniform(0, 1000, size=(n, d))
+        inicio = time.perf_counter()
+        aristas, pesos = mst_euclidiano(puntos)
+        print(f"⏱️ {n:>7,} tiendas {d}D: {time.perf_counter() - inicio:.2f} s (peso {pesos.sum():,.0f})")
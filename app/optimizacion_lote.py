@@ -0,0 +1,295 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from algoritmo_backtracking import OptimizadorCanasta, obtener_lista_distritos
+from cache_resultados import CacheResultados
+from conexion_sqlite import CARPETA_DATOS
+from indice_ofertas import IndiceOfertas
+from indice_tiendas import IndiceTiendas
+from mochila_prioridad import PESOS_PRIORIDAD, peso_prioridad
+
+# =============================================================================
+# OPTIMIZACIÓN POR LOTES (Todas las familias, en paralelo)
+# =============================================================================
+# OBJETIVO:
+#   Calcular cada noche la canasta óptima de TODAS las familias de
+#   listas_de_compras.csv / hogares.csv sin pasar por el menú interactivo.
+#
+# CÓMO FUNCIONA:
+#   1. Las ofertas se cargan UNA vez (snapshot en memoria) en el proceso
+#      principal y se envían a cada worker al iniciar el pool.
+#   2. Los pedidos (id_familia, productos, distrito, presupuesto, cantidades,
+#      prioridades) se agrupan en bloques; cada bloque es una tarea del
+#      ProcessPoolExecutor. Con --objetivo prioridad se usan las columnas
+#      `cantidad` y `prioridad` de la lista (mochila acotada, ver
+#      mochila_prioridad.py); con "cantidad" se ignoran.
+#   3. Solo se mantienen unos pocos bloques "en vuelo" y los resultados se
+#      escriben al archivo (CSV o Parquet) apenas terminan, sin acumularlos.
+#   4. Al final se reporta el throughput (hogares/segundo).
+#   5. Con --cache los workers comparten un caché SQLite de resultados:
+#      pedidos equivalentes (misma lista, distrito y balde de presupuesto) se
+#      resuelven una sola vez entre todos los procesos.
+#
+# USO (desde la raíz del proyecto):
+#   python app/optimizacion_lote.py --sqlite -o output/canastas.csv
+#   python app/optimizacion_lote.py --sqlite --sintetico 100000 --workers 8
+#   python app/optimizacion_lote.py --sqlite --cache output/cache_resultados.sqlite --balde 1
+#   python app/optimizacion_lote.py --sqlite --objetivo prioridad
+#   python app/optimizacion_lote.py --sqlite --k-tiendas 5        # solo las 5 tiendas más cercanas
+# =============================================================================
+
+# (id_familia, productos, distrito, presupuesto, {producto: cantidad}, {producto: prioridad})
+Pedido = Tuple[int, List[str], str, float, Dict[str, float], Dict[str, str]]
+
+COLUMNAS_RESULTADO = ['id_familia', 'distrito', 'presupuesto', 'estado', 'cantidad_items',
+                      'productos', 'tiendas', 'total_gastado', 'vuelto', 'km_traslado']
+
+# Optimizador propio de cada proceso worker (se crea en el initializer)
+_OPTIMIZADOR: Optional[OptimizadorCanasta] = None
+_OBJETIVO = 'cantidad'
+
+
+def cargar_pedidos_desde_csv(ruta_listas: str, ruta_hogares: str, ruta_productos: str,
+                             presupuesto: float = 100.0,
+                             fraccion_ingreso: Optional[float] = None) -> List[Pedido]:
+    """
+    Une listas_de_compras + hogares + productos en un pedido por familia.
+    El presupuesto es fijo, o una fracción del ingreso mensual si se indica.
+    Si un producto aparece varias veces en la lista se suman sus cantidades
+    y se queda la prioridad más alta.
+    """
+    listas = pd.read_csv(ruta_listas)
+    hogares = pd.read_csv(ruta_hogares).drop_duplicates('id_familia')
+    productos = pd.read_csv(ruta_productos)[['id_producto', 'producto']]
+
+    df = listas.merge(productos, on='id_producto').merge(hogares, on='id_familia')
+    pedidos = []
+    for id_familia, grupo in df.groupby('id_familia', sort=True):
+        hogar = grupo.iloc[0]
+        monto = presupuesto
+        if fraccion_ingreso is not None:
+            monto = round(float(hogar['ingreso_mensual_soles']) * fraccion_ingreso, 2)
+        lista = list(dict.fromkeys(grupo['producto']))
+        cantidades, prioridades = {}, {}
+        for producto, cantidad, prioridad in zip(grupo['producto'], grupo['cantidad'], grupo['prioridad']):
+            cantidades[producto] = cantidades.get(producto, 0.0) + (1.0 if pd.isna(cantidad) else float(cantidad))
+            if pd.notna(prioridad) and (producto not in prioridades or
+                                        peso_prioridad(prioridad) > peso_prioridad(prioridades[producto])):
+                prioridades[producto] = str(prioridad)
+        pedidos.append((int(id_familia), lista, hogar['distrito'], monto, cantidades, prioridades))
+    return pedidos
+
+
+def generar_pedidos_sinteticos(total: int, productos: List[str], distritos: List[str],
+                               semilla: int = 42) -> Iterator[Pedido]:
+    """ Hogares sintéticos reproducibles (para pruebas de escala). """
+    rng = random.Random(semilla)
+    niveles = list(PESOS_PRIORIDAD)
+    for id_familia in range(1, total + 1):
+        lista = rng.sample(productos, rng.randint(1, min(12, len(productos))))
+        cantidades = {producto: float(rng.randint(1, 3)) for producto in lista}
+        prioridades = {producto: rng.choice(niveles) for producto in lista}
+        yield id_familia, lista, rng.choice(distritos), round(rng.uniform(10, 200), 2), cantidades, prioridades
+
+
+def _iniciar_worker(snapshot_ofertas, solver: str, cache: Optional[CacheResultados] = None,
+                    objetivo: str = 'cantidad', tiendas: Tuple = (None, None, None)):
+    global _OPTIMIZADOR, _OBJETIVO
+    indice_tiendas, k_tiendas, radio_km = tiendas
+    _OPTIMIZADOR = OptimizadorCanasta(indice_ofertas=snapshot_ofertas, solver=solver, cache=cache,
+                                      indice_tiendas=indice_tiendas, k_tiendas=k_tiendas, radio_km=radio_km)
+    _OBJETIVO = objetivo
+
+
+def _optimizar_bloque(bloque: List[Pedido]) -> List[Dict]:
+    """ Tarea del worker: optimiza un bloque completo de pedidos. """
+    return [optimizar_pedido(_OPTIMIZADOR, pedido, _OBJETIVO) for pedido in bloque]
+
+
+def _describir_item(item: Dict) -> str:
+    """ 'Arroz' o, con objetivo prioridad, 'Arroz x2.5' (unidades compradas). """
+    if 'cantidad' not in item:
+        return item['producto']
+    return f"{item['producto']} x{item['cantidad']:g}"
+
+
+def optimizar_pedido(optimizador: OptimizadorCanasta, pedido: Pedido, objetivo: str = 'cantidad') -> Dict:
+    """ objetivo "prioridad" usa las cantidades y prioridades del pedido (ver mochila_prioridad.py). """
+    id_familia, productos, distrito, presupuesto, cantidades, prioridades = pedido
+    canasta, tiendas_ruta, gasto, vuelto, costo_ruta, estado = optimizador.optimizar(
+        presupuesto, productos, distrito, objetivo=objetivo, cantidades=cantidades, prioridades=prioridades)
+    km = costo_ruta if tiendas_ruta else sum(item['costo_traslado'] for item in canasta)
+    return {
+        'id_familia': id_familia,
+        'distrito': distrito,
+        'presupuesto': presupuesto,
+        'estado': estado,
+        'cantidad_items': len(canasta),
+        'productos': '; '.join(_describir_item(item) for item in canasta),
+        'tiendas': '; '.join(item['tienda'] for item in canasta),
+        'total_gastado': round(gasto, 2),
+        'vuelto': round(vuelto, 2),
+        'km_traslado': km,
+    }
+
+
+def _en_bloques(pedidos: Iterable[Pedido], tamano: int) -> Iterator[List[Pedido]]:
+    bloque = []
+    for pedido in pedidos:
+        bloque.append(pedido)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def optimizar_lote(pedidos: Iterable[Pedido], snapshot_ofertas, solver: str = 'exact-bnb',
+                   workers: Optional[int] = None, tamano_bloque: int = 256,
+                   cache: Optional[CacheResultados] = None, objetivo: str = 'cantidad',
+                   indice_tiendas: Optional[IndiceTiendas] = None, k_tiendas: Optional[int] = None,
+                   radio_km: Optional[float] = None) -> Iterator[List[Dict]]:
+    """
+    Reparte los pedidos en un ProcessPoolExecutor y va entregando (yield) los
+    bloques de resultados en el orden en que terminan.
+    objetivo: "cantidad" (máxima cantidad de ítems) o "prioridad".
+    indice_tiendas + k_tiendas / radio_km: solo las tiendas cercanas al
+    centro del distrito de cada familia (ver indice_tiendas.py).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_en_vuelo = workers * 2
+    bloques = _en_bloques(pedidos, tamano_bloque)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                             initargs=(snapshot_ofertas, solver, cache, objetivo,
+                                       (indice_tiendas, k_tiendas, radio_km))) as pool:
+        en_vuelo = set()
+        for bloque in bloques:
+            en_vuelo.add(pool.submit(_optimizar_bloque, bloque))
+            if len(en_vuelo) >= max_en_vuelo:
+                terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    yield futuro.result()
+        for futuro in wait(en_vuelo).done:
+            yield futuro.result()
+
+
+class EscritorResultados:
+    """ Escribe bloques de resultados a CSV o Parquet a medida que llegan. """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.parquet = ruta.endswith('.parquet')
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                sys.exit("❌ Para escribir Parquet se necesita 'pyarrow' (pip install pyarrow).")
+            self._pa = pa
+            esquema = pa.schema([
+                ('id_familia', pa.int64()), ('distrito', pa.string()), ('presupuesto', pa.float64()),
+                ('estado', pa.string()), ('cantidad_items', pa.int64()), ('productos', pa.string()),
+                ('tiendas', pa.string()), ('total_gastado', pa.float64()), ('vuelto', pa.float64()),
+                ('km_traslado', pa.float64()),
+            ])
+            self._escritor = pq.ParquetWriter(ruta, esquema)
+        else:
+            self._archivo = open(ruta, 'w', newline='', encoding='utf-8')
+            self._escritor = csv.DictWriter(self._archivo, fieldnames=COLUMNAS_RESULTADO)
+            self._escritor.writeheader()
+
+    def escribir(self, filas: List[Dict]) -> None:
+        if self.parquet:
+            self._escritor.write_table(self._pa.Table.from_pylist(filas, schema=self._escritor.schema))
+        else:
+            self._escritor.writerows(filas)
+
+    def cerrar(self) -> None:
+        if self.parquet:
+            self._escritor.close()
+        else:
+            self._archivo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimización de canastas por lotes (todas las familias).")
+    parser.add_argument('--listas', default=os.path.join(CARPETA_DATOS, 'listas_de_compras.csv'))
+    parser.add_argument('--hogares', default=os.path.join(CARPETA_DATOS, 'hogares.csv'))
+    parser.add_argument('--productos', default=os.path.join(CARPETA_DATOS, 'productos.csv'))
+    parser.add_argument('--presupuesto', type=float, default=100.0, help='Presupuesto fijo por familia (S/)')
+    parser.add_argument('--fraccion-ingreso', type=float, default=None,
+                        help='Usar esta fracción del ingreso mensual como presupuesto')
+    parser.add_argument('--sintetico', type=int, default=None, help='Generar N hogares sintéticos')
+    parser.add_argument('--solver', default='exact-bnb', choices=['exact-bnb', 'dp', 'greedy', 'consolidado'])
+    parser.add_argument('--objetivo', default='cantidad', choices=['cantidad', 'prioridad'],
+                        help='prioridad: usa las columnas cantidad/prioridad de la lista')
+    parser.add_argument('--k-tiendas', type=int, default=None, help='Solo las k tiendas más cercanas')
+    parser.add_argument('--radio-km', type=float, default=None, help='Solo tiendas a menos de X km')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--bloque', type=int, default=256, help='Pedidos por tarea del pool')
+    parser.add_argument('--sqlite', action='store_true', help='Usar la base de prueba SQLite (data/*.csv)')
+    parser.add_argument('--output', '-o', default='output/canastas_lote.csv', help='.csv o .parquet')
+    parser.add_argument('--cache', default=None, help='Archivo SQLite de caché de resultados compartido')
+    parser.add_argument('--balde', type=float, default=0.01,
+                        help='Redondeo del presupuesto para el caché (S/, hacia abajo)')
+    args = parser.parse_args()
+
+    # 1. Ofertas: se cargan una sola vez
+    if args.sqlite:
+        from conexion_sqlite import crear_engine_sqlite
+        engine = crear_engine_sqlite()
+    else:
+        from algoritmo_backtracking import engine
+    snapshot = IndiceOfertas(engine).snapshot
+    print(f"✅ Snapshot de ofertas: {len(snapshot)} ofertas de {len(snapshot.tramos)} productos.")
+    indice_tiendas = None
+    if args.k_tiendas is not None or args.radio_km is not None:
+        indice_tiendas = IndiceTiendas.desde_sql(engine)
+        print(f"✅ Índice espacial: {len(indice_tiendas)} tiendas con coordenadas.")
+
+    # 2. Pedidos
+    if args.sintetico:
+        total = args.sintetico
+        pedidos = generar_pedidos_sinteticos(total, list(snapshot.tramos), obtener_lista_distritos())
+    else:
+        pedidos = cargar_pedidos_desde_csv(args.listas, args.hogares, args.productos,
+                                           args.presupuesto, args.fraccion_ingreso)
+        total = len(pedidos)
+
+    cache = CacheResultados(balde=args.balde, ruta_compartida=args.cache) if args.cache else None
+
+    # 3. Procesar y escribir en streaming
+    escritor = EscritorResultados(args.output)
+    procesados = 0
+    inicio = time.perf_counter()
+    try:
+        for filas in optimizar_lote(pedidos, snapshot, args.solver, args.workers, args.bloque, cache,
+                                    args.objetivo, indice_tiendas, args.k_tiendas, args.radio_km):
+            escritor.escribir(filas)
+            procesados += len(filas)
+            transcurrido = time.perf_counter() - inicio
+            print(f"\r⏳ {procesados}/{total} hogares ({procesados / transcurrido:,.0f} hogares/s)",
+                  end='', flush=True)
+    finally:
+        escritor.cerrar()
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"\n✅ {procesados} hogares en {transcurrido:.2f} s "
+          f"({procesados / max(transcurrido, 1e-9):,.0f} hogares/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
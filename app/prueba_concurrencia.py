@@ -0,0 +1,58 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from algoritmo_backtracking import OptimizadorCanasta, obtener_lista_distritos
+from conexion_sqlite import crear_engine_sqlite
+from indice_ofertas import IndiceOfertas
+
+# =============================================================================
+# PRUEBA DE ESTRÉS: OPTIMIZACIONES CONCURRENTES (ThreadPoolExecutor)
+# =============================================================================
+# OBJETIVO:
+#   Comprobar que un mismo OptimizadorCanasta, compartido entre hilos, da los
+#   MISMOS resultados que correr las optimizaciones una por una.
+#
+# USO (desde la raíz del proyecto):
+#   python app/prueba_concurrencia.py
+# =============================================================================
+
+TOTAL_PEDIDOS = 400
+HILOS = 16
+
+
+def generar_pedidos(productos, distritos, total, semilla=7):
+    """ Pedidos aleatorios (presupuesto, lista, distrito, solver) reproducibles. """
+    rng = random.Random(semilla)
+    pedidos = []
+    for _ in range(total):
+        lista = rng.sample(productos, rng.randint(1, min(15, len(productos))))
+        pedidos.append((
+            round(rng.uniform(5, 150), 2),
+            lista,
+            rng.choice(distritos),
+            rng.choice(['exact-bnb', 'dp', 'greedy']),
+        ))
+    return pedidos
+
+
+if __name__ == "__main__":
+    indice = IndiceOfertas(crear_engine_sqlite())
+    optimizador = OptimizadorCanasta(indice_ofertas=indice)
+
+    pedidos = generar_pedidos(list(indice.snapshot.tramos), obtener_lista_distritos(), TOTAL_PEDIDOS)
+
+    inicio = time.perf_counter()
+    secuencial = [optimizador.optimizar(p, lista, d, solver=s) for p, lista, d, s in pedidos]
+    t_secuencial = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        concurrente = list(pool.map(lambda pedido: optimizador.optimizar(*pedido[:3], solver=pedido[3]), pedidos))
+    t_concurrente = time.perf_counter() - inicio
+
+    diferentes = sum(1 for a, b in zip(secuencial, concurrente) if a != b)
+    print(f"Secuencial: {t_secuencial:.2f} s | Concurrente ({HILOS} hilos): {t_concurrente:.2f} s")
+    if diferentes:
+        raise SystemExit(f"❌ {diferentes} de {TOTAL_PEDIDOS} resultados difieren entre hilos.")
+    print(f"✅ {TOTAL_PEDIDOS} optimizaciones concurrentes idénticas a las secuenciales.")
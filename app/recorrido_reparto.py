@@ -0,0 +1,251 @@
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import depth_first_order
+from scipy.spatial import cKDTree
+
+from mst_euclidiano import mst_euclidiano
+
+# =============================================================================
+# RECORRIDO DE REPARTO (MST -> tour + mejoras 2-opt / Or-opt)
+# =============================================================================
+# OBJETIVO:
+#   El MST es un árbol, no una ruta manejable. Aquí se arma un ORDEN de
+#   visita cerrado (sale y vuelve a la tienda de inicio) y se mejora.
+#
+# CÓMO FUNCIONA:
+#   1. Recorrido inicial: orden en preorden (DFS) del MST. Saltando nodos ya
+#      visitados se obtiene un tour de a lo más 2 x peso del MST.
+#   2. Lista de vecinos: para cada tienda sus k más cercanas (cKDTree), con
+#      las distancias precalculadas (matriz n x k).
+#   3. 2-opt: cambia dos aristas del tour por dos más cortas (invierte un
+#      tramo con NumPy). Solo se prueban tiendas vecinas y se usan
+#      "don't-look bits": una tienda se vuelve a revisar solo si cambió algo
+#      a su alrededor.
+#   4. Or-opt: mueve tramos de 1 a 3 tiendas a otra posición del tour (junto
+#      a una tienda vecina), en el mismo sentido o invertidos.
+#   5. Se alternan 2-opt y Or-opt hasta que no haya mejoras o se acabe el
+#      tiempo. El peso del MST es una cota inferior del tour óptimo.
+# =============================================================================
+
+K_VECINOS = 8
+EPSILON = 1e-9
+
+
+def longitud_recorrido(coordenadas: np.ndarray, orden: np.ndarray) -> float:
+    """ Largo del tour cerrado (vuelve al inicio). """
+    puntos = np.asarray(coordenadas, dtype=float)[orden]
+    return float(np.sqrt(((puntos - np.roll(puntos, -1, axis=0)) ** 2).sum(axis=1)).sum())
+
+
+def recorrido_preorden(n: int, aristas: np.ndarray, inicio: int = 0) -> np.ndarray:
+    """ Orden DFS (preorden) del árbol: aproximación 2 del tour óptimo. """
+    arbol = coo_matrix((np.ones(len(aristas)), (aristas[:, 0], aristas[:, 1])), shape=(n, n)).tocsr()
+    orden, _ = depth_first_order(arbol, inicio, directed=False, return_predecessors=True)
+    return orden
+
+
+class _Mejorador:
+    """ Estado de la búsqueda local: tour como array + posición de cada tienda. """
+
+    def __init__(self, coordenadas: np.ndarray, orden: np.ndarray, k: int, fin: float):
+        self.n = len(orden)
+        self.xs = coordenadas[:, 0].tolist()
+        self.ys = coordenadas[:, 1].tolist() if coordenadas.shape[1] > 1 else [0.0] * self.n
+        self.tour = np.array(orden, dtype=np.int64)
+        self.pos = np.empty(self.n, dtype=np.int64)
+        self.pos[self.tour] = np.arange(self.n)
+        k = min(k, self.n - 1)
+        distancias, vecinos = cKDTree(coordenadas).query(coordenadas, k=k + 1)
+        self.vecinos = vecinos[:, 1:].tolist()
+        self.dist_vecinos = distancias[:, 1:].tolist()
+        self.fin = fin
+        self.mejoras_2opt = 0
+        self.mejoras_oropt = 0
+        self.agotado = False
+
+    def d(self, a: int, b: int) -> float:
+        return math.hypot(self.xs[a] - self.xs[b], self.ys[a] - self.ys[b])
+
+    def _invertir(self, i: int, j: int) -> None:
+        """ Invierte el tramo de posiciones i..j (i <= j). """
+        tramo = self.tour[i:j + 1][::-1].copy()
+        self.tour[i:j + 1] = tramo
+        self.pos[tramo] = np.arange(i, j + 1)
+
+    def _tiempo_agotado(self) -> bool:
+        if time.perf_counter() >= self.fin:
+            self.agotado = True
+        return self.agotado
+
+    # --- 2-opt con lista de vecinos y don't-look bits ---
+    def dos_opt(self, cola: deque) -> bool:
+        n, tour, pos = self.n, self.tour, self.pos
+        en_cola = np.zeros(n, dtype=bool)
+        en_cola[list(cola)] = True
+        mejoro = False
+        revisadas = 0
+        while cola:
+            revisadas += 1
+            if (revisadas & 127) == 0 and self._tiempo_agotado():
+                return mejoro
+            a = cola.popleft()
+            en_cola[a] = False
+            i = int(pos[a])
+            for sentido in (1, -1):
+                b = int(tour[(i + sentido) % n])
+                d_ab = self.d(a, b)
+                movido = False
+                for c, d_ac in zip(self.vecinos[a], self.dist_vecinos[a]):
+                    if d_ac >= d_ab:
+                        break  # Vecinos ordenados: los siguientes tampoco mejoran
+                    j = int(pos[c])
+                    e = int(tour[(j + sentido) % n])
+                    if e == a or c == b:
+                        continue
+                    ganancia = d_ab + self.d(c, e) - d_ac - self.d(b, e)
+                    if ganancia <= EPSILON:
+                        continue
+                    # Nuevas aristas (a, c) y (b, e)
+                    if sentido == 1:
+                        self._invertir(i + 1, j) if i < j else self._invertir(j + 1, i)
+                    else:
+                        self._invertir(i, j - 1) if i < j else self._invertir(j, i - 1)
+                    self.mejoras_2opt += 1
+                    for ciudad in (a, b, c, e):
+                        if not en_cola[ciudad]:
+                            en_cola[ciudad] = True
+                            cola.append(ciudad)
+                    mejoro = movido = True
+                    break
+                if movido:
+                    break
+        return mejoro
+
+    # --- Or-opt: mover tramos de 1 a 3 tiendas junto a una vecina ---
+    def or_opt(self) -> List[int]:
+        """ Una pasada; devuelve las tiendas tocadas (para reactivar el 2-opt). """
+        n = self.n
+        tocadas = []
+        for largo in (1, 2, 3):
+            if n < largo + 3:
+                break
+            i = 0
+            while i + largo < n:
+                if (i & 127) == 0 and self._tiempo_agotado():
+                    return tocadas
+                tour = self.tour
+                s0, s1 = int(tour[i]), int(tour[i + largo - 1])
+                p, q = int(tour[i - 1]), int(tour[i + largo])
+                quitar = self.d(p, s0) + self.d(s1, q) - self.d(p, q)
+                tramo = set(int(t) for t in tour[i:i + largo])
+
+                mejor = None
+                for extremo in (s0, s1):
+                    for c in self.vecinos[extremo]:
+                        if c in tramo:
+                            continue
+                        e = int(tour[(int(self.pos[c]) + 1) % n])
+                        if e in tramo or c == p:
+                            continue
+                        base = self.d(c, e)
+                        directo = self.d(c, s0) + self.d(s1, e) - base
+                        invertido = self.d(c, s1) + self.d(s0, e) - base
+                        agregar, invertir = (directo, False) if directo <= invertido else (invertido, True)
+                        if quitar - agregar > EPSILON and (mejor is None or agregar < mejor[0]):
+                            mejor = (agregar, c, invertir)
+
+                if mejor is None:
+                    i += 1
+                    continue
+                _, c, invertir = mejor
+                segmento = tour[i:i + largo][::-1] if invertir else tour[i:i + largo]
+                resto = np.concatenate([tour[:i], tour[i + largo:]])
+                k = int(np.flatnonzero(resto == c)[0])
+                self.tour = np.concatenate([resto[:k + 1], segmento, resto[k + 1:]])
+                self.pos[self.tour] = np.arange(n)
+                self.mejoras_oropt += 1
+                tocadas.extend([p, q, c, s0, s1])
+        return tocadas
+
+
+def resolver_recorrido(coordenadas: np.ndarray, limite_segundos: float = 2.0, k_vecinos: int = K_VECINOS,
+                       inicio: int = 0, estadisticas: Optional[Dict] = None) -> np.ndarray:
+    """
+    Orden de visita (índices de `coordenadas`) que empieza en `inicio`.
+    estadisticas: longitud_mst (cota inferior), longitud_inicial,
+                  longitud_final, razon_vs_mst, mejoras_2opt, mejoras_oropt,
+                  segundos, completo (False si se acabó el tiempo).
+    """
+    comienzo = time.perf_counter()
+    puntos = np.asarray(coordenadas, dtype=float)
+    n = len(puntos)
+    if n <= 3:
+        orden = np.roll(np.arange(n), -inicio) if n else np.arange(0)
+        if estadisticas is not None:
+            largo = longitud_recorrido(puntos, orden) if n else 0.0
+            estadisticas.update(longitud_mst=float(mst_euclidiano(puntos)[1].sum()), longitud_inicial=largo,
+                                longitud_final=largo, razon_vs_mst=1.0, mejoras_2opt=0, mejoras_oropt=0,
+                                segundos=time.perf_counter() - comienzo, completo=True)
+        return orden
+
+    # 1. MST + preorden
+    aristas, pesos = mst_euclidiano(puntos)
+    orden = recorrido_preorden(n, aristas, inicio)
+    longitud_inicial = longitud_recorrido(puntos, orden)
+
+    # 2-5. Búsqueda local con tiempo límite
+    mejorador = _Mejorador(puntos, orden, k_vecinos, comienzo + limite_segundos)
+    cola = deque(int(t) for t in mejorador.tour)
+    while not mejorador.agotado:
+        mejorador.dos_opt(cola)
+        if mejorador.agotado:
+            break
+        tocadas = mejorador.or_opt()
+        if not tocadas:
+            break
+        cola = deque(dict.fromkeys(tocadas))
+
+    orden = np.roll(mejorador.tour, -int(mejorador.pos[inicio]))
+    if estadisticas is not None:
+        longitud_mst = float(pesos.sum())
+        longitud_final = longitud_recorrido(puntos, orden)
+        estadisticas.update(
+            longitud_mst=longitud_mst, longitud_inicial=longitud_inicial, longitud_final=longitud_final,
+            razon_vs_mst=longitud_final / longitud_mst if longitud_mst else 1.0,
+            mejoras_2opt=mejorador.mejoras_2opt, mejoras_oropt=mejorador.mejoras_oropt,
+            segundos=time.perf_counter() - comienzo, completo=not mejorador.agotado,
+        )
+    return orden
+
+
+# --- PRUEBA: RECORRIDO VÁLIDO Y ESCALA ---
+if __name__ == "__main__":
+    from itertools import permutations
+
+    # 1. Listas pequeñas: tour válido y cerca del óptimo por fuerza bruta
+    rng = np.random.default_rng(11)
+    peor = 1.0
+    for _ in range(30):
+        puntos = rng.uniform(0, 100, size=(8, 2))
+        orden = resolver_recorrido(puntos, limite_segundos=1.0)
+        assert sorted(orden.tolist()) == list(range(8)) and orden[0] == 0
+        optimo = min(longitud_recorrido(puntos, np.array((0,) + p)) for p in permutations(range(1, 8)))
+        peor = max(peor, longitud_recorrido(puntos, orden) / optimo)
+    print(f"✅ 30 casos de 8 tiendas: tours válidos, peor caso {peor:.3f} x el óptimo.")
+
+    # 2. Escala
+    for n in (1_000, 5_000):
+        puntos = rng.uniform(0, 1000, size=(n, 2))
+        estadisticas = {}
+        orden = resolver_recorrido(puntos, limite_segundos=5.0, estadisticas=estadisticas)
+        assert len(np.unique(orden)) == n
+        print(f"⏱️ {n:>5,} tiendas en {estadisticas['segundos']:.2f} s: "
+              f"MST {estadisticas['longitud_mst']:,.0f} | preorden {estadisticas['longitud_inicial']:,.0f} | "
+              f"final {estadisticas['longitud_final']:,.0f} ({estadisticas['razon_vs_mst']:.3f} x MST, "
+              f"{estadisticas['mejoras_2opt']} 2-opt, {estadisticas['mejoras_oropt']} Or-opt, "
+              f"completo={estadisticas['completo']})")
@@ -0,0 +1,326 @@
+import hashlib
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from matriz_distancias import COSTO_DISTRITO_DESCONOCIDO, COSTO_SIN_CAMINO
+
+# =============================================================================
+# RED VIAL (Motor de distancias escalable: CSR + A*/ALT + árboles en caché)
+# =============================================================================
+# OBJETIVO:
+#   Pasar del mapa de 16 distritos a una red de calles (decenas de miles de
+#   nodos) sin depender de Dijkstra de networkx sobre dict-de-dicts.
+#
+# CÓMO FUNCIONA:
+#   1. La lista de aristas (archivo CSV: origen, destino[, peso]) se carga en
+#      una matriz de adyacencia CSR de SciPy. Aristas repetidas: se queda la
+#      de menor peso.
+#   2. Origen -> destino: A* con cotas ALT (landmarks). Se eligen unos pocos
+#      nodos "faro" lejanos entre sí, se precalculan sus distancias a todos
+#      y por desigualdad triangular se obtiene una heurística admisible.
+#   3. Uno -> muchos: un solo barrido Dijkstra (SciPy) desde el origen. El
+#      árbol de caminos mínimos queda en un caché LRU por origen, así las
+#      siguientes consultas desde ese origen son una lectura.
+#   4. `costo` / `costos_desde` devuelven los mismos centinelas que
+#      obtener_costo_traslado (500 origen desconocido, 1000 sin camino).
+# =============================================================================
+
+
+class NodoDesconocido(KeyError):
+    """ El nodo no existe en la red (es_origen indica si era el origen). """
+
+    def __init__(self, nodo, es_origen: bool):
+        super().__init__(nodo)
+        self.nodo = nodo
+        self.es_origen = es_origen
+
+
+class RedVial:
+    """ Red vial ponderada en formato CSR con consultas de caminos mínimos. """
+
+    def __init__(self, nodos: List, adyacencia: csr_matrix, dirigida: bool = False,
+                 capacidad_arboles: int = 256, cantidad_landmarks: int = 8):
+        self.nodos = list(nodos)
+        self.indice = {nodo: i for i, nodo in enumerate(self.nodos)}
+        self.adyacencia = adyacencia
+        self.dirigida = dirigida
+        self.capacidad_arboles = capacidad_arboles
+        self.cantidad_landmarks = cantidad_landmarks
+        # Listas de Python para el A* (indexar listas es más rápido que arrays NumPy uno a uno)
+        self._inicios = adyacencia.indptr.tolist()
+        self._vecinos = adyacencia.indices.tolist()
+        self._pesos = adyacencia.data.tolist()
+        self._arboles: 'OrderedDict[int, Tuple[np.ndarray, np.ndarray]]' = OrderedDict()
+        self._landmarks: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._candado = threading.Lock()
+        self.firma = hashlib.sha1(repr(self.nodos).encode('utf-8') + adyacencia.indptr.tobytes() +
+                                  adyacencia.indices.tobytes() + adyacencia.data.tobytes()).hexdigest()
+
+    # --- Construcción ---
+    @classmethod
+    def desde_aristas(cls, origenes: Iterable, destinos: Iterable, pesos: Optional[Iterable[float]] = None,
+                      dirigida: bool = False, nodos: Optional[Iterable] = None, **opciones) -> 'RedVial':
+        origenes = pd.Series(list(origenes), dtype=object)
+        destinos = pd.Series(list(destinos), dtype=object)
+        pesos = np.ones(len(origenes)) if pesos is None else np.asarray(list(pesos), dtype=float)
+
+        todos = list(dict.fromkeys(list(nodos or []) + origenes.tolist() + destinos.tolist()))
+        indice = {nodo: i for i, nodo in enumerate(todos)}
+        filas = origenes.map(indice).to_numpy(dtype=np.int64)
+        columnas = destinos.map(indice).to_numpy(dtype=np.int64)
+        if not dirigida:
+            filas, columnas = np.concatenate([filas, columnas]), np.concatenate([columnas, filas])
+            pesos = np.concatenate([pesos, pesos])
+
+        # Aristas repetidas: la de menor peso (csr_matrix las SUMARÍA)
+        orden = np.lexsort((pesos, columnas, filas))
+        filas, columnas, pesos = filas[orden], columnas[orden], pesos[orden]
+        primera = np.ones(len(filas), dtype=bool)
+        primera[1:] = (filas[1:] != filas[:-1]) | (columnas[1:] != columnas[:-1])
+        n = len(todos)
+        adyacencia = csr_matrix((pesos[primera], (filas[primera], columnas[primera])), shape=(n, n))
+        return cls(todos, adyacencia, dirigida, **opciones)
+
+    @classmethod
+    def desde_archivo(cls, ruta: str, dirigida: bool = False, sep: str = ',', **opciones) -> 'RedVial':
+        """ CSV con encabezado: origen, destino[, peso] (sin peso -> 1 por tramo). """
+        df = pd.read_csv(ruta, sep=sep)
+        pesos = df.iloc[:, 2] if df.shape[1] >= 3 else None
+        return cls.desde_aristas(df.iloc[:, 0], df.iloc[:, 1], pesos, dirigida, **opciones)
+
+    @classmethod
+    def desde_grafo(cls, grafo: nx.Graph, weight: str = 'weight', **opciones) -> 'RedVial':
+        """ Misma red que un grafo networkx (peso faltante = 1, igual que networkx). """
+        aristas = list(grafo.edges(data=True))
+        return cls.desde_aristas([u for u, _, _ in aristas], [v for _, v, _ in aristas],
+                                 [datos.get(weight, 1) for _, _, datos in aristas],
+                                 dirigida=grafo.is_directed(), nodos=grafo.nodes, **opciones)
+
+    def como_grafo(self) -> nx.Graph:
+        """ La misma red como grafo networkx ponderado (nodos en el mismo orden). """
+        grafo = nx.DiGraph() if self.dirigida else nx.Graph()
+        grafo.add_nodes_from(self.nodos)
+        aristas = self.adyacencia.tocoo()
+        grafo.add_weighted_edges_from((self.nodos[i], self.nodos[j], peso) for i, j, peso in
+                                      zip(aristas.row.tolist(), aristas.col.tolist(), aristas.data.tolist()))
+        return grafo
+
+    def __len__(self):
+        return len(self.nodos)
+
+    def _posicion(self, nodo, es_origen: bool) -> int:
+        i = self.indice.get(nodo)
+        if i is None:
+            raise NodoDesconocido(nodo, es_origen)
+        return i
+
+    # --- Uno -> muchos (árboles en caché) ---
+    def _arbol(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._candado:
+            arbol = self._arboles.get(i)
+            if arbol is not None:
+                self._arboles.move_to_end(i)
+                return arbol
+        distancias, predecesores = dijkstra(self.adyacencia, directed=self.dirigida, indices=i,
+                                            return_predecessors=True)
+        with self._candado:
+            self._arboles[i] = (distancias, predecesores)
+            while len(self._arboles) > self.capacidad_arboles:
+                self._arboles.popitem(last=False)
+        return distancias, predecesores
+
+    def arbol_desde(self, origen) -> np.ndarray:
+        """ Distancias desde `origen` a TODOS los nodos (np.inf si no hay camino). """
+        return self._arbol(self._posicion(origen, True))[0]
+
+    def distancias_desde(self, origen, destinos: Iterable) -> np.ndarray:
+        """ Un solo barrido desde el origen; destinos desconocidos -> np.nan. """
+        distancias = self.arbol_desde(origen)
+        posiciones = pd.Series(list(destinos), dtype=object).map(self.indice)
+        conocidos = posiciones.notna().to_numpy()
+        resultado = np.full(len(posiciones), np.nan)
+        resultado[conocidos] = distancias[posiciones[conocidos].to_numpy(dtype=np.int64)]
+        return resultado
+
+    def camino(self, origen, destino) -> List:
+        """ Nodos del camino mínimo (lista vacía si no hay camino). """
+        i, j = self._posicion(origen, True), self._posicion(destino, False)
+        distancias, predecesores = self._arbol(i)
+        if not np.isfinite(distancias[j]):
+            return []
+        nodos = [j]
+        while nodos[-1] != i:
+            nodos.append(int(predecesores[nodos[-1]]))
+        return [self.nodos[k] for k in reversed(nodos)]
+
+    # --- Origen -> destino (A* con landmarks) ---
+    def _preparar_landmarks(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Landmarks por "punto más lejano"; distancias desde y hacia cada uno. """
+        if self._landmarks is not None:
+            return self._landmarks
+        n = len(self.nodos)
+        elegidos = [0]
+        cercania = np.full(n, np.inf)
+        desde = []
+        for _ in range(min(self.cantidad_landmarks, n)):
+            d = dijkstra(self.adyacencia, directed=self.dirigida, indices=elegidos[-1])
+            desde.append(d)
+            cercania = np.minimum(cercania, np.where(np.isfinite(d), d, np.inf))
+            candidatos = np.where(np.isfinite(cercania), cercania, -1.0)
+            siguiente = int(np.argmax(candidatos))
+            if candidatos[siguiente] <= 0:
+                break
+            elegidos.append(siguiente)
+        desde = np.vstack(desde)
+        hacia = desde if not self.dirigida else np.vstack([
+            dijkstra(self.adyacencia.T.tocsr(), directed=True, indices=l) for l in elegidos[:len(desde)]])
+        if not self.dirigida:
+            # Por nodo, sus distancias a cada landmark (inf -> 0: solo ocurre entre
+            # componentes distintas, donde cualquier cota es válida)
+            self._faros_por_nodo = np.where(np.isfinite(desde), desde, 0.0).T.tolist()
+        self._landmarks = (desde, hacia)
+        return self._landmarks
+
+    def _heuristica(self, j: int) -> Callable[[int], float]:
+        """ Cota inferior h(v) de d(v, j): max_l (d(l,j) - d(l,v), d(v,l) - d(j,l)). """
+        desde, hacia = self._preparar_landmarks()
+        if not self.dirigida:
+            # No dirigida: |d(l,j) - d(l,v)|, calculada solo para los nodos que se visitan
+            faros = self._faros_por_nodo
+            destino = faros[j]
+            return lambda v: max([abs(a - b) for a, b in zip(destino, faros[v])])
+        with np.errstate(invalid='ignore'):
+            cota1 = desde[:, [j]] - desde
+            cota2 = hacia - hacia[:, [j]]
+        cotas = np.concatenate([cota1, cota2])
+        cotas[~np.isfinite(cotas)] = 0.0
+        return np.maximum(cotas.max(axis=0), 0.0).tolist().__getitem__
+
+    def distancia(self, origen, destino) -> float:
+        """ Distancia mínima origen -> destino (np.inf si no hay camino). """
+        i, j = self._posicion(origen, True), self._posicion(destino, False)
+        with self._candado:
+            if i in self._arboles:
+                return float(self._arboles[i][0][j])
+            if not self.dirigida and j in self._arboles:
+                return float(self._arboles[j][0][i])
+        if i == j:
+            return 0.0
+
+        h = self._heuristica(j)
+        inicios, vecinos, pesos = self._inicios, self._vecinos, self._pesos
+        g = {i: 0.0}
+        cotas = {}
+        cerrados = set()
+        frontera = [(h(i), i)]
+        while frontera:
+            _, v = heapq.heappop(frontera)
+            if v == j:
+                return g[v]
+            if v in cerrados:
+                continue
+            cerrados.add(v)
+            gv = g[v]
+            for k in range(inicios[v], inicios[v + 1]):
+                w = vecinos[k]
+                nuevo = gv + pesos[k]
+                if nuevo < g.get(w, np.inf):
+                    g[w] = nuevo
+                    cota = cotas.get(w)
+                    if cota is None:
+                        cota = cotas[w] = h(w)
+                    heapq.heappush(frontera, (nuevo + cota, w))
+        return float('inf')
+
+    # --- Misma semántica que obtener_costo_traslado ---
+    def costo(self, origen, destino, costo_desconocido: float = COSTO_DISTRITO_DESCONOCIDO,
+              costo_sin_camino: float = COSTO_SIN_CAMINO) -> float:
+        try:
+            distancia = self.distancia(origen, destino)
+        except NodoDesconocido as error:
+            return costo_desconocido if error.es_origen else costo_sin_camino
+        return distancia if np.isfinite(distancia) else costo_sin_camino
+
+    def costos_desde(self, origen, destinos: Iterable, costo_desconocido: float = COSTO_DISTRITO_DESCONOCIDO,
+                     costo_sin_camino: float = COSTO_SIN_CAMINO) -> np.ndarray:
+        """ Reemplazo directo de MatrizDistancias.costos_desde para redes grandes. """
+        destinos = list(destinos)
+        if origen not in self.indice:
+            return np.full(len(destinos), costo_desconocido)
+        distancias = self.distancias_desde(origen, destinos)
+        distancias[~np.isfinite(distancias)] = costo_sin_camino
+        return distancias
+
+
+# --- PRUEBA CONTRA NETWORKX Y ESCALA ---
+def _red_cuadricula(lado: int, semilla: int = 1) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], np.ndarray]:
+    """ Cuadrícula lado x lado con pesos aleatorios (simula una red de calles). """
+    rng = np.random.default_rng(semilla)
+    ids = np.arange(lado * lado).reshape(lado, lado)
+    origenes = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    destinos = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    return origenes.tolist(), destinos.tolist(), rng.uniform(0.1, 1.0, size=len(origenes))
+
+
+if __name__ == "__main__":
+    import time
+
+    from algoritmo_distancia import RUTA_MAPA_LIMA
+
+    # 1. Paridad con networkx en el mapa de Lima (incluye distritos inexistentes)
+    mapa = pd.read_csv(RUTA_MAPA_LIMA)
+    grafo = nx.Graph()
+    grafo.add_weighted_edges_from(mapa.itertuples(index=False, name=None))
+    red = RedVial.desde_archivo(RUTA_MAPA_LIMA)
+    distritos = list(grafo.nodes) + ['Ate']
+    for origen in distritos:
+        for destino in distritos:
+            try:
+                esperado = float(nx.shortest_path_length(grafo, origen, destino, weight='weight'))
+            except nx.NodeNotFound:
+                esperado = COSTO_DISTRITO_DESCONOCIDO
+            except nx.NetworkXNoPath:
+                esperado = COSTO_SIN_CAMINO
+            assert red.costo(origen, destino) == esperado, (origen, destino)
+    assert nx.utils.graphs_equal(red.como_grafo(), grafo)
+    print(f"✅ data/mapa_lima.csv: {len(distritos) ** 2} pares idénticos a networkx.")
+
+    # 2. Escala: cuadrícula de 200 x 200 = 40.000 nodos
+    origenes, destinos, pesos = _red_cuadricula(200)
+    inicio = time.perf_counter()
+    red = RedVial.desde_aristas(origenes, destinos, pesos)
+    print(f"\n🛣️ Red de {len(red):,} nodos y {red.adyacencia.nnz // 2:,} tramos "
+          f"cargada en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    rng = np.random.default_rng(3)
+    pares = rng.integers(0, len(red), size=(20, 2)).tolist()
+    inicio = time.perf_counter()
+    red._preparar_landmarks()
+    print(f"   Landmarks ({red.cantidad_landmarks}): {(time.perf_counter() - inicio) * 1000:.0f} ms (una sola vez)")
+
+    inicio = time.perf_counter()
+    astar = [red.distancia(a, b) for a, b in pares]
+    t_astar = (time.perf_counter() - inicio) / len(pares) * 1000
+
+    inicio = time.perf_counter()
+    referencia = [float(dijkstra(red.adyacencia, directed=False, indices=red.indice[a])[red.indice[b]])
+                  for a, b in pares]
+    t_dijkstra = (time.perf_counter() - inicio) / len(pares) * 1000
+    assert np.allclose(astar, referencia), "A* difiere de Dijkstra"
+
+    inicio = time.perf_counter()
+    red.distancias_desde(pares[0][0], range(len(red)))
+    t_barrido = (time.perf_counter() - inicio) * 1000
+    inicio = time.perf_counter()
+    red.distancia(pares[0][0], pares[1][1])
+    t_cache = (time.perf_counter() - inicio) * 1000
+    print(f"   A* + ALT: {t_astar:.1f} ms/consulta | Dijkstra completo: {t_dijkstra:.1f} ms/consulta")
+    print(f"   Uno -> {len(red):,}: {t_barrido:.1f} ms | desde árbol en caché: {t_cache:.3f} ms")
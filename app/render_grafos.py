@@ -0,0 +1,209 @@
+import time
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+import matplotlib
+matplotlib.use('Agg')  # Sin pantalla: los scripts solo guardan imágenes
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
+
+# =============================================================================
+# RENDER MASIVO DE GRAFOS (LineCollection + scatter, backend Agg)
+# =============================================================================
+# OBJETIVO:
+#   `nx.draw_networkx_*` crea un objeto de matplotlib por cada arista y por
+#   cada nodo; con 200k aristas guardar la imagen tarda minutos.
+#
+# CÓMO FUNCIONA:
+#   1. Todas las aristas van en UN solo `LineCollection` (array m x 2 x 2).
+#   2. Todos los nodos van en UN solo `scatter`.
+#   3. Etiquetas con nivel de detalle: se ordenan por importancia (grado por
+#      defecto) y se dibujan como máximo `max_etiquetas`, una por celda de una
+#      grilla del tamaño de la letra, para que no se encimen.
+#   4. Grafos muy densos (modo_aristas='raster', o 'auto' desde
+#      ARISTAS_RASTER aristas): las aristas no pasan por matplotlib; se
+#      muestrean a lo largo de cada segmento con NumPy, se acumulan en una
+#      grilla de píxeles (reducida con `reduccion_raster`) y se pintan con
+#      un solo `imshow` cuya opacidad imita la superposición de líneas.
+#      Opcionalmente `max_aristas` dibuja solo una muestra fija (con semilla).
+#
+# USO:
+#   from render_grafos import dibujar_networkx
+#   dibujar_networkx(G, pos, 'output/grafo.png', tamano_nodo=10, alpha=0.6)
+# =============================================================================
+
+ARISTAS_RASTER = 50_000      # Desde aquí las aristas se rasterizan (modo 'auto')
+MUESTRAS_POR_BLOQUE = 4_000_000
+
+
+def _rasterizar_aristas(segmentos: np.ndarray, limites: Tuple[float, float, float, float],
+                        ancho_px: int, alto_px: int) -> np.ndarray:
+    """ Cuántas aristas pasan por cada píxel (alto_px x ancho_px). """
+    x0, x1, y0, y1 = limites
+    escala = np.array([(ancho_px - 1) / max(x1 - x0, 1e-12), (alto_px - 1) / max(y1 - y0, 1e-12)])
+    pixeles = (segmentos - np.array([x0, y0])) * escala          # (m, 2, 2) en píxeles
+    largos = np.ceil(np.abs(pixeles[:, 1] - pixeles[:, 0]).max(axis=1)).astype(np.int64) + 1
+    conteo = np.zeros(alto_px * ancho_px, dtype=np.int64)
+
+    inicio = 0
+    cortes = np.searchsorted(np.cumsum(largos), np.arange(MUESTRAS_POR_BLOQUE, largos.sum() + MUESTRAS_POR_BLOQUE,
+                                                         MUESTRAS_POR_BLOQUE), side='right')
+    for fin in np.unique(np.append(cortes, len(largos))):
+        fin = max(int(fin), inicio + 1)
+        if inicio >= len(largos):
+            break
+        bloque, largo = pixeles[inicio:fin].astype(np.float32), largos[inicio:fin]
+        # Se avanza 1 píxel por paso en el eje mayor: cada arista toca cada píxel una vez
+        cual = np.repeat(np.arange(len(bloque)), largo)
+        paso = np.arange(len(cual), dtype=np.float32) - np.repeat((np.cumsum(largo) - largo).astype(np.float32), largo)
+        t = paso / np.maximum(largo - 1, 1).astype(np.float32)[cual]
+        origen, delta = bloque[cual, 0], (bloque[:, 1] - bloque[:, 0])[cual]
+        col = np.clip(np.rint(origen[:, 0] + delta[:, 0] * t), 0, ancho_px - 1).astype(np.int64)
+        fila = np.clip(np.rint(origen[:, 1] + delta[:, 1] * t), 0, alto_px - 1).astype(np.int64)
+        conteo += np.bincount(fila * ancho_px + col, minlength=alto_px * ancho_px)
+        inicio = fin
+    return conteo.reshape(alto_px, ancho_px)
+
+
+def _celdas_ocupadas(xy_pantalla: np.ndarray, ancho: float, alto: float):
+    """ Clave de celda (en píxeles) para cada etiqueta. """
+    return [(int(x // ancho), int(y // alto)) for x, y in xy_pantalla]
+
+
+def dibujar_grafo(posiciones: np.ndarray, aristas: np.ndarray, ruta_salida: Optional[str] = None, *,
+                  ax=None, figsize: Tuple[float, float] = (12, 10), dpi: int = 300,
+                  tamano_nodo=10, color_nodo='#1f78b4', borde_nodo=None, color_arista='black',
+                  ancho_arista: float = 1.0, alpha: Optional[float] = None,
+                  etiquetas: Optional[Sequence[str]] = None, prioridad_etiquetas: Optional[np.ndarray] = None,
+                  max_etiquetas: int = 200, evitar_encimado: bool = True,
+                  tamano_fuente: int = 8, peso_fuente: str = 'normal',
+                  max_aristas: Optional[int] = None, modo_aristas: str = 'auto', reduccion_raster: int = 1,
+                  semilla: int = 42,
+                  titulo: Optional[str] = None, tamano_titulo: int = 12):
+    """
+    posiciones: array (n x 2); aristas: array (m x 2) de índices de nodo.
+    etiquetas: texto por nodo (None o '' = sin etiqueta). Con
+               evitar_encimado=False se dibujan todas (hasta max_etiquetas).
+    Devuelve el eje usado. Si se da `ruta_salida` guarda la figura y la cierra.
+    """
+    posiciones = np.asarray(posiciones, dtype=float).reshape(-1, 2)
+    aristas = np.asarray(aristas, dtype=np.int64).reshape(-1, 2)
+    figura_propia = ax is None
+    if figura_propia:
+        figura, ax = plt.subplots(figsize=figsize)
+    else:
+        figura = ax.figure
+
+    # 4. Muestra de aristas en grafos muy densos
+    if max_aristas is not None and len(aristas) > max_aristas:
+        elegidas = np.random.default_rng(semilla).choice(len(aristas), size=max_aristas, replace=False)
+        aristas = aristas[np.sort(elegidas)]
+    if modo_aristas == 'auto':
+        modo_aristas = 'raster' if len(aristas) >= ARISTAS_RASTER else 'vector'
+    if modo_aristas not in ('vector', 'raster'):
+        raise ValueError(f"modo_aristas desconocido: {modo_aristas}")
+
+    # 2. Nodos: un solo scatter (fija también los límites del eje)
+    if len(posiciones):
+        ax.scatter(posiciones[:, 0], posiciones[:, 1], s=tamano_nodo, c=color_nodo, alpha=alpha,
+                   edgecolors=borde_nodo, zorder=2, rasterized=len(posiciones) >= ARISTAS_RASTER)
+        ax.update_datalim(posiciones)
+        ax.autoscale_view()
+    ax.set_axis_off()
+
+    # 1. Aristas: un solo LineCollection o una sola imagen
+    if len(aristas):
+        segmentos = posiciones[aristas]  # (m, 2, 2)
+        if modo_aristas == 'vector':
+            ax.add_collection(LineCollection(segmentos, colors=color_arista, linewidths=ancho_arista,
+                                             alpha=alpha, zorder=1))
+        else:
+            x0, x1 = ax.get_xlim()
+            y0, y1 = ax.get_ylim()
+            caja = ax.get_window_extent()
+            factor = dpi / figura.dpi / max(reduccion_raster, 1)
+            ancho_px, alto_px = max(int(caja.width * factor), 1), max(int(caja.height * factor), 1)
+            conteo = _rasterizar_aristas(segmentos, (x0, x1, y0, y1), ancho_px, alto_px)
+            # Opacidad de k líneas superpuestas: 1 - (1 - alpha)^k
+            imagen = np.zeros((alto_px, ancho_px, 4))
+            imagen[..., :3] = matplotlib.colors.to_rgb(color_arista)
+            imagen[..., 3] = 1 - (1 - (alpha if alpha is not None else 1.0)) ** conteo
+            ax.imshow(imagen, extent=(x0, x1, y0, y1), origin='lower', interpolation='nearest',
+                      aspect='auto', zorder=1)
+            ax.set_xlim(x0, x1)
+            ax.set_ylim(y0, y1)
+
+    # 3. Etiquetas con nivel de detalle
+    if etiquetas is not None and max_etiquetas > 0 and len(posiciones):
+        if prioridad_etiquetas is None:
+            prioridad_etiquetas = np.bincount(aristas.ravel(), minlength=len(posiciones))
+        orden = np.argsort(-np.asarray(prioridad_etiquetas), kind='stable')
+        con_texto = [i for i in orden if etiquetas[i]]
+        pantalla = ax.transData.transform(posiciones[con_texto]) if con_texto else np.zeros((0, 2))
+        # Celda ~ una etiqueta corta de 10 caracteres a la escala de la figura
+        escala = figura.dpi / 72
+        celdas = _celdas_ocupadas(pantalla, 10 * tamano_fuente * 0.6 * escala, 2 * tamano_fuente * escala)
+        usadas, dibujadas = set(), 0
+        for i, celda in zip(con_texto, celdas):
+            if dibujadas >= max_etiquetas:
+                break
+            if evitar_encimado and celda in usadas:
+                continue
+            # La etiqueta puede pasarse a las celdas vecinas: se reservan también
+            cx, cy = celda
+            usadas.update((cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+            ax.text(posiciones[i, 0], posiciones[i, 1], etiquetas[i], fontsize=tamano_fuente,
+                    fontweight=peso_fuente, ha='center', va='center', zorder=3)
+            dibujadas += 1
+
+    if titulo:
+        ax.set_title(titulo, fontsize=tamano_titulo)
+    if ruta_salida is not None:
+        figura.savefig(ruta_salida, dpi=dpi, bbox_inches='tight' if figura_propia else None)
+        if figura_propia:
+            plt.close(figura)
+    return ax
+
+
+def dibujar_networkx(G, pos: Mapping[Hashable, Tuple[float, float]], ruta_salida: Optional[str] = None,
+                     etiquetas: Optional[Dict[Hashable, str]] = None, aristas_extra=None, **opciones):
+    """
+    Atajo para grafos de networkx: convierte nodos/aristas a arrays y llama a
+    `dibujar_grafo`. `aristas_extra` (otro grafo o lista de pares) reemplaza
+    las aristas de G, útil para dibujar un subgrafo (ej. el MST) sobre sus nodos.
+    """
+    nodos = list(G.nodes())
+    indice = {nodo: i for i, nodo in enumerate(nodos)}
+    posiciones = np.array([pos[nodo] for nodo in nodos], dtype=float).reshape(-1, 2)
+    pares = G.edges() if aristas_extra is None else getattr(aristas_extra, 'edges', lambda: aristas_extra)()
+    aristas = np.fromiter((indice[x] for par in pares for x in par[:2]), dtype=np.int64).reshape(-1, 2)
+    textos = None if etiquetas is None else [etiquetas.get(nodo, '') for nodo in nodos]
+    return dibujar_grafo(posiciones, aristas, ruta_salida, etiquetas=textos, **opciones)
+
+
+# --- PRUEBA DE ESCALA: 200k ARISTAS ---
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    rng = np.random.default_rng(1)
+    n, m = 50_000, 200_000
+    etiquetas = [f"nodo {i}" for i in range(n)]
+    # Aristas locales (como las de un layout) y aristas al azar (peor caso: cruzan toda la imagen)
+    posiciones_locales = np.sort(rng.uniform(0, 1, size=(n, 2)), axis=0)
+    origenes = np.arange(m) % n
+    casos = {
+        'locales': (posiciones_locales, np.column_stack([origenes, (origenes + rng.integers(1, 30, m)) % n])),
+        'al_azar': (rng.uniform(0, 1, size=(n, 2)), rng.integers(0, n, size=(m, 2))),
+    }
+
+    carpeta = tempfile.mkdtemp()
+    for caso, (posiciones, aristas) in casos.items():
+        for nombre, opciones in (('raster', {}), ('raster_reducido_x2', {'reduccion_raster': 2}),
+                                 ('vector', {'modo_aristas': 'vector'})):
+            ruta = os.path.join(carpeta, f'{caso}_{nombre}.png')
+            inicio = time.perf_counter()
+            dibujar_grafo(posiciones, aristas, ruta, tamano_nodo=2, color_arista='#999999', ancho_arista=0.2,
+                          alpha=0.6, etiquetas=etiquetas, max_etiquetas=100, dpi=150, **opciones)
+            print(f"⏱️ {caso:<8} {n:,} nodos / {m:,} aristas ({nombre}): "
+                  f"{time.perf_counter() - inicio:.2f} s -> {ruta}")
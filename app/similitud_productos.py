@@ -0,0 +1,258 @@
+import argparse
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, diags
+
+from grafo_compras import COL_FAMILIA, COL_PRODUCTO, COL_TIENDA
+
+# =============================================================================
+# ÍNDICE DE SIMILITUD ENTRE PRODUCTOS (Proyección dispersa de co-compras)
+# =============================================================================
+# OBJETIVO:
+#   Usar el grafo tripartito para recomendar: "las familias que compran X
+#   también compran Y". Proyectar familia -> producto -> familia con los
+#   helpers bipartitos de networkx es cuadrático y en Python puro.
+#
+# CÓMO FUNCIONA:
+#   1. Matrices dispersas CSR desde el historial de compras:
+#      familia x producto y producto x tienda (conteo de compras).
+#   2. Similitud producto-producto = multiplicación dispersa Xᵀ·X por
+#      bloques de filas:
+#      - 'coseno': columnas normalizadas (L2), valores en [0, 1].
+#      - 'coocurrencia': cuántas familias (o tiendas) compraron ambos.
+#   3. De cada fila se guardan solo los k vecinos más parecidos (sin el propio
+#      producto), con un ordenamiento vectorizado por (fila, -puntaje).
+#   4. El índice (productos, vecinos k, puntajes) se guarda en .npz; consultar
+#      es un diccionario + una fila de arreglos: microsegundos.
+#   5. `ordenar_por_afinidad` reordena candidatos (ej. las recomendaciones
+#      de vuelto) por su similitud sumada con la canasta.
+#
+# USO (desde la raíz del proyecto):
+#   python app/similitud_productos.py                  # genera output/similitud_productos.npz
+#   python app/similitud_productos.py --base tienda --k 30
+#   python app/similitud_productos.py --escala 5000000 # prueba sintética
+# =============================================================================
+
+RUTA_INDICE = os.path.join('output', 'similitud_productos.npz')
+K_VECINOS = 20
+MAX_ENTRADAS_BLOQUE = 20_000_000   # Entradas de Xᵀ·X por bloque de filas
+COLUMNA_BASE = {'familia': COL_FAMILIA, 'tienda': COL_TIENDA}
+
+
+def matriz_incidencia(df: pd.DataFrame, columna_filas: str, columna_columnas: str,
+                      binaria: bool = False) -> Tuple[csr_matrix, np.ndarray, np.ndarray]:
+    """ (CSR filas x columnas con el número de compras, etiquetas de filas, etiquetas de columnas). """
+    datos = df[[columna_filas, columna_columnas]].dropna()
+    filas, etiquetas_filas = pd.factorize(datos[columna_filas])
+    columnas, etiquetas_columnas = pd.factorize(datos[columna_columnas])
+    matriz = csr_matrix((np.ones(len(filas), dtype=np.float64), (filas, columnas)),
+                        shape=(len(etiquetas_filas), len(etiquetas_columnas)))
+    matriz.sum_duplicates()
+    if binaria:
+        matriz.data[:] = 1.0
+    return matriz, np.asarray(etiquetas_filas, dtype=object), np.asarray(etiquetas_columnas, dtype=object)
+
+
+def matrices_compras(df: pd.DataFrame) -> Dict[str, Tuple[csr_matrix, np.ndarray, np.ndarray]]:
+    """ Las dos proyecciones del grafo tripartito que sirven para similitud. """
+    return {
+        'familia_producto': matriz_incidencia(df, COL_FAMILIA, COL_PRODUCTO),
+        'producto_tienda': matriz_incidencia(df, COL_PRODUCTO, COL_TIENDA),
+    }
+
+
+def _top_k_filas(bloque: csr_matrix, desplazamiento: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ k mayores por fila de un bloque CSR (sin la diagonal global), rellenando con -1 / 0. """
+    bloque = bloque.tocoo()
+    fuera_diagonal = bloque.col != bloque.row + desplazamiento
+    filas, columnas, puntajes = bloque.row[fuera_diagonal], bloque.col[fuera_diagonal], bloque.data[fuera_diagonal]
+    positivos = puntajes > 0
+    filas, columnas, puntajes = filas[positivos], columnas[positivos], puntajes[positivos]
+
+    # Orden por (fila, -puntaje, columna): el rango dentro de la fila decide si entra al top-k
+    orden = np.lexsort((columnas, -puntajes, filas))
+    filas, columnas, puntajes = filas[orden], columnas[orden], puntajes[orden]
+    inicio_fila = np.searchsorted(filas, np.arange(bloque.shape[0]))
+    rango = np.arange(len(filas)) - inicio_fila[filas]
+    entra = rango < k
+
+    vecinos = np.full((bloque.shape[0], k), -1, dtype=np.int32)
+    valores = np.zeros((bloque.shape[0], k), dtype=np.float32)
+    vecinos[filas[entra], rango[entra]] = columnas[entra]
+    valores[filas[entra], rango[entra]] = puntajes[entra]
+    return vecinos, valores
+
+
+class IndiceSimilitud:
+    """ Top-k de productos parecidos a cada producto (consulta en memoria). """
+
+    def __init__(self, productos: Iterable[str], vecinos: np.ndarray, puntajes: np.ndarray,
+                 medida: str = 'coseno', base: str = 'familia'):
+        self.productos = np.asarray(list(productos), dtype=object)
+        self.vecinos = np.asarray(vecinos, dtype=np.int32)
+        self.puntajes = np.asarray(puntajes, dtype=np.float32)
+        self.medida = medida
+        self.base = base
+        self.posicion = {producto: i for i, producto in enumerate(self.productos.tolist())}
+
+    @classmethod
+    def construir(cls, df: pd.DataFrame, k: int = K_VECINOS, medida: str = 'coseno',
+                  base: str = 'familia') -> 'IndiceSimilitud':
+        """
+        base: 'familia' (comprados por las mismas familias) o 'tienda'
+              (vendidos en las mismas tiendas).
+        medida: 'coseno' o 'coocurrencia'.
+        """
+        if medida not in ('coseno', 'coocurrencia'):
+            raise ValueError(f"Medida desconocida: {medida}")
+        if base not in COLUMNA_BASE:
+            raise ValueError(f"Base desconocida: {base}. Opciones: {', '.join(COLUMNA_BASE)}")
+        # X: base x producto. Para coocurrencia se cuenta cada familia/tienda una vez
+        X, _, productos = matriz_incidencia(df, COLUMNA_BASE[base], COL_PRODUCTO, binaria=(medida == 'coocurrencia'))
+        if medida == 'coseno':
+            normas = np.sqrt(np.asarray(X.multiply(X).sum(axis=0)).ravel())
+            X = (X @ diags(1.0 / np.where(normas > 0, normas, 1.0))).tocsr()
+        Xt = X.T.tocsr()
+
+        # Tamaño de bloque según entradas estimadas de Xᵀ·X (columnas por fila ~ grado en la proyección)
+        n = len(productos)
+        grado_medio = max(X.nnz / max(X.shape[0], 1), 1.0) * max(Xt.nnz / max(n, 1), 1.0)
+        filas_bloque = max(1, min(n, int(MAX_ENTRADAS_BLOQUE / grado_medio)))
+        partes_vecinos, partes_puntajes = [], []
+        for inicio in range(0, n, filas_bloque):
+            bloque = Xt[inicio:inicio + filas_bloque] @ X
+            vecinos, puntajes = _top_k_filas(bloque, inicio, k)
+            partes_vecinos.append(vecinos)
+            partes_puntajes.append(puntajes)
+        vacio = np.zeros((0, k))
+        return cls(productos, np.concatenate(partes_vecinos) if partes_vecinos else vacio,
+                   np.concatenate(partes_puntajes) if partes_puntajes else vacio, medida, base)
+
+    # --- Persistencia ---
+    def guardar(self, ruta: str = RUTA_INDICE) -> None:
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            np.savez_compressed(archivo, productos=self.productos.astype(str), vecinos=self.vecinos,
+                                puntajes=self.puntajes, medida=self.medida, base=self.base)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str = RUTA_INDICE) -> 'IndiceSimilitud':
+        with np.load(ruta) as datos:
+            return cls(datos['productos'].tolist(), datos['vecinos'], datos['puntajes'],
+                       str(datos['medida']), str(datos['base']))
+
+    @classmethod
+    def cargar_si_existe(cls, ruta: str = RUTA_INDICE) -> Optional['IndiceSimilitud']:
+        return cls.cargar(ruta) if os.path.exists(ruta) else None
+
+    # --- Consultas ---
+    def similares(self, producto: str, k: int = 10) -> List[Tuple[str, float]]:
+        """ Los k productos más parecidos a `producto` (lista vacía si no está). """
+        i = self.posicion.get(producto)
+        if i is None:
+            return []
+        vecinos, puntajes = self.vecinos[i, :k], self.puntajes[i, :k]
+        validos = vecinos >= 0
+        return list(zip(self.productos[vecinos[validos]].tolist(), puntajes[validos].tolist()))
+
+    def afinidad(self, candidatos: Iterable[str], canasta: Iterable[str]) -> np.ndarray:
+        """ Similitud sumada de cada candidato con los productos de la canasta. """
+        acumulado: Dict[int, float] = {}
+        for producto in set(canasta):
+            i = self.posicion.get(producto)
+            if i is None:
+                continue
+            for vecino, puntaje in zip(self.vecinos[i].tolist(), self.puntajes[i].tolist()):
+                if vecino < 0:
+                    break
+                acumulado[vecino] = acumulado.get(vecino, 0.0) + puntaje
+        return np.array([acumulado.get(self.posicion.get(c, -1), 0.0) for c in candidatos], dtype=float)
+
+    def ordenar_por_afinidad(self, df_candidatos: pd.DataFrame, canasta: Iterable[str],
+                             k: Optional[int] = None) -> pd.DataFrame:
+        """
+        Agrega la columna 'afinidad' y ordena de mayor a menor. En empate se
+        respeta el orden de entrada (ej. precio descendente).
+        """
+        if df_candidatos.empty:
+            return df_candidatos
+        df = df_candidatos.copy()
+        df['afinidad'] = self.afinidad(df['producto'], canasta)
+        df = df.sort_values('afinidad', ascending=False, kind='stable').reset_index(drop=True)
+        return df if k is None else df.head(k)
+
+    def __len__(self):
+        return len(self.productos)
+
+
+# --- CONSTRUCCIÓN + VERIFICACIÓN ---
+def _verificar_contra_denso(df: pd.DataFrame, indice: IndiceSimilitud) -> None:
+    """ El top-k coincide con la similitud calculada en denso (datos chicos). """
+    X, _, productos = matriz_incidencia(df, COLUMNA_BASE[indice.base], COL_PRODUCTO,
+                                        binaria=(indice.medida == 'coocurrencia'))
+    denso = X.toarray()
+    if indice.medida == 'coseno':
+        normas = np.linalg.norm(denso, axis=0)
+        denso = denso / np.where(normas > 0, normas, 1.0)
+    similitud = denso.T @ denso
+    np.fill_diagonal(similitud, 0)
+    for i in range(len(productos)):
+        k_validos = int((indice.vecinos[i] >= 0).sum())
+        esperado = np.sort(similitud[i][similitud[i] > 0])[::-1][:indice.vecinos.shape[1]]
+        assert len(esperado) == k_validos, productos[i]
+        assert np.allclose(indice.puntajes[i, :k_validos], esperado, atol=1e-5), productos[i]
+        assert np.allclose(similitud[i, indice.vecinos[i, :k_validos]], esperado, atol=1e-5), productos[i]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de productos similares (co-compras) para recomendaciones.")
+    parser.add_argument('--csv', default=os.path.join('data', 'dataset_compras_completo.csv'))
+    parser.add_argument('--salida', default=RUTA_INDICE)
+    parser.add_argument('--k', type=int, default=K_VECINOS)
+    parser.add_argument('--medida', default='coseno', choices=['coseno', 'coocurrencia'])
+    parser.add_argument('--base', default='familia', choices=list(COLUMNA_BASE))
+    parser.add_argument('--escala', type=int, default=None, help='Probar con N compras sintéticas (no guarda)')
+    args = parser.parse_args()
+
+    if args.escala:
+        rng = np.random.default_rng(0)
+        n_familias, n_productos = max(args.escala // 25, 1), 20_000
+        df = pd.DataFrame({COL_FAMILIA: rng.integers(0, n_familias, args.escala),
+                           COL_PRODUCTO: np.minimum(rng.zipf(1.2, args.escala) - 1, n_productos - 1),
+                           COL_TIENDA: rng.integers(0, 2_000, args.escala)})
+    else:
+        df = pd.read_csv(args.csv)
+
+    inicio = time.perf_counter()
+    indice = IndiceSimilitud.construir(df, k=args.k, medida=args.medida, base=args.base)
+    segundos = time.perf_counter() - inicio
+    print(f"✅ Índice {args.medida}/{args.base}: {len(indice):,} productos, top-{args.k}, "
+          f"{len(df):,} compras en {segundos:.2f} s")
+
+    # Tiempo de consulta
+    muestra = indice.productos[:min(len(indice), 1000)].tolist()
+    inicio = time.perf_counter()
+    for producto in muestra:
+        indice.similares(producto, 10)
+    print(f"⏱️ similares(): {(time.perf_counter() - inicio) / max(len(muestra), 1) * 1e6:.1f} µs por consulta")
+
+    if not args.escala:
+        _verificar_contra_denso(df, indice)
+        print("✅ Top-k igual al cálculo denso Xᵀ·X.")
+        for producto in indice.productos[:3].tolist():
+            parecidos = ', '.join(f"{p} ({s:.2f})" for p, s in indice.similares(producto, 3))
+            print(f"   {producto}: {parecidos}")
+        indice.guardar(args.salida)
+        print(f"💾 Guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
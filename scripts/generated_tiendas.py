@@ -2,24 +2,25 @@ import pandas as pd
 
 # Dataset: tiendas
 # Columns inferred from uploaded file's header (if available).
-columns = ["id_tienda", "nombre_tienda", "tipo", "distrito"]
+# latitud / longitud: ubicación aproximada de cada tienda (la usa app/indice_tiendas.py)
+columns = ["id_tienda", "nombre_tienda", "tipo", "distrito", "latitud", "longitud"]
 
 data = [
-    (1, "Plaza Vea Miraflores", "Supermercado", "Miraflores"),
-    (10, "Mercado San Borja", "Mercado", "San Borja"),
-    (11, "Tottus Jesús María", "Supermercado", "Jesús María"),
-    (12, "Metro San Borja", "Supermercado", "San Borja"),
-    (13, "Vivanda La Molina", "Supermercado", "La Molina"),
-    (14, "Tottus Lince", "Supermercado", "Lince"),
-    (15, "Wong San Isidro", "Supermercado", "San Isidro"),
-    (16, "Metro Santiago de Surco", "Supermercado", "Santiago de Surco"),
-    (17, "Bodega San Miguel", "Bodega", "San Miguel"),
-    (18, "Mercado Callao", "Mercado", "Callao"),
-    (19, "Mercado VES", "Mercado", "Villa El Salvador"),
-    (2, "Mercado Central SMP", "Mercado", "San Martín de Porres"),
-    (20, "Bodega Chorrillos", "Bodega", "Chorrillos"),
-    (21, "Mercado Surquillo", "Mercado", "Surquillo"),
-    (22, "Wong La Molina", "Supermercado", "La Molina")
+    (1, "Plaza Vea Miraflores", "Supermercado", "Miraflores", -12.1219, -77.0301),
+    (10, "Mercado San Borja", "Mercado", "San Borja", -12.0912, -76.9956),
+    (11, "Tottus Jesús María", "Supermercado", "Jesús María", -12.0742, -77.045),
+    (12, "Metro San Borja", "Supermercado", "San Borja", -12.1008, -77.0012),
+    (13, "Vivanda La Molina", "Supermercado", "La Molina", -12.0835, -76.944),
+    (14, "Tottus Lince", "Supermercado", "Lince", -12.0845, -77.033),
+    (15, "Wong San Isidro", "Supermercado", "San Isidro", -12.0965, -77.0367),
+    (16, "Metro Santiago de Surco", "Supermercado", "Santiago de Surco", -12.1402, -76.9922),
+    (17, "Bodega San Miguel", "Bodega", "San Miguel", -12.0775, -77.0863),
+    (18, "Mercado Callao", "Mercado", "Callao", -12.0566, -77.1316),
+    (19, "Mercado VES", "Mercado", "Villa El Salvador", -12.2127, -76.9395),
+    (2, "Mercado Central SMP", "Mercado", "San Martín de Porres", -12.0231, -77.0603),
+    (20, "Bodega Chorrillos", "Bodega", "Chorrillos", -12.1689, -77.0153),
+    (21, "Mercado Surquillo", "Mercado", "Surquillo", -12.1125, -77.0204),
+    (22, "Wong La Molina", "Supermercado", "La Molina", -12.076, -76.95)
 ]
 
 df = pd.DataFrame(data, columns=columns)
@@ -0,0 +1,55 @@
+-- =============================================================================
+-- MIGRACIÓN: COORDENADAS DE TIENDAS (latitud / longitud)
+-- =============================================================================
+-- OBJETIVO:
+--   El índice espacial de tiendas (app/indice_tiendas.py, IndiceTiendas.desde_sql)
+--   lee TIENDAS.latitud y TIENDAS.longitud, que no existen en la base
+--   restaurada del .bak (MiMercadito_Final).
+--
+-- CÓMO FUNCIONA:
+--   1. Agrega las dos columnas solo si faltan (se puede correr varias veces).
+--   2. Carga la ubicación aproximada de cada tienda (mismos valores que
+--      data/tiendas.csv). Las tiendas sin coordenadas quedan en NULL y el
+--      índice las ignora.
+--
+-- USO (SQL Server Management Studio o sqlcmd):
+--   sqlcmd -S PATRICKYIN -E -i scripts/migracion_tiendas_coordenadas.sql
+-- =============================================================================
+USE MiMercadito_Final;
+GO
+
+IF COL_LENGTH('dbo.TIENDAS', 'latitud') IS NULL
+    ALTER TABLE dbo.TIENDAS ADD latitud DECIMAL(9, 6) NULL;
+IF COL_LENGTH('dbo.TIENDAS', 'longitud') IS NULL
+    ALTER TABLE dbo.TIENDAS ADD longitud DECIMAL(9, 6) NULL;
+GO
+
+UPDATE T
+SET T.latitud = C.latitud, T.longitud = C.longitud
+FROM dbo.TIENDAS T
+INNER JOIN (VALUES
+    (1, -12.1219, -77.0301),
+    (2, -12.0231, -77.0603),
+    (3, -12.093, -77.045),
+    (4, -12.1285, -77.025),
+    (5, -12.147, -76.981),
+    (6, -12.1435, -76.9945),
+    (7, -11.9405, -77.0575),
+    (8, -11.983, -77.006),
+    (9, -12.105, -76.992),
+    (10, -12.0912, -76.9956),
+    (11, -12.0742, -77.045),
+    (12, -12.1008, -77.0012),
+    (13, -12.0835, -76.944),
+    (14, -12.0845, -77.033),
+    (15, -12.0965, -77.0367),
+    (16, -12.1402, -76.9922),
+    (17, -12.0775, -77.0863),
+    (18, -12.0566, -77.1316),
+    (19, -12.2127, -76.9395),
+    (20, -12.1689, -77.0153),
+    (21, -12.1125, -77.0204),
+    (22, -12.076, -76.95),
+    (23, -12.101, -77.029)
+) AS C (id_tienda, latitud, longitud) ON T.id_tienda = C.id_tienda;
+GO